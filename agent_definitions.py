@@ -14,15 +14,22 @@ def get_user_proxy_definition():
     """
 
 
-def get_subtitle_translator_definition():
+def get_definition_lookup_instructions(glossary_prefetch=False):
+    if glossary_prefetch:
+        return """- Use the glossary provided with the input for uncommon, difficult, or idiomatic words.
+        - The glossary has already been looked up for you. Do not request further word definitions."""
+    return """- When using `get_wiktionary_definition`:
+        - Use the `get_wiktionary_definition` function only for uncommon, difficult, or idiomatic words that you need more context or understanding for. Do not use it for common words.
+        - If it returns 'plural of' or 'gerund of' or 'present participle' the word as an answer, that means this is not the definition of the word. You must extract the stem of the word and re-use the stem of the word to look up in Wiktionary.
+        - Use these definitions to make the translation more accurate."""
+
+
+def get_subtitle_translator_definition(glossary_prefetch=False):
     return f"""
     Subtitle_Translator:
     - Translate the subtitle text from {{source_lang}} to {{target_lang}}.
     - Ensure translations are contextually accurate and sound natural.
-    - When using `get_wiktionary_definition`:
-        - Use the `get_wiktionary_definition` function only for uncommon, difficult, or idiomatic words that you need more context or understanding for. Do not use it for common words.
-        - If it returns 'plural of' or 'gerund of' or 'present participle' the word as an answer, that means this is not the definition of the word. You must extract the stem of the word and re-use the stem of the word to look up in Wiktionary.
-        - Use these definitions to make the translation more accurate.
+    {get_definition_lookup_instructions(glossary_prefetch)}
     - Prioritize conveying meaning over literal translations to make the subtitles natural in the target language.
     - Maintain the tone and register of the original language.
     - Ensure the number of subtitles, their indices, and timestamps match the original content.
@@ -69,7 +76,7 @@ def get_subtitle_formatter_definition():
     """
 
 
-def merge_agent_definitions(source_lang, target_lang):
+def merge_agent_definitions(source_lang, target_lang, glossary_prefetch=False):
     return f"""
     Task: Translate and review SRT subtitle content from {source_lang} to {target_lang}.
 
@@ -77,7 +84,7 @@ def merge_agent_definitions(source_lang, target_lang):
 
     1. {get_user_proxy_definition()}
 
-    2. {get_subtitle_translator_definition()}
+    2. {get_subtitle_translator_definition(glossary_prefetch)}
 
     3. {get_translation_reviewer_definition()}
 
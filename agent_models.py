@@ -1,9 +1,24 @@
 # agent_models.py
 
-from typing import List
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+from constants import (
+    BATCH_STATUS_COMPILED,
+    MAX_SUBTITLE_LINE_LENGTH,
+    MAX_SUBTITLE_LINES,
+    MIN_SUBTITLE_DURATION_MS,
+    MIN_SUBTITLE_GAP_MS,
+    PIPELINE_FORMAT_WORKERS,
+    PIPELINE_REVIEW_WORKERS,
+    PIPELINE_TRANSLATE_WORKERS,
+    QUALITY_MAX_CPS,
+    QUALITY_MAX_DURATION_MS,
+    REVIEW_SAMPLE_RATE,
+    SPEAKER_SELECTION_FSM,
+)
+
 
 class FormattingResult(BaseModel):
     total_subtitles: int = Field(..., description="Total number of formatted subtitles")
@@ -29,3 +44,359 @@ class WiktionaryResult(BaseModel):
 class AlignmentResult(BaseModel):
     is_aligned: bool
     misaligned_indices: List[int] = Field(default_factory=list)
+
+
+class ReviewGateDecision(BaseModel):
+    flagged: bool = Field(..., description="Whether any local heuristic failed")
+    sampled: bool = Field(
+        False, description="Whether a clean chunk was picked for a random review"
+    )
+    review_required: bool
+    reasons: List[str] = Field(default_factory=list)
+    llm_calls_saved: int = 0
+    estimated_tokens_saved: int = 0
+
+
+class GlossaryPrefetchReport(BaseModel):
+    rare_words: int = 0
+    glossary_terms: int = 0
+    estimated_tool_round_trips_removed: int = Field(
+        0, description="Definition tool calls the rare words would have taken"
+    )
+    definition_tool_calls: int = Field(
+        0, description="Definition tool calls still made during the chat"
+    )
+
+
+class SpeakerTransitionReport(BaseModel):
+    mode: str
+    transitions: List[str] = Field(
+        default_factory=list, description="Speaker hops in order, e.g. 'A -> B'"
+    )
+    retries: int = Field(0, description="Retry edges taken")
+    manager_llm_calls: int = Field(
+        0,
+        description="Requests sent by the GroupChatManager's client, i.e. LLM speaker selections",
+    )
+
+
+class EarlyTerminationReport(BaseModel):
+    terminated_by: Optional[str] = Field(
+        None, description="Agent whose message was the first valid translation"
+    )
+    rounds: int = 0
+    rounds_saved: int = Field(
+        0, description="Rounds left in the workflow, given the review gate's decision"
+    )
+    estimated_seconds_saved: float = Field(
+        0.0, description="rounds_saved at the chunk's average seconds per round so far"
+    )
+    chunk_seconds: float = 0.0
+    validations: int = 0
+    validation_ms: float = 0.0
+
+
+class StreamingReport(BaseModel):
+    streams: int = 0
+    aborted_streams: int = 0
+    divergences: List[str] = Field(default_factory=list)
+    wasted_completion_tokens: int = Field(
+        0, description="Estimated tokens received on aborted streams"
+    )
+    wasted_prompt_tokens: int = Field(
+        0, description="Estimated prompt tokens sent for aborted streams"
+    )
+    time_to_first_cue_ms: Optional[float] = None
+    verified_cues: int = 0
+
+
+class ChunkReport(BaseModel):
+    chunk_index: int
+    cue_count: int
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = Field(
+        0, description="Agent replies, manager speaker selections and aborted streams"
+    )
+    review_gate: Optional[ReviewGateDecision] = None
+    glossary_prefetch: Optional[GlossaryPrefetchReport] = None
+    speaker_transitions: Optional[SpeakerTransitionReport] = None
+    early_termination: Optional[EarlyTerminationReport] = None
+    streaming: Optional[StreamingReport] = None
+    worker: Optional[str] = Field(
+        None, description="Worker that translated the chunk in distributed mode"
+    )
+    attempts: int = Field(1, description="Leases taken until the chunk was done")
+    error: Optional[str] = Field(
+        None, description="Why the chunk kept its original text, if it did"
+    )
+
+
+class ChunkSizeStats(BaseModel):
+    chunk_size: int
+    samples: int
+    mean_seconds: float
+    mean_tokens: float
+    mean_llm_calls: Optional[float] = Field(
+        None, description="Only set when the records include call counts"
+    )
+    failure_rate: float
+    expected_cues_per_second: float = Field(
+        ..., description="Cues translated per second once failed chunks are retried"
+    )
+
+
+class QualityLimits(BaseModel):
+    max_cps: float = Field(
+        QUALITY_MAX_CPS, gt=0, description="Characters per second, line breaks excluded"
+    )
+    min_duration_ms: int = MIN_SUBTITLE_DURATION_MS
+    max_duration_ms: int = QUALITY_MAX_DURATION_MS
+    min_gap_ms: int = MIN_SUBTITLE_GAP_MS
+    max_line_length: int = MAX_SUBTITLE_LINE_LENGTH
+    max_lines: int = MAX_SUBTITLE_LINES
+
+
+class TranslationOptions(BaseModel):
+    review_gate_enabled: bool = True
+    review_sample_rate: float = Field(REVIEW_SAMPLE_RATE, ge=0.0, le=1.0)
+    glossary_prefetch_enabled: bool = True
+    speaker_selection: str = SPEAKER_SELECTION_FSM
+    early_termination_enabled: bool = True
+    streaming_enabled: bool = True
+    chunk_size: Optional[int] = Field(
+        None, gt=0, description="Cues per chunk, chosen by the tuner when not set"
+    )
+    llm_config: Optional[Dict[str, Any]] = Field(
+        None, description="Falls back to the llm_config in the Streamlit session"
+    )
+    pipeline_enabled: bool = False
+    translate_workers: int = Field(PIPELINE_TRANSLATE_WORKERS, gt=0)
+    review_workers: int = Field(PIPELINE_REVIEW_WORKERS, gt=0)
+    format_workers: int = Field(PIPELINE_FORMAT_WORKERS, gt=0)
+    local_formatter: bool = Field(
+        True, description="Format and verify pipeline chunks without the LLM"
+    )
+    quality_limits: QualityLimits = Field(
+        default_factory=QualityLimits,
+        description="Reading speed and timing limits for the formatter and review gate",
+    )
+    chunk_queue_url: Optional[str] = Field(
+        None, description="Publish chunks to this queue for distributed workers"
+    )
+
+
+class ChunkTask(BaseModel):
+    job_id: str
+    chunk_index: int
+    chunk_count: int
+    srt_content: str
+    source_lang: str
+    target_lang: str
+    llm_config: Dict[str, Any] = Field(
+        ..., description="Model settings without credentials or clients"
+    )
+    options: TranslationOptions
+
+
+class ChunkResult(BaseModel):
+    job_id: str
+    chunk_index: int
+    translated_srt: str = ""
+    report: Optional[ChunkReport] = None
+    error: Optional[str] = Field(
+        None, description="Last error once the chunk ran out of attempts"
+    )
+
+
+class BatchChunk(BaseModel):
+    custom_id: str
+    file_index: int
+    chunk_index: int
+    original_srt: str
+    translated_srt: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = Field(
+        None, description="Why the last result was not used, if it was not"
+    )
+
+
+class BatchRound(BaseModel):
+    requests_path: str
+    custom_ids: List[str]
+    status: str = BATCH_STATUS_COMPILED
+    input_file_id: Optional[str] = None
+    batch_id: Optional[str] = None
+    output_file_id: Optional[str] = None
+    error_file_id: Optional[str] = None
+    collected: bool = False
+
+
+class BatchJobState(BaseModel):
+    name: str
+    model: str
+    source_lang: str
+    target_lang: str
+    chunk_size: int
+    temperature: float = 0.0
+    glossary_prefetch_enabled: bool = False
+    input_files: List[str]
+    output_files: List[str]
+    chunks: List[BatchChunk]
+    rounds: List[BatchRound] = Field(default_factory=list)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    merged: bool = False
+
+
+class StageProfile(BaseModel):
+    name: str
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = Field(
+        0.0,
+        description="CPU time of the whole process during the calls, all threads included",
+    )
+    traced_kb_delta: float = Field(
+        0.0, description="Change in traced memory of the whole process over the calls"
+    )
+
+
+class AllocationStat(BaseModel):
+    location: str
+    size_kb: float
+    count: int
+    size_kb_diff: Optional[float] = None
+    count_diff: Optional[int] = None
+
+
+class ResourceSnapshot(BaseModel):
+    label: str
+    created_at: str
+    rss_kb: Optional[int] = None
+    traced_kb: float = 0.0
+    traced_peak_kb: float = 0.0
+    stages: List[StageProfile] = Field(default_factory=list)
+    top_allocations: List[AllocationStat] = Field(default_factory=list)
+    top_growth: List[AllocationStat] = Field(
+        default_factory=list, description="Largest changes since the previous snapshot"
+    )
+    agent_counts: Dict[str, int] = Field(
+        default_factory=dict, description="Live autogen agents and group chats by type"
+    )
+    agent_messages: int = Field(
+        0, description="Messages held by the live agents and group chats"
+    )
+    session_state_kb: Dict[str, float] = Field(default_factory=dict)
+    duplicated_session_text: List[List[str]] = Field(
+        default_factory=list,
+        description="Session state keys holding separate copies of the same text",
+    )
+
+
+class StageReport(BaseModel):
+    name: str
+    workers: int
+    items: int = 0
+    busy_seconds: float = 0.0
+    utilisation: float = Field(
+        0.0, description="Busy time over workers x pipeline wall-clock time"
+    )
+    mean_queue_wait_ms: float = Field(
+        0.0, description="Time items waited in the stage's input queue"
+    )
+    max_queue_wait_ms: float = 0.0
+    blocked_seconds: float = Field(
+        0.0, description="Time workers waited for room in the next stage's queue"
+    )
+
+
+class PipelineReport(BaseModel):
+    seconds: float = 0.0
+    stages: List[StageReport] = Field(default_factory=list)
+    bottleneck: Optional[str] = Field(
+        None, description="Stage with the highest utilisation"
+    )
+
+
+class VersionDiffReport(BaseModel):
+    total_cues: int = 0
+    reused: int = Field(0, description="Cues whose previous translation was kept")
+    retimed: int = Field(0, description="Reused cues that got new timestamps")
+    edited: int = Field(0, description="Cues whose text changed")
+    new: int = Field(
+        0, description="Cues without a counterpart in the previous version"
+    )
+    removed: int = Field(0, description="Previous cues missing from the new version")
+    retranslated: int = 0
+
+
+class MetricDistribution(BaseModel):
+    name: str
+    unit: str
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    max: Optional[float] = None
+    buckets: List[str] = Field(default_factory=list)
+    counts: List[int] = Field(default_factory=list)
+
+
+class QualitySummary(BaseModel):
+    cue_count: int = 0
+    limits: QualityLimits = Field(default_factory=QualityLimits)
+    distributions: List[MetricDistribution] = Field(default_factory=list)
+    flagged: Dict[str, int] = Field(
+        default_factory=dict, description="Cues breaking each rule"
+    )
+    flagged_cues: int = Field(0, description="Cues breaking at least one rule")
+    analysis_ms: float = 0.0
+
+
+class ChunkPlan(BaseModel):
+    chunk_index: int
+    cue_count: int
+    prompt_tokens: int
+    completion_tokens: int
+    llm_calls: float
+    seconds: float
+
+
+class PreflightPlan(BaseModel):
+    model: str
+    source_lang: str
+    target_lang: str
+    chunk_size: int
+    total_cues: int
+    chunks: List[ChunkPlan] = Field(default_factory=list)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: float = 0.0
+    history_samples: int = Field(
+        0, description="Recorded chunks the call and time estimates are based on"
+    )
+    seconds_per_call: float
+    concurrency: int
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    eta_seconds: float = 0.0
+    bottleneck: str = Field(
+        ...,
+        description="What bounds the ETA: concurrency, requests or tokens per minute",
+    )
+
+
+class JobReport(BaseModel):
+    app_version: str
+    created_at: str
+    input_file: Optional[str] = None
+    output_file: Optional[str] = None
+    preflight: PreflightPlan
+    chunks: List[ChunkReport] = Field(default_factory=list)
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = 0
+    pipeline: Optional[PipelineReport] = None
+    version_diff: Optional[VersionDiffReport] = None
@@ -2,7 +2,7 @@
 
 import json
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from autogen.agentchat import AssistantAgent, UserProxyAgent
 
@@ -21,7 +21,12 @@ def load_agent_configs() -> Dict[str, Any]:
         return json.load(f)
 
 
-def create_agents(llm_config: Dict[str, Any]) -> Dict[str, AgentType]:
+def create_agents(
+    llm_config: Dict[str, Any],
+    enable_definition_tool: bool = True,
+    stream_translator: bool = False,
+    translator_llm_config: Optional[Dict[str, Any]] = None,
+) -> Dict[str, AgentType]:
     logging.info(f"Creating agents with llm_config: {llm_config}")
 
     agent_configs = load_agent_configs()
@@ -30,11 +35,16 @@ def create_agents(llm_config: Dict[str, Any]) -> Dict[str, AgentType]:
     # Create a separate config for UserProxyAgent
     user_proxy_config = {"code_execution_config": {"use_docker": False}}
 
+    translator_llm_config = translator_llm_config or llm_config
     subtitle_translator = AssistantAgent(
         name="Subtitle_Translator",
         system_message=agent_configs["subtitle_translator"]["system_message"],
         description=agent_configs["subtitle_translator"]["description"],
-        llm_config=llm_config,
+        llm_config=(
+            {**translator_llm_config, "stream": True}
+            if stream_translator
+            else translator_llm_config
+        ),
     )
 
     translation_reviewer = AssistantAgent(
@@ -63,9 +73,10 @@ def create_agents(llm_config: Dict[str, Any]) -> Dict[str, AgentType]:
         code_execution_config=user_proxy_config["code_execution_config"],
     )
     # Register specific functions for each agent
-    subtitle_translator.register_for_llm(
-        description="Get definitions of words from wiktionary.com (limited attempts and words)"
-    )(get_wiktionary_definition)
+    if enable_definition_tool:
+        subtitle_translator.register_for_llm(
+            description="Get definitions of words from wiktionary.com (limited attempts and words)"
+        )(get_wiktionary_definition)
     subtitle_formatter.register_for_llm(
         description="Format subtitles according to specified rules"
     )(format_subtitles)
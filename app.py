@@ -1,26 +1,52 @@
 # app.py
 
+import base64
+import html
 import logging
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 import streamlit as st
 from dotenv import load_dotenv
 
+from agent_models import (
+    ChunkReport,
+    PreflightPlan,
+    QualityLimits,
+    QualitySummary,
+    ResourceSnapshot,
+    TranslationOptions,
+    VersionDiffReport,
+)
 from constants import (
+    CHUNK_JOB_IDLE_TIMEOUT_SECONDS,
+    CHUNK_QUEUE_DEFAULT_URL,
+    CHUNK_QUEUE_URL_ENV,
+    CHUNK_SIZE_CANDIDATES,
+    COMMON_FRAMERATES,
+    CUE_EDITOR_PAGE_SIZES,
     DATA_DIR,
+    HUGGINGFACE_API_TOKEN_ENV,
     HUGGINGFACE_MODEL_GEMMA,
     HUGGINGFACE_MODEL_META_LLAMA_70B,
     HUGGINGFACE_MODEL_META_LLAMA_405B,
     HUGGINGFACE_MODEL_MIXTRAL,
+    INLINE_OUTPUT_MAX_BYTES,
     LANGUAGE_ENGLISH,
     LANGUAGE_FRENCH,
     LANGUAGE_GERMAN,
     LANGUAGE_ITALIAN,
     LANGUAGE_SPANISH,
     LANGUAGE_TURKISH,
+    LLM_CACHE_MODE_ENV,
+    LLM_CACHE_MODE_OFF,
+    LLM_CACHE_MODES,
+    LLM_REQUESTS_PER_MINUTE_ENV,
+    LLM_TOKENS_PER_MINUTE_ENV,
+    MIN_SUBTITLE_GAP_MS,
     MODEL_PROVIDER_HUGGINGFACE,
     MODEL_PROVIDER_OLLAMA,
     MODEL_PROVIDER_OPENAI,
@@ -31,42 +57,291 @@ from constants import (
     OPENAI_MODEL_GPT4O_MINI,
     OPENAI_MODEL_O1_MINI,
     OPENAI_MODEL_O1_PREVIEW,
+    PIPELINE_FORMAT_WORKERS,
+    PIPELINE_REVIEW_WORKERS,
+    PIPELINE_TRANSLATE_WORKERS,
+    QUALITY_MAX_CPS,
+    REVIEW_SAMPLE_RATE,
+    SPEAKER_SELECTION_AUTO,
+    SPEAKER_SELECTION_FSM,
     SRT_EXTENSION,
+    TIMING_OPERATION_FRAMERATE,
+    TIMING_OPERATION_REPAIR,
+    TIMING_OPERATION_RESYNC,
+    TIMING_OPERATION_SHIFT,
+    UTF8_ENCODING,
 )
-from translate import translate_srt_main
+from cue_editor import CueDocument
+from document_cache import DOCUMENT_CACHE
+from job_report import build_job_report, write_job_report
+from output_writer import OrderedSubtitleWriter
+from preflight import format_duration, plan_job, rate_limit_from_env
+from resource_profile import RESOURCE_PROFILER, profiled
+from transcript_store import get_transcript_sink
 from utils import (
     calculate_subtitle_stats,
+    convert_subtitle_framerate,
     ensure_byte_order_mark,
     load_css,
     load_subtitle_file,
-    merge_subtitles,
     read_srt_file,
     remove_byte_order_mark,
+    repair_subtitle_timings,
+    resync_subtitle_timings,
     save_uploaded_file,
     set_api_keys,
     setup_logging,
+    shift_subtitle_timings,
     split_subtitles,
 )
 
+# numpy is heavy to import, so version diffs are only loaded when requested
+if TYPE_CHECKING:
+    from version_diff import VersionDiff
+
+
+def download_link(file_path: str) -> str:
+    """A download link for a file on disk, built when the user asks for it.
+
+    st.download_button would rerun the script when clicked and hold the file
+    in the media store for as long as it is shown; a data URL link
+    downloads without a rerun and is gone on the next one.
+    """
+    with open(file_path, "rb") as f:
+        data = base64.b64encode(f.read()).decode()
+    file_name = html.escape(os.path.basename(file_path))
+    return (
+        f'<a href="data:application/x-subrip;base64,{data}" download="{file_name}">'
+        f"Download {file_name}</a>"
+    )
+
+
+def load_translation_output(output_path: str) -> Optional[str]:
+    """The translated file's content, or None when it is too large to keep in session state."""
+    size = os.path.getsize(output_path)
+    if size > INLINE_OUTPUT_MAX_BYTES:
+        logging.info(
+            f"Translation of {size / 1024:.0f} KB stays on disk at {output_path}"
+        )
+        return None
+    return read_srt_file(output_path)
+
+
+def uploaded_file_changed(uploaded_file: Any, state_key: str) -> bool:
+    """Whether an uploader holds a different file than when it was last loaded.
+
+    Uploaders keep their file across reruns; loading it again on every rerun
+    would overwrite whatever was done to the content since.
+    """
+    if st.session_state.get(state_key) == uploaded_file.file_id:
+        return False
+    st.session_state[state_key] = uploaded_file.file_id
+    return True
 
+
+@profiled("initiate_translation_process")
 def initiate_translation_process(
-    file_content: str, original_language: str, target_language: str
-) -> str:
+    file_content: str,
+    original_language: str,
+    target_language: str,
+    options: Optional[TranslationOptions] = None,
+    output_path: Optional[str] = None,
+    plan: Optional[PreflightPlan] = None,
+    input_file_path: Optional[str] = None,
+    version_diff_report: Optional[VersionDiffReport] = None,
+) -> Optional[str]:
     logging.info("Initiating translation process")
-    chunk_data = split_subtitles(file_content)
-    translated_chunks = []
-    for chunk in chunk_data:
-        translated_chunk = translate_srt_main(
-            chunk,
+    # Imported here so the agent stack only loads once a translation starts
+    from chunk_tuner import ChunkStatsStore, translation_aligned
+    from translate import translate_srt_main
+
+    options = options or TranslationOptions()
+    output_path = output_path or os.path.join(DATA_DIR, f"translation{SRT_EXTENSION}")
+    llm_config = options.llm_config or st.session_state.llm_config
+    model = llm_config["config_list"][0]["model"]
+
+    # Without a fixed chunk size the plan uses the one with the best throughput in past runs
+    chunk_stats = ChunkStatsStore()
+    plan = plan or plan_job(
+        file_content,
+        model,
+        original_language,
+        target_language,
+        options=options,
+        store=chunk_stats,
+    )
+    chunk_size = plan.chunk_size
+    st.session_state.chunk_size = chunk_size
+
+    chunk_data = split_subtitles(file_content, chunk_size)
+    chunk_reports = []
+
+    # Verified cues are shown while the translator's reply is still streaming
+    total_cues = sum(len(chunk.strip().split("\n\n")) for chunk in chunk_data)
+    progress = st.progress(0.0, text="Translating...")
+    cue_preview = st.empty()
+    partial_output = st.empty()
+    progress_state = {"verified_cues": 0}
+
+    def show_verified_cue(cue: Dict[str, str]):
+        progress_state["verified_cues"] += 1
+        progress.progress(
+            min(progress_state["verified_cues"] / total_cues, 1.0),
+            text=f"Verified {progress_state['verified_cues']} of {total_cues} cues",
+        )
+        cue_preview.text(
+            f"{cue['index']}\n{cue['start_time']} --> {cue['end_time']}\n{cue['text']}"
+        )
+
+    # Chunks go to disk as they finish, the partial file can be read mid-job
+    pipeline_report = None
+    with OrderedSubtitleWriter(output_path, len(chunk_data)) as writer:
+
+        def finish_chunk(
+            chunk_index: int, translated_chunk: str, chunk_report: ChunkReport
+        ):
+            writer.submit(chunk_index, translated_chunk)
+            chunk_reports.append(chunk_report)
+            chunk_stats.record(
+                model,
+                original_language,
+                target_language,
+                chunk_size,
+                cue_count=chunk_report.cue_count,
+                seconds=chunk_report.seconds,
+                tokens=chunk_report.prompt_tokens + chunk_report.completion_tokens,
+                aligned=translation_aligned(chunk_data[chunk_index], translated_chunk),
+                llm_calls=chunk_report.llm_calls,
+            )
+            progress_state["verified_cues"] = sum(
+                report.cue_count for report in chunk_reports
+            )
+            progress.progress(
+                progress_state["verified_cues"] / total_cues,
+                text=f"Translated {len(chunk_reports)} of {len(chunk_data)} chunks",
+            )
+            partial_output.caption(
+                f"Written so far to {writer.partial_path}: {writer.next_chunk} of "
+                f"{len(chunk_data)} chunks ({writer.bytes_written / 1024:.0f} KB)"
+            )
+
+        if options.chunk_queue_url:
+            from chunk_worker import run_distributed_translation
+
+            def show_queue_progress(counts: Dict[str, int]):
+                cue_preview.text(
+                    f"Chunk queue: {counts['queued']} waiting, "
+                    f"{counts['leased']} with workers, {counts['done']} done"
+                )
+
+            try:
+                run_distributed_translation(
+                    chunk_data,
+                    original_language,
+                    target_language,
+                    llm_config,
+                    options,
+                    on_chunk=finish_chunk,
+                    idle_timeout_seconds=CHUNK_JOB_IDLE_TIMEOUT_SECONDS,
+                    on_progress=show_queue_progress,
+                )
+            except TimeoutError as e:
+                st.error(str(e))
+                st.stop()
+        elif options.pipeline_enabled:
+            from pipeline import run_translation_pipeline
+
+            _, pipeline_report = run_translation_pipeline(
+                chunk_data,
+                original_language,
+                target_language,
+                llm_config,
+                options,
+                on_chunk=finish_chunk,
+            )
+        else:
+            for chunk_index, chunk in enumerate(chunk_data):
+                chunk_report = ChunkReport(
+                    chunk_index=chunk_index,
+                    cue_count=len(chunk.strip().split("\n\n")),
+                )
+                translated_chunk = translate_srt_main(
+                    chunk,
+                    original_language,
+                    target_language,
+                    options=options,
+                    chunk_report=chunk_report,
+                    on_cue=show_verified_cue,
+                )
+                finish_chunk(chunk_index, translated_chunk, chunk_report)
+    chunk_reports.sort(key=lambda report: report.chunk_index)
+    failed = [report for report in chunk_reports if report.error]
+    if failed:
+        st.warning(
+            f"{len(failed)} chunks kept their original text: "
+            + ", ".join(f"chunk {report.chunk_index + 1}" for report in failed)
+        )
+    cue_preview.empty()
+    partial_output.empty()
+    st.session_state.chunk_reports = chunk_reports
+    st.session_state.output_file_path = output_path
+    st.session_state.pipeline_report = pipeline_report
+    st.session_state.version_diff_report = version_diff_report
+    st.session_state.job_report_path = write_job_report(
+        build_job_report(
+            plan,
+            chunk_reports,
+            input_file_path,
+            output_path,
+            pipeline_report,
+            version_diff_report,
+        )
+    )
+    DOCUMENT_CACHE.log_stats()
+    return load_translation_output(output_path)
+
+
+def initiate_incremental_translation(
+    version_diff: "VersionDiff",
+    original_language: str,
+    target_language: str,
+    options: Optional[TranslationOptions] = None,
+    output_path: Optional[str] = None,
+    plan: Optional[PreflightPlan] = None,
+    input_file_path: Optional[str] = None,
+) -> Optional[str]:
+    """Translate only the new and edited cues of a revised file and merge in the reused ones."""
+    output_path = output_path or os.path.join(DATA_DIR, f"translation{SRT_EXTENSION}")
+    st.session_state.version_diff_report = version_diff.report
+    translated_changes = ""
+    if version_diff.pending:
+        changes_path = str(Path(output_path).with_suffix(f".changes{SRT_EXTENSION}"))
+        initiate_translation_process(
+            version_diff.pending_srt,
             original_language,
             target_language,
+            options=options,
+            output_path=changes_path,
+            plan=plan,
+            input_file_path=input_file_path,
+            version_diff_report=version_diff.report,
         )
-        translated_chunks.append(translated_chunk)
-    return merge_subtitles(translated_chunks)
+        # Read from disk, the changes may be too large to come back inline
+        translated_changes = read_srt_file(changes_path)
+        os.remove(changes_path)
+    merged_content = version_diff.merge(translated_changes)
+    # Written as a single chunk, so the file is moved into place atomically
+    with OrderedSubtitleWriter(output_path, 1) as writer:
+        writer.submit(0, merged_content)
+    st.session_state.output_file_path = output_path
+    return load_translation_output(output_path)
 
 
 def generate_llm_config(
-    model_provider: str, model: str, temperature: float
+    model_provider: str,
+    model: str,
+    temperature: float,
+    cache_mode: str = LLM_CACHE_MODE_OFF,
 ) -> Dict[str, Any]:
     llm_config: Dict[str, Any] = {"temperature": temperature}
     if model_provider == MODEL_PROVIDER_OPENAI:
@@ -81,7 +356,7 @@ def generate_llm_config(
             }
         ]
     elif model_provider == MODEL_PROVIDER_HUGGINGFACE:
-        api_key = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+        api_key = os.getenv(HUGGINGFACE_API_TOKEN_ENV)
         llm_config["config_list"] = [
             {
                 "base_url": OLLAMA_BASE_URL,
@@ -90,6 +365,10 @@ def generate_llm_config(
                 "use_docker": False,
             }
         ]
+    if cache_mode != LLM_CACHE_MODE_OFF:
+        from llm_cache import apply_llm_cache
+
+        apply_llm_cache(llm_config, cache_mode)
     return llm_config
 
 
@@ -138,6 +417,7 @@ def main():
     input_file_path: Optional[str] = None
     output_file_path: Optional[str] = None
     issues: Optional[List[str]] = None
+    quality_summary: Optional[QualitySummary] = None
 
     # New radio button for selecting mode
     mode = st.radio(
@@ -195,10 +475,143 @@ def main():
                 value=0.0,
                 step=0.1,
             )
+            default_cache_mode = os.getenv(LLM_CACHE_MODE_ENV, LLM_CACHE_MODE_OFF)
+            cache_mode = st.selectbox(
+                "LLM Response Cache",
+                LLM_CACHE_MODES,
+                index=(
+                    LLM_CACHE_MODES.index(default_cache_mode)
+                    if default_cache_mode in LLM_CACHE_MODES
+                    else 0
+                ),
+                help="record: reuse recorded responses and record new ones. "
+                "replay: serve recorded responses only, without network access. "
+                "passthrough: always call the model and report how many requests were recorded.",
+            )
 
             # Generate and store llm_config in session state
             st.session_state.llm_config = generate_llm_config(
-                model_provider, model, temperature
+                model_provider, model, temperature, cache_mode
+            )
+
+            # Review gate settings
+            review_gate_enabled = st.checkbox(
+                "Skip review for clean chunks",
+                value=True,
+                help="Only send chunks that fail the local checks, plus a random sample, to the Translation_Reviewer.",
+            )
+            review_sample_rate = st.slider(
+                "Review Sample Rate",
+                min_value=0.0,
+                max_value=1.0,
+                value=REVIEW_SAMPLE_RATE,
+                step=0.05,
+                disabled=not review_gate_enabled,
+            )
+            glossary_prefetch_enabled = st.checkbox(
+                "Prefetch word definitions",
+                value=True,
+                help="Look up uncommon words before translating instead of during the conversation.",
+            )
+            fixed_agent_order = st.checkbox(
+                "Fixed agent order",
+                value=True,
+                help="Hand over Translator -> Reviewer -> Formatter directly instead of asking the chat manager LLM who speaks next.",
+            )
+            early_termination_enabled = st.checkbox(
+                "Stop at the first valid translation",
+                value=True,
+                help="End a chunk's conversation as soon as a message passes the alignment and subtitle checks.",
+            )
+            streaming_enabled = st.checkbox(
+                "Stream translations",
+                value=True,
+                help="Check cues while the translation streams in and retry at once when it goes wrong.",
+            )
+            chunk_size = st.selectbox(
+                "Chunk Size",
+                ["Auto"] + CHUNK_SIZE_CANDIDATES,
+                help="Subtitles per conversation. Auto picks the size with the best throughput in past runs of this model and language pair.",
+            )
+            requests_per_minute = st.number_input(
+                "Requests per Minute Limit",
+                min_value=0,
+                value=rate_limit_from_env(LLM_REQUESTS_PER_MINUTE_ENV) or 0,
+                help="Provider quota used for the time estimate, 0 for none.",
+            )
+            tokens_per_minute = st.number_input(
+                "Tokens per Minute Limit",
+                min_value=0,
+                value=rate_limit_from_env(LLM_TOKENS_PER_MINUTE_ENV) or 0,
+                help="Provider quota used for the time estimate, 0 for none.",
+            )
+            max_cps = st.number_input(
+                "Max Reading Speed (CPS)",
+                min_value=1.0,
+                value=QUALITY_MAX_CPS,
+                step=1.0,
+                help="Characters per second above which cues are flagged to the formatter, the review gate and in the statistics.",
+            )
+            st.session_state.quality_limits = QualityLimits(max_cps=max_cps)
+            pipeline_enabled = st.checkbox(
+                "Pipelined stages",
+                value=False,
+                help="Run translate, review and format/verify as separate stages, so chunks overlap.",
+            )
+            translate_workers = st.number_input(
+                "Translate Workers",
+                min_value=1,
+                value=PIPELINE_TRANSLATE_WORKERS,
+                disabled=not pipeline_enabled,
+            )
+            review_workers = st.number_input(
+                "Review Workers",
+                min_value=1,
+                value=PIPELINE_REVIEW_WORKERS,
+                disabled=not pipeline_enabled,
+            )
+            format_workers = st.number_input(
+                "Format Workers",
+                min_value=1,
+                value=PIPELINE_FORMAT_WORKERS,
+                disabled=not pipeline_enabled,
+            )
+            local_formatter = st.checkbox(
+                "Local formatter",
+                value=True,
+                disabled=not pipeline_enabled,
+                help="Format and verify chunks without the Subtitle_Formatter LLM.",
+            )
+            distributed = st.checkbox(
+                "Distributed workers",
+                value=False,
+                help="Publish chunks to a queue and let `python chunk_worker.py work` processes on any node translate them.",
+            )
+            chunk_queue_url = st.text_input(
+                "Chunk Queue",
+                value=os.getenv(CHUNK_QUEUE_URL_ENV) or CHUNK_QUEUE_DEFAULT_URL,
+                disabled=not distributed,
+                help="spool://<shared directory>, sqlite:///<file> or redis://host:port/db",
+            )
+            st.session_state.translation_options = TranslationOptions(
+                review_gate_enabled=review_gate_enabled,
+                review_sample_rate=review_sample_rate,
+                glossary_prefetch_enabled=glossary_prefetch_enabled,
+                speaker_selection=(
+                    SPEAKER_SELECTION_FSM
+                    if fixed_agent_order
+                    else SPEAKER_SELECTION_AUTO
+                ),
+                early_termination_enabled=early_termination_enabled,
+                streaming_enabled=streaming_enabled,
+                chunk_size=None if chunk_size == "Auto" else chunk_size,
+                pipeline_enabled=pipeline_enabled,
+                translate_workers=translate_workers,
+                review_workers=review_workers,
+                format_workers=format_workers,
+                local_formatter=local_formatter,
+                quality_limits=st.session_state.quality_limits,
+                chunk_queue_url=chunk_queue_url if distributed else None,
             )
 
             # Language selection
@@ -223,16 +636,117 @@ def main():
                 input_file_path = save_uploaded_file(uploaded_file, suffix="-original")
                 st.session_state.file_content = read_srt_file(input_file_path)
 
+            # A revised file only needs its new and edited cues translated
+            version_diff = None
+            if st.checkbox(
+                "Update a previous translation",
+                help="Reuse the translation of an earlier version of this file and only translate new or edited cues.",
+            ):
+                previous_source_file = st.file_uploader(
+                    "Previous Version of the Original", type=SRT_EXTENSION
+                )
+                previous_translation_file = st.file_uploader(
+                    "Translation of the Previous Version", type=SRT_EXTENSION
+                )
+                if (
+                    previous_source_file is not None
+                    and previous_translation_file is not None
+                    and st.session_state.file_content is not None
+                ):
+                    from version_diff import diff_source_versions
+
+                    version_diff = diff_source_versions(
+                        read_srt_file(
+                            save_uploaded_file(previous_source_file, suffix="-previous")
+                        ),
+                        read_srt_file(
+                            save_uploaded_file(
+                                previous_translation_file, suffix="-previous-tr"
+                            )
+                        ),
+                        st.session_state.file_content,
+                    )
+                    diff_report = version_diff.report
+                    st.info(
+                        f"Reusing {diff_report.reused} of {diff_report.total_cues} cues "
+                        f"({diff_report.retimed} re-timed), translating {diff_report.retranslated} "
+                        f"({diff_report.edited} edited, {diff_report.new} new), "
+                        f"{diff_report.removed} removed"
+                    )
+            content_to_translate = (
+                version_diff.pending_srt
+                if version_diff is not None
+                else st.session_state.file_content
+            )
+
+            preflight_plan = None
+            if content_to_translate:
+                preflight_plan = plan_job(
+                    content_to_translate,
+                    model,
+                    st.session_state.original_language,
+                    st.session_state.target_language,
+                    options=st.session_state.translation_options,
+                    requests_per_minute=requests_per_minute or None,
+                    tokens_per_minute=tokens_per_minute or None,
+                )
+                st.info(
+                    f"Estimate: {len(preflight_plan.chunks)} chunks of {preflight_plan.chunk_size} cues, "
+                    f"~{preflight_plan.llm_calls:.0f} LLM calls, "
+                    f"~{preflight_plan.prompt_tokens:,} prompt + {preflight_plan.completion_tokens:,} completion tokens, "
+                    f"about {format_duration(preflight_plan.eta_seconds)} (limited by {preflight_plan.bottleneck})"
+                )
+                if not preflight_plan.history_samples:
+                    st.caption(
+                        "No recorded runs for this model and chunk size yet, calls and time use defaults."
+                    )
+
             if st.button("Translate"):
                 if st.session_state.file_content is None:
                     st.error("Please upload a subtitle file to translate.")
                 else:
-                    # Perform translation using the new function
-                    st.session_state.translated_content = initiate_translation_process(
-                        st.session_state.file_content,
-                        st.session_state.original_language,
-                        st.session_state.target_language,
+                    output_path = os.path.join(
+                        DATA_DIR,
+                        f"{Path(input_file_path or 'translation').stem}-tr{SRT_EXTENSION}",
                     )
+                    # Failed and stopped jobs are profiled too, they may be the ones that leak
+                    try:
+                        if version_diff is not None:
+                            st.session_state.translated_content = (
+                                initiate_incremental_translation(
+                                    version_diff,
+                                    st.session_state.original_language,
+                                    st.session_state.target_language,
+                                    options=st.session_state.translation_options,
+                                    plan=preflight_plan,
+                                    input_file_path=input_file_path,
+                                    output_path=output_path,
+                                )
+                            )
+                        else:
+                            # Perform translation using the new function
+                            st.session_state.translated_content = (
+                                initiate_translation_process(
+                                    st.session_state.file_content,
+                                    st.session_state.original_language,
+                                    st.session_state.target_language,
+                                    options=st.session_state.translation_options,
+                                    plan=preflight_plan,
+                                    input_file_path=input_file_path,
+                                    output_path=output_path,
+                                )
+                            )
+                    finally:
+                        RESOURCE_PROFILER.snapshot("translation", st.session_state)
+
+            output_file_path = st.session_state.get("output_file_path")
+            if output_file_path and os.path.exists(output_file_path):
+                st.caption(
+                    f"Output: {output_file_path} "
+                    f"({os.path.getsize(output_file_path) / 1024:.0f} KB)"
+                )
+                if st.button("Prepare Download"):
+                    st.markdown(download_link(output_file_path), unsafe_allow_html=True)
 
             if st.session_state.translated_content:
                 if st.button("Save Translation"):
@@ -247,7 +761,11 @@ def main():
 
     with col2:
         st.subheader("Original Subtitles")
-        if st.session_state.file_content is not None:
+        # The cue editor shows large files a page at a time instead
+        cue_editor_active = (
+            mode == "Edit a subtitle file" and st.session_state.translated_content
+        )
+        if st.session_state.file_content is not None and not cue_editor_active:
             content_without_bom = remove_byte_order_mark(st.session_state.file_content)
             st.text_area(
                 "Original Subtitles",
@@ -264,28 +782,35 @@ def main():
                 type=SRT_EXTENSION,
             )
             if original_file is not None:
-                st.session_state.original_file_path = save_uploaded_file(
-                    original_file, suffix="-original"
-                )
-                original_content = load_subtitle_file(
-                    st.session_state.original_file_path
-                )
-                if original_content:
-                    st.session_state.file_content = original_content
-                    logging.info(
-                        f"Files loaded: Original - {st.session_state.original_file_path}"
+                if uploaded_file_changed(original_file, "original_file_id"):
+                    st.session_state.original_file_path = save_uploaded_file(
+                        original_file, suffix="-original"
                     )
-                    if st.button("Show File", key="show_edited_original_file"):
-                        st.session_state.file_content = ensure_byte_order_mark(
-                            original_content
+                    original_content = load_subtitle_file(
+                        st.session_state.original_file_path
+                    )
+                    if original_content:
+                        st.session_state.file_content = original_content
+                        logging.info(
+                            f"Files loaded: Original - {st.session_state.original_file_path}"
                         )
-                        st.experimental_rerun()
-                else:
-                    st.error("Failed to load subtitle files.")
+                    else:
+                        st.session_state.original_file_id = None
+                        st.error("Failed to load subtitle files.")
+                if st.session_state.file_content and st.button(
+                    "Show File", key="show_edited_original_file"
+                ):
+                    st.session_state.file_content = ensure_byte_order_mark(
+                        st.session_state.file_content
+                    )
+                    st.experimental_rerun()
 
     with col3:
         st.subheader("Translated/Edited Subtitles")
-        if st.session_state.translated_content is not None:
+        if (
+            st.session_state.translated_content is not None
+            and mode != "Edit a subtitle file"
+        ):
             content_without_bom = remove_byte_order_mark(
                 st.session_state.translated_content
             )
@@ -305,26 +830,36 @@ def main():
                 type=SRT_EXTENSION,
             )
             if edited_file is not None:
-                st.session_state.edited_file_path = save_uploaded_file(
-                    edited_file, suffix="-edited"
-                )
-                edited_content = load_subtitle_file(st.session_state.edited_file_path)
-                if edited_content:
-                    st.session_state.translated_content = edited_content
-                    logging.info(
-                        f"Files loaded: Edited - {st.session_state.edited_file_path}"
+                if uploaded_file_changed(edited_file, "edited_file_id"):
+                    st.session_state.edited_file_path = save_uploaded_file(
+                        edited_file, suffix="-edited"
+                    )
+                    edited_content = load_subtitle_file(
+                        st.session_state.edited_file_path
                     )
-                    if st.button("Show File", key="show_edited_translated_file"):
-                        st.session_state.translated_content = ensure_byte_order_mark(
-                            edited_content
+                    if edited_content:
+                        st.session_state.translated_content = edited_content
+                        # A new file starts a new cue document
+                        st.session_state.cue_document = None
+                        logging.info(
+                            f"Files loaded: Edited - {st.session_state.edited_file_path}"
                         )
-                        st.experimental_rerun()
-                else:
-                    st.error("Failed to load subtitle files.")
+                    else:
+                        st.session_state.edited_file_id = None
+                        st.error("Failed to load subtitle files.")
+                if st.session_state.translated_content and st.button(
+                    "Show File", key="show_edited_translated_file"
+                ):
+                    st.session_state.translated_content = ensure_byte_order_mark(
+                        st.session_state.translated_content
+                    )
+                    st.session_state.cue_document = None
+                    st.experimental_rerun()
 
     # Edit a subtitle file
     if mode == "Edit a subtitle file":
         if st.session_state.translated_content:
+            render_cue_editor()
             if st.button("Save Edited File"):
                 confirm_overwrite = st.warning(
                     "Are you sure you want to overwrite the original file?", icon="⚠️"
@@ -334,6 +869,8 @@ def main():
                     st.button("Overwrite", on_click=overwrite_file)
                 with col_confirm2:
                     st.button("Cancel", on_click=cancel_overwrite)
+            with st.expander("Timing Tools"):
+                render_timing_tools()
 
     # Add a new section for subtitle statistics
     st.markdown("---")
@@ -348,6 +885,15 @@ def main():
                 issues = calculate_subtitle_stats(
                     st.session_state.file_content, st.session_state.translated_content
                 )
+                # numpy is heavy to import, so the analysis is only loaded when requested
+                from quality_analysis import analyze_quality
+
+                analysis = analyze_quality(
+                    remove_byte_order_mark(st.session_state.translated_content),
+                    st.session_state.get("quality_limits"),
+                )
+                issues.extend(analysis.issues())
+                quality_summary = analysis.summary()
             else:
                 st.error(
                     "Both original and translated content must be available to calculate statistics."
@@ -355,6 +901,8 @@ def main():
     with col_stats2:
         if issues:
             st.text_area("Subtitle Issues", "\n".join(issues), height=200)
+        if quality_summary:
+            render_quality_summary(quality_summary)
 
     # Debug information
     st.markdown("---")
@@ -367,6 +915,201 @@ def main():
         st.write(
             f"Translated content preview: {st.session_state.translated_content[:100]}..."
         )
+    if st.session_state.get("chunk_reports"):
+        st.write(f"Chunk size: {st.session_state.get('chunk_size')}")
+        if st.session_state.get("pipeline_report"):
+            pipeline_report = st.session_state.pipeline_report
+            st.write(
+                f"Pipeline: {pipeline_report.seconds:.1f}s, bottleneck {pipeline_report.bottleneck}"
+            )
+            st.table(
+                [
+                    {
+                        "Stage": stage.name,
+                        "Workers": stage.workers,
+                        "Chunks": stage.items,
+                        "Utilisation": f"{stage.utilisation:.0%}",
+                        "Mean queue wait (ms)": round(stage.mean_queue_wait_ms),
+                        "Max queue wait (ms)": round(stage.max_queue_wait_ms),
+                        "Blocked (s)": round(stage.blocked_seconds, 1),
+                    }
+                    for stage in pipeline_report.stages
+                ]
+            )
+        if st.session_state.get("version_diff_report"):
+            diff_report = st.session_state.version_diff_report
+            st.write(
+                f"Version diff: {diff_report.reused} cues reused, "
+                f"{diff_report.retranslated} retranslated"
+            )
+        if st.session_state.get("job_report_path"):
+            st.write(f"Job report: {st.session_state.job_report_path}")
+        gate_decisions = [
+            report.review_gate
+            for report in st.session_state.chunk_reports
+            if report.review_gate is not None
+        ]
+        skipped = [d for d in gate_decisions if not d.review_required]
+        st.write(
+            f"Review gate: {len(skipped)} of {len(gate_decisions)} chunks skipped review, "
+            f"saving {sum(d.llm_calls_saved for d in skipped)} LLM calls and "
+            f"~{sum(d.estimated_tokens_saved for d in skipped)} tokens"
+        )
+        prefetch_reports = [
+            report.glossary_prefetch
+            for report in st.session_state.chunk_reports
+            if report.glossary_prefetch is not None
+        ]
+        st.write(
+            f"Definition prefetch: {sum(p.glossary_terms for p in prefetch_reports)} glossary terms, "
+            f"~{sum(p.estimated_tool_round_trips_removed for p in prefetch_reports)} tool round trips removed, "
+            f"{sum(p.definition_tool_calls for p in prefetch_reports)} definition tool calls made"
+        )
+        transition_reports = [
+            report.speaker_transitions
+            for report in st.session_state.chunk_reports
+            if report.speaker_transitions is not None
+        ]
+        st.write(
+            f"Speaker selection: {sum(t.manager_llm_calls for t in transition_reports)} manager LLM calls, "
+            f"{sum(t.retries for t in transition_reports)} retries over {len(transition_reports)} chunks"
+        )
+        termination_reports = [
+            report.early_termination
+            for report in st.session_state.chunk_reports
+            if report.early_termination is not None
+        ]
+        st.write(
+            f"Early termination: {sum(1 for t in termination_reports if t.terminated_by)} of "
+            f"{len(termination_reports)} chunks stopped early, saving "
+            f"{sum(t.rounds_saved for t in termination_reports)} rounds and an estimated "
+            f"~{sum(t.estimated_seconds_saved for t in termination_reports):.1f}s"
+        )
+        streaming_reports = [
+            report.streaming
+            for report in st.session_state.chunk_reports
+            if report.streaming is not None
+        ]
+        first_cue_times = [
+            s.time_to_first_cue_ms
+            for s in streaming_reports
+            if s.time_to_first_cue_ms is not None
+        ]
+        st.write(
+            f"Streaming: {sum(s.aborted_streams for s in streaming_reports)} of "
+            f"{sum(s.streams for s in streaming_reports)} streams aborted, "
+            f"~{sum(s.wasted_completion_tokens + s.wasted_prompt_tokens for s in streaming_reports)} tokens wasted, "
+            f"time to first cue {min(first_cue_times, default=0):.0f}-{max(first_cue_times, default=0):.0f} ms"
+        )
+        with st.expander("Chunk Reports"):
+            st.json([report.model_dump() for report in st.session_state.chunk_reports])
+        with st.expander("Chat Transcripts"):
+            sink = get_transcript_sink()
+            st.write(
+                f"Written: {sink.written}, pending: {sink.pending}, dropped: {sink.dropped}"
+            )
+            transcripts = list(sink.recent)
+            if transcripts:
+                position = st.selectbox(
+                    "Transcript",
+                    range(len(transcripts)),
+                    index=len(transcripts) - 1,
+                    format_func=lambda i: f"Chunk {transcripts[i].get('chunk_index')}",
+                )
+                st.json(transcripts[position]["messages"])
+    if "llm_cache" in sys.modules:
+        from llm_cache import LLM_CACHE_STATS
+
+        st.write(f"LLM response cache: {LLM_CACHE_STATS.as_dict()}")
+    st.write(f"Document cache: {DOCUMENT_CACHE.as_dict()}")
+    if st.checkbox(
+        "Profile memory and CPU",
+        value=RESOURCE_PROFILER.enabled,
+        help="Trace allocations and time the translation stages. Slows translations down.",
+    ):
+        RESOURCE_PROFILER.enable()
+    else:
+        RESOURCE_PROFILER.disable()
+    if RESOURCE_PROFILER.latest is not None:
+        render_resource_snapshot(RESOURCE_PROFILER.latest)
+
+
+def render_resource_snapshot(snapshot: ResourceSnapshot):
+    st.write(
+        f"Resource snapshot '{snapshot.label}' at {snapshot.created_at}: "
+        f"RSS {snapshot.rss_kb} kB, traced {snapshot.traced_kb:,.0f} kB "
+        f"(peak {snapshot.traced_peak_kb:,.0f} kB), "
+        f"{sum(snapshot.agent_counts.values())} live agents holding "
+        f"{snapshot.agent_messages} messages {snapshot.agent_counts}"
+    )
+    if snapshot.duplicated_session_text:
+        st.write(
+            "Session state keys holding copies of the same text: "
+            + "; ".join(", ".join(keys) for keys in snapshot.duplicated_session_text)
+        )
+    stages_tab, growth_tab, allocations_tab, session_tab = st.tabs(
+        ["Stages", "Growth", "Top Allocators", "Session State"]
+    )
+    with stages_tab:
+        st.table([stage.model_dump() for stage in snapshot.stages])
+    with growth_tab:
+        st.table(
+            [
+                {
+                    "Location": stat.location,
+                    "Size (kB)": stat.size_kb,
+                    "Change (kB)": stat.size_kb_diff,
+                    "Blocks": stat.count,
+                    "Change (blocks)": stat.count_diff,
+                }
+                for stat in snapshot.top_growth
+            ]
+        )
+    with allocations_tab:
+        st.table(
+            [
+                {
+                    "Location": stat.location,
+                    "Size (kB)": stat.size_kb,
+                    "Blocks": stat.count,
+                }
+                for stat in snapshot.top_allocations
+            ]
+        )
+    with session_tab:
+        st.json(snapshot.session_state_kb)
+
+
+def render_quality_summary(summary: QualitySummary):
+    flagged = ", ".join(
+        f"{rule.replace('_', ' ')}: {count}"
+        for rule, count in summary.flagged.items()
+        if count
+    )
+    st.caption(
+        f"{summary.flagged_cues} of {summary.cue_count} cues flagged"
+        f"{f' ({flagged})' if flagged else ''}, analyzed in {summary.analysis_ms:.1f} ms"
+    )
+    # Tabs switch without a rerun, which would drop the computed statistics
+    tabs = st.tabs(
+        [
+            f"{distribution.name} ({distribution.unit})"
+            for distribution in summary.distributions
+        ]
+    )
+    for tab, distribution in zip(tabs, summary.distributions):
+        with tab:
+            if distribution.p50 is not None:
+                st.caption(
+                    f"Mean {distribution.mean:g}, median {distribution.p50:g}, "
+                    f"95th percentile {distribution.p95:g}, max {distribution.max:g}"
+                )
+            st.table(
+                [
+                    {"Range": bucket, "Cues": count}
+                    for bucket, count in zip(distribution.buckets, distribution.counts)
+                ]
+            )
 
 
 def overwrite_file():
@@ -381,6 +1124,163 @@ def cancel_overwrite():
     st.info("File save cancelled.")
 
 
+def save_cue_edit(document: CueDocument, position: int):
+    document.edit(position, st.session_state[f"cue_{document.generation}_{position}"])
+    st.session_state.translated_content = document.content
+
+
+def render_cue_editor():
+    """Show one page of cues, original and translation side by side.
+
+    Only the visible cues are sent to the browser, and an edit only touches
+    its own cue, so reruns cost the same for any file size.
+    """
+    start = time.perf_counter()
+    # The document holds the edits; it is only built again for a new file
+    document = st.session_state.get("cue_document")
+    if document is None:
+        document = CueDocument(
+            st.session_state.file_content, st.session_state.translated_content
+        )
+        st.session_state.cue_document = document
+    elif document.original_content != st.session_state.file_content:
+        document = CueDocument(st.session_state.file_content, document.content)
+        st.session_state.cue_document = document
+
+    col_page_size, col_page, col_status = st.columns((1, 1, 3))
+    with col_page_size:
+        page_size = st.selectbox(
+            "Cues per Page", CUE_EDITOR_PAGE_SIZES, key="cue_page_size"
+        )
+    with col_page:
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=document.page_count(page_size),
+            value=1,
+            key="cue_page",
+        )
+
+    payload_bytes = 0
+    window = document.window(page - 1, page_size)
+    for position in window:
+        header = document.header(position)
+        original_text = document.original_text(position)
+        text = document.text(position)
+        payload_bytes += len((header + original_text + text).encode("utf-8"))
+        col_header, col_original, col_translation = st.columns((1, 3, 3))
+        with col_header:
+            st.text(header)
+        with col_original:
+            st.text(original_text)
+        with col_translation:
+            st.text_area(
+                "Translation",
+                text,
+                key=f"cue_{document.generation}_{position}",
+                on_change=save_cue_edit,
+                args=(document, position),
+                label_visibility="collapsed",
+            )
+            for issue in document.issues.get(position, []):
+                st.caption(f"⚠️ {issue}")
+
+    with col_status:
+        flagged = sum(1 for issues in document.issues.values() if issues)
+        st.caption(
+            f"Cues {window.start + 1}-{window.stop} of {len(document)}, "
+            f"{len(document.edited)} edited ({flagged} with issues). "
+            f"{payload_bytes / 1024:.1f} KB of cue text sent, "
+            f"rendered in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+
+def render_timing_tools():
+    operation = st.selectbox(
+        "Timing Operation",
+        [
+            TIMING_OPERATION_SHIFT,
+            TIMING_OPERATION_FRAMERATE,
+            TIMING_OPERATION_RESYNC,
+            TIMING_OPERATION_REPAIR,
+        ],
+        key="timing_operation",
+    )
+    if operation == TIMING_OPERATION_SHIFT:
+        st.number_input("Offset (ms)", value=0, step=100, key="timing_offset_ms")
+    elif operation == TIMING_OPERATION_FRAMERATE:
+        st.selectbox(
+            "From Framerate", COMMON_FRAMERATES, index=0, key="timing_from_fps"
+        )
+        st.selectbox("To Framerate", COMMON_FRAMERATES, index=2, key="timing_to_fps")
+    elif operation == TIMING_OPERATION_RESYNC:
+        col_current, col_correct = st.columns(2)
+        with col_current:
+            st.text_input(
+                "First point: current", "00:00:00,000", key="timing_first_old"
+            )
+            st.text_input(
+                "Second point: current", "00:00:00,000", key="timing_second_old"
+            )
+        with col_correct:
+            st.text_input(
+                "First point: correct", "00:00:00,000", key="timing_first_new"
+            )
+            st.text_input(
+                "Second point: correct", "00:00:00,000", key="timing_second_new"
+            )
+    elif operation == TIMING_OPERATION_REPAIR:
+        st.number_input(
+            "Minimum gap (ms)",
+            value=MIN_SUBTITLE_GAP_MS,
+            step=10,
+            key="timing_min_gap_ms",
+        )
+    st.button("Apply", key="apply_timing_operation", on_click=apply_timing_operation)
+
+
+def apply_timing_operation():
+    from subtitle_timing import parse_timestamp
+
+    operation = st.session_state.timing_operation
+    content = st.session_state.translated_content
+    try:
+        if operation == TIMING_OPERATION_SHIFT:
+            content = shift_subtitle_timings(
+                content, int(st.session_state.timing_offset_ms)
+            )
+        elif operation == TIMING_OPERATION_FRAMERATE:
+            content = convert_subtitle_framerate(
+                content,
+                st.session_state.timing_from_fps,
+                st.session_state.timing_to_fps,
+            )
+        elif operation == TIMING_OPERATION_RESYNC:
+            content = resync_subtitle_timings(
+                content,
+                (
+                    parse_timestamp(st.session_state.timing_first_old),
+                    parse_timestamp(st.session_state.timing_first_new),
+                ),
+                (
+                    parse_timestamp(st.session_state.timing_second_old),
+                    parse_timestamp(st.session_state.timing_second_new),
+                ),
+            )
+        elif operation == TIMING_OPERATION_REPAIR:
+            content = repair_subtitle_timings(
+                content, int(st.session_state.timing_min_gap_ms)
+            )
+    except ValueError as e:
+        st.error(f"Timing operation failed: {str(e)}")
+        return
+    st.session_state.translated_content = content
+    # Drop the text area state and the cue document so both show the retimed content
+    st.session_state.pop("translated_subtitles", None)
+    st.session_state.cue_document = None
+    logging.info(f"Applied timing operation: {operation}")
+
+
 if __name__ == "__main__":
     try:
         main()
@@ -0,0 +1,340 @@
+# batch_server.py
+
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from constants import BATCH_SERVER_PORT, LOG_FORMAT
+from subtitle_utils import extract_srt_blocks, render_srt
+from utils import estimate_tokens
+
+# Chat completion request body -> chat completion response body
+Responder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+FILE_CONTENT_PATH = re.compile(r"^/v1/files/([\w-]+)/content$")
+FILE_PATH = re.compile(r"^/v1/files/([\w-]+)$")
+BATCH_PATH = re.compile(r"^/v1/batches/([\w-]+)$")
+BATCH_LIST_LIMIT = 20
+
+
+def _completion(body: Dict[str, Any], content: str) -> Dict[str, Any]:
+    prompt = "".join(message.get("content") or "" for message in body["messages"])
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", ""),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": estimate_tokens(prompt) + estimate_tokens(content),
+        },
+    }
+
+
+def uppercase_responder(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Answers with the prompt's cues in upper case, like `chunk_tuner.FakeLLM`."""
+    blocks = extract_srt_blocks(body["messages"][-1]["content"])
+    return _completion(
+        body,
+        render_srt([{**block, "text": block["text"].upper()} for block in blocks]),
+    )
+
+
+def forwarding_responder(base_url: str, api_key: str = "local") -> Responder:
+    """Sends each request to a synchronous chat completions API, e.g. a local model."""
+    # Imported here so the stand-in runs without the SDK when nothing is forwarded
+    from openai import OpenAI
+
+    client = OpenAI(base_url=base_url, api_key=api_key)
+
+    def respond(body: Dict[str, Any]) -> Dict[str, Any]:
+        return client.chat.completions.create(**body).model_dump()
+
+    return respond
+
+
+class LocalBatchService:
+    """In-memory stand-in for the files and batches endpoints of the Batch API.
+
+    Batches run on a background thread: each request line goes to the
+    responder and its answer to the output file, or to the error file if
+    the responder raised. `delay_seconds` keeps a batch in progress for a
+    while, to exercise polling and resuming.
+    """
+
+    def __init__(
+        self, responder: Responder = uppercase_responder, delay_seconds: float = 0.0
+    ):
+        self.responder = responder
+        self.delay_seconds = delay_seconds
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex}"
+        record = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self.files[file_id] = record
+            self.contents[file_id] = content
+        return record
+
+    def create_batch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if request.get("input_file_id") not in self.contents:
+            raise KeyError(f"No such file: {request.get('input_file_id')}")
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request["completion_window"],
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "metadata": request.get("metadata"),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch_id,), daemon=True).start()
+        return batch
+
+    def list_batches(
+        self, after: Optional[str] = None, limit: int = BATCH_LIST_LIMIT
+    ) -> Dict[str, Any]:
+        """A page of batches, newest first, like the API's cursor pagination."""
+        with self._lock:
+            batches = list(reversed(self.batches.values()))
+        ids = [batch["id"] for batch in batches]
+        start = ids.index(after) + 1 if after in ids else 0
+        page = batches[start : start + limit]
+        return {
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": start + limit < len(batches),
+        }
+
+    def _answer(self, request: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        line = {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": request["custom_id"],
+        }
+        try:
+            body = self.responder(request["body"])
+        except Exception as e:
+            line.update(
+                response=None,
+                error={"code": type(e).__name__, "message": str(e)},
+            )
+            return False, line
+        line.update(
+            response={"status_code": 200, "request_id": line["id"], "body": body},
+            error=None,
+        )
+        return True, line
+
+    def _run_batch(self, batch_id: str):
+        batch = self.batches[batch_id]
+        lines = self.contents[batch["input_file_id"]].decode().splitlines()
+        requests = [json.loads(line) for line in lines if line.strip()]
+        batch["request_counts"]["total"] = len(requests)
+        batch["status"] = "in_progress"
+        batch["in_progress_at"] = int(time.time())
+        time.sleep(self.delay_seconds)
+        outputs, errors = [], []
+        for request in requests:
+            succeeded, line = self._answer(request)
+            (outputs if succeeded else errors).append(json.dumps(line))
+            batch["request_counts"]["completed" if succeeded else "failed"] += 1
+        if outputs:
+            batch["output_file_id"] = self.add_file(
+                ("\n".join(outputs) + "\n").encode(),
+                f"{batch_id}_output.jsonl",
+                "batch_output",
+            )["id"]
+        if errors:
+            batch["error_file_id"] = self.add_file(
+                ("\n".join(errors) + "\n").encode(),
+                f"{batch_id}_error.jsonl",
+                "batch_output",
+            )["id"]
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+        logging.info(f"Batch {batch_id} completed: {batch['request_counts']}")
+
+
+def _multipart_fields(
+    content_type: str, body: bytes
+) -> Dict[str, Tuple[Optional[str], bytes]]:
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): (
+            part.get_filename(),
+            part.get_payload(decode=True),
+        )
+        for part in message.iter_parts()
+    }
+
+
+def _handler(service: LocalBatchService):
+    class BatchRequestHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: Any, raw: bool = False):
+            data = payload if raw else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header(
+                "Content-Type",
+                "application/octet-stream" if raw else "application/json",
+            )
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _not_found(self):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path == "/v1/batches":
+                params = parse_qs(query)
+                return self._send(
+                    200,
+                    service.list_batches(
+                        params.get("after", [None])[0],
+                        int(params.get("limit", [BATCH_LIST_LIMIT])[0]),
+                    ),
+                )
+            if match := FILE_CONTENT_PATH.match(path):
+                content = service.contents.get(match.group(1))
+                if content is None:
+                    return self._not_found()
+                return self._send(200, content, raw=True)
+            if match := FILE_PATH.match(path):
+                record = service.files.get(match.group(1))
+                return self._send(200, record) if record else self._not_found()
+            if match := BATCH_PATH.match(path):
+                batch = service.batches.get(match.group(1))
+                return self._send(200, batch) if batch else self._not_found()
+            self._not_found()
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            if path == "/v1/files":
+                fields = _multipart_fields(self.headers["Content-Type"], self._body())
+                filename, content = fields["file"]
+                purpose = fields["purpose"][1].decode()
+                return self._send(200, service.add_file(content, filename, purpose))
+            if path == "/v1/batches":
+                try:
+                    batch = service.create_batch(json.loads(self._body()))
+                except KeyError as e:
+                    return self._send(400, {"error": {"message": str(e)}})
+                return self._send(200, batch)
+            self._not_found()
+
+        def log_message(self, format: str, *args):
+            logging.debug(f"Batch server: {format % args}")
+
+    return BatchRequestHandler
+
+
+class LocalBatchServer:
+    """Serves a LocalBatchService over HTTP, for `BatchTranslation` or any OpenAI client.
+
+    Use `base_url` as the client's base URL. Port 0 picks a free port.
+    """
+
+    def __init__(
+        self,
+        service: Optional[LocalBatchService] = None,
+        host: str = "127.0.0.1",
+        port: int = BATCH_SERVER_PORT,
+    ):
+        self.service = service or LocalBatchService()
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self.service))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "LocalBatchServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local stand-in for the Batch API."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=BATCH_SERVER_PORT)
+    parser.add_argument(
+        "--forward",
+        metavar="BASE_URL",
+        help="Answer requests with this chat completions API instead of upper-casing the cues",
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="Seconds each batch stays in progress"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    responder = (
+        forwarding_responder(args.forward) if args.forward else uppercase_responder
+    )
+    server = LocalBatchServer(
+        LocalBatchService(responder, args.delay), args.host, args.port
+    )
+    logging.info(f"Batch API stand-in listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+# batch_translation.py
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from agent_models import BatchChunk, BatchJobState, BatchRound
+from agents import load_agent_configs
+from chunk_validator import ChunkValidator
+from constants import (
+    BATCH_COMPLETION_WINDOW,
+    BATCH_DIR,
+    BATCH_ENDPOINT,
+    BATCH_FINAL_STATUSES,
+    BATCH_MAX_ROUNDS,
+    BATCH_POLL_SECONDS,
+    BATCH_STATUS_COMPLETED,
+    BATCH_STATUS_SUBMITTING,
+    DEFAULT_SUBTITLE_CHUNK_SIZE,
+    LANGUAGE_ENGLISH,
+    LANGUAGE_TURKISH,
+    LOG_FORMAT,
+    OPENAI_MODEL_GPT4O_MINI,
+    SRT_EXTENSION,
+    UTF8_ENCODING,
+)
+from definition_prefetch import prefetch_glossary, prefetch_supported
+from pipeline import format_locally, translation_prompt
+from subtitle_utils import verify_alignment
+from utils import merge_subtitles, set_api_keys, split_subtitles
+
+STATE_FILE = "state.json"
+
+
+def create_batch_client(base_url: Optional[str] = None, http_client=None):
+    """An OpenAI client for the Batch API, or for a stand-in at `base_url`."""
+    # Imported here so compiling and inspecting jobs works without the SDK loaded
+    from openai import OpenAI
+
+    # Local stand-ins do not check keys, the SDK still wants one
+    api_key = None if os.getenv("OPENAI_API_KEY") or not base_url else "local"
+    return OpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
+
+
+def _write_replacing(path: str, content: str):
+    # Written aside and renamed, so a crash never leaves a truncated file
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", encoding=UTF8_ENCODING) as f:
+        f.write(content)
+    os.replace(temporary_path, path)
+
+
+def _response_content(line: Dict[str, Any]) -> str:
+    """The reply of a Batch API output line, or a ValueError with the reason there is none."""
+    if line.get("error"):
+        raise ValueError(f"Request failed: {line['error']}")
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        raise ValueError(f"Request returned status {response.get('status_code')}")
+    return response["body"]["choices"][0]["message"]["content"] or ""
+
+
+class BatchTranslation:
+    """Translates the chunks of many files through the Batch API.
+
+    Every chunk becomes one chat completion request in a JSONL file, which
+    is uploaded and run as a single batch. Results are checked and
+    formatted locally like pipeline chunks; chunks without a usable result
+    go into the next round's batch. The job state is saved after every
+    step, so an interrupted job resumes where it stopped instead of paying
+    for a batch twice.
+    """
+
+    def __init__(self, state: BatchJobState, directory: str, client=None):
+        self.state = state
+        self.directory = directory
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = create_batch_client()
+        return self._client
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.directory, STATE_FILE)
+
+    @classmethod
+    def create(
+        cls,
+        srt_files: List[str],
+        name: str,
+        model: str,
+        source_lang: str,
+        target_lang: str,
+        chunk_size: int = DEFAULT_SUBTITLE_CHUNK_SIZE,
+        output_dir: Optional[str] = None,
+        glossary_prefetch_enabled: bool = False,
+        batch_dir: str = BATCH_DIR,
+        client=None,
+    ) -> "BatchTranslation":
+        directory = os.path.join(batch_dir, name)
+        if os.path.exists(os.path.join(directory, STATE_FILE)):
+            raise FileExistsError(f"Batch job {name} already exists in {directory}")
+        chunks = []
+        output_files = []
+        for file_index, srt_file in enumerate(srt_files):
+            with open(srt_file, "r", encoding=UTF8_ENCODING) as f:
+                file_chunks = split_subtitles(f.read(), chunk_size)
+            chunks.extend(
+                BatchChunk(
+                    custom_id=f"{file_index}-{chunk_index}",
+                    file_index=file_index,
+                    chunk_index=chunk_index,
+                    original_srt=chunk.strip(),
+                )
+                for chunk_index, chunk in enumerate(file_chunks)
+            )
+            stem = os.path.splitext(os.path.basename(srt_file))[0]
+            output_files.append(
+                os.path.join(
+                    output_dir or os.path.dirname(srt_file),
+                    f"{stem}.{target_lang.lower()}{SRT_EXTENSION}",
+                )
+            )
+        state = BatchJobState(
+            name=name,
+            model=model,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            chunk_size=chunk_size,
+            glossary_prefetch_enabled=glossary_prefetch_enabled,
+            input_files=list(srt_files),
+            output_files=output_files,
+            chunks=chunks,
+        )
+        job = cls(state, directory, client)
+        os.makedirs(directory, exist_ok=True)
+        job.save()
+        logging.info(
+            f"Batch job {name}: {len(chunks)} chunks from {len(srt_files)} files"
+        )
+        job.compile_round()
+        return job
+
+    @classmethod
+    def load(
+        cls, name: str, batch_dir: str = BATCH_DIR, client=None
+    ) -> "BatchTranslation":
+        directory = os.path.join(batch_dir, name)
+        with open(
+            os.path.join(directory, STATE_FILE), "r", encoding=UTF8_ENCODING
+        ) as f:
+            state = BatchJobState.model_validate_json(f.read())
+        return cls(state, directory, client)
+
+    def save(self):
+        _write_replacing(self.state_path, self.state.model_dump_json(indent=2))
+
+    def pending_chunks(self) -> List[BatchChunk]:
+        return [chunk for chunk in self.state.chunks if chunk.translated_srt is None]
+
+    def _request(self, chunk: BatchChunk, system_message: str) -> Dict[str, Any]:
+        glossary_block = ""
+        if self.state.glossary_prefetch_enabled and prefetch_supported(
+            self.state.source_lang
+        ):
+            _, glossary = prefetch_glossary(chunk.original_srt, self.state.source_lang)
+            if glossary:
+                glossary_block = f"Glossary of uncommon {self.state.source_lang} words:\n{glossary}\n"
+        return {
+            "custom_id": chunk.custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": self.state.model,
+                "temperature": self.state.temperature,
+                "messages": [
+                    {"role": "system", "content": system_message},
+                    {
+                        "role": "user",
+                        "content": translation_prompt(
+                            chunk.original_srt,
+                            self.state.source_lang,
+                            self.state.target_lang,
+                            glossary_block,
+                        ),
+                    },
+                ],
+            },
+        }
+
+    def compile_round(self) -> BatchRound:
+        """Write the requests for every chunk still missing a translation."""
+        system_message = load_agent_configs()["subtitle_translator"]["system_message"]
+        pending = self.pending_chunks()
+        requests_path = os.path.join(
+            self.directory, f"round_{len(self.state.rounds) + 1}.jsonl"
+        )
+        with open(requests_path, "w", encoding=UTF8_ENCODING) as f:
+            for chunk in pending:
+                f.write(json.dumps(self._request(chunk, system_message)) + "\n")
+        batch_round = BatchRound(
+            requests_path=requests_path,
+            custom_ids=[chunk.custom_id for chunk in pending],
+        )
+        self.state.rounds.append(batch_round)
+        self.save()
+        logging.info(f"Compiled {len(pending)} requests into {requests_path}")
+        return batch_round
+
+    def _existing_batch(self, batch_round: BatchRound) -> Optional[Any]:
+        """The batch an interrupted submit may already have created for a round."""
+        for batch in self.client.batches.list():
+            if (
+                batch.input_file_id == batch_round.input_file_id
+                and (batch.metadata or {}).get("job") == self.state.name
+            ):
+                return batch
+        return None
+
+    def submit(self, batch_round: BatchRound):
+        if batch_round.input_file_id is None:
+            with open(batch_round.requests_path, "rb") as f:
+                uploaded = self.client.files.create(file=f, purpose="batch")
+            batch_round.input_file_id = uploaded.id
+            self.save()
+        batch = None
+        if batch_round.status == BATCH_STATUS_SUBMITTING:
+            batch = self._existing_batch(batch_round)
+            if batch is not None:
+                logging.info(f"Resuming batch {batch.id} of an interrupted submit")
+        if batch is None:
+            batch_round.status = BATCH_STATUS_SUBMITTING
+            self.save()
+            batch = self.client.batches.create(
+                input_file_id=batch_round.input_file_id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=BATCH_COMPLETION_WINDOW,
+                metadata={"job": self.state.name},
+            )
+        batch_round.batch_id = batch.id
+        batch_round.status = batch.status
+        # A batch found after an interrupted submit may have finished already
+        batch_round.output_file_id = batch.output_file_id
+        batch_round.error_file_id = batch.error_file_id
+        self.save()
+        logging.info(
+            f"Submitted {len(batch_round.custom_ids)} requests as batch {batch.id}"
+        )
+
+    def wait(
+        self,
+        batch_round: BatchRound,
+        poll_seconds: float = BATCH_POLL_SECONDS,
+        timeout_seconds: Optional[float] = None,
+    ):
+        """Poll the batch until it reaches a final status."""
+        started = time.monotonic()
+        while True:
+            batch = self.client.batches.retrieve(batch_round.batch_id)
+            if batch.status != batch_round.status:
+                logging.info(f"Batch {batch.id}: {batch.status} {batch.request_counts}")
+            batch_round.status = batch.status
+            batch_round.output_file_id = batch.output_file_id
+            batch_round.error_file_id = batch.error_file_id
+            self.save()
+            if batch.status in BATCH_FINAL_STATUSES:
+                return
+            if (
+                timeout_seconds is not None
+                and time.monotonic() - started > timeout_seconds
+            ):
+                raise TimeoutError(
+                    f"Batch {batch.id} is still {batch.status}; resume the job later"
+                )
+            time.sleep(poll_seconds)
+
+    def _download(self, file_id: Optional[str]) -> List[Dict[str, Any]]:
+        if file_id is None:
+            return []
+        content = self.client.files.content(file_id).text
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    def collect(self, batch_round: BatchRound):
+        """Check the results of a finished batch and keep the aligned translations."""
+        chunks = {chunk.custom_id: chunk for chunk in self.state.chunks}
+        if batch_round.status != BATCH_STATUS_COMPLETED:
+            logging.error(f"Batch {batch_round.batch_id} ended as {batch_round.status}")
+        lines = self._download(batch_round.output_file_id) + self._download(
+            batch_round.error_file_id
+        )
+        answered = set()
+        for line in lines:
+            chunk = chunks.get(line.get("custom_id"))
+            if chunk is None or chunk.translated_srt is not None:
+                continue
+            answered.add(chunk.custom_id)
+            chunk.attempts += 1
+            usage = ((line.get("response") or {}).get("body") or {}).get("usage") or {}
+            self.state.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.state.completion_tokens += usage.get("completion_tokens", 0)
+            try:
+                content = _response_content(line)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                chunk.error = str(e)
+                continue
+            candidate = ChunkValidator(chunk.original_srt).candidate(content)
+            if (
+                candidate is None
+                or not verify_alignment(chunk.original_srt, candidate).is_aligned
+            ):
+                chunk.error = "Translation does not match the original cues"
+                continue
+            chunk.translated_srt = format_locally(candidate)
+            chunk.error = None
+        for custom_id in set(batch_round.custom_ids) - answered:
+            if chunks[custom_id].translated_srt is None:
+                chunks[custom_id].error = "No result in the batch output"
+        batch_round.collected = True
+        self.save()
+        failed = [chunk for chunk in self.pending_chunks() if chunk.error]
+        logging.info(
+            f"Batch {batch_round.batch_id}: {len(answered)} results, "
+            f"{len(failed)} chunks still without a translation"
+        )
+
+    def merge(self) -> List[str]:
+        """Merge each file's chunks and write the translated files."""
+        for file_index, output_path in enumerate(self.state.output_files):
+            chunks = sorted(
+                (
+                    chunk
+                    for chunk in self.state.chunks
+                    if chunk.file_index == file_index
+                ),
+                key=lambda chunk: chunk.chunk_index,
+            )
+            merged = merge_subtitles([chunk.translated_srt for chunk in chunks])
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            _write_replacing(output_path, merged)
+            logging.info(f"{self.state.input_files[file_index]} -> {output_path}")
+        self.state.merged = True
+        self.save()
+        return self.state.output_files
+
+    def run(
+        self,
+        max_rounds: int = BATCH_MAX_ROUNDS,
+        poll_seconds: float = BATCH_POLL_SECONDS,
+        timeout_seconds: Optional[float] = None,
+    ) -> List[str]:
+        """Compile, submit, wait for and collect batches until every chunk is translated.
+
+        Resumes an unfinished round before starting a new one. Raises a
+        RuntimeError when chunks are still missing after `max_rounds`
+        rounds; running the job again retries them.
+        """
+        rounds = 0
+        while self.pending_chunks():
+            last = self.state.rounds[-1] if self.state.rounds else None
+            if last is not None and not last.collected:
+                batch_round = last
+                # A round compiled by `create` is the first of this run
+                if batch_round.input_file_id is None:
+                    rounds += 1
+            elif rounds < max_rounds:
+                batch_round = self.compile_round()
+                rounds += 1
+            else:
+                failed = self.pending_chunks()
+                raise RuntimeError(
+                    f"{len(failed)} chunks are still untranslated after {rounds} rounds, "
+                    f"e.g. chunk {failed[0].custom_id}: {failed[0].error}"
+                )
+            if batch_round.batch_id is None:
+                self.submit(batch_round)
+            if batch_round.status not in BATCH_FINAL_STATUSES:
+                self.wait(batch_round, poll_seconds, timeout_seconds)
+            self.collect(batch_round)
+        if not self.state.merged:
+            self.merge()
+        logging.info(
+            f"Batch job {self.state.name} done: {self.state.prompt_tokens} prompt and "
+            f"{self.state.completion_tokens} completion tokens"
+        )
+        return self.state.output_files
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Translate subtitle files offline through the Batch API."
+    )
+    parser.add_argument("--batch-dir", default=BATCH_DIR)
+    parser.add_argument(
+        "--base-url", help="OpenAI-compatible API, e.g. a local batch_server.py"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser(
+        "create", help="Compile the requests for a set of files into a new job"
+    )
+    create.add_argument("name")
+    create.add_argument("srt_files", nargs="+")
+    create.add_argument("--model", default=OPENAI_MODEL_GPT4O_MINI)
+    create.add_argument("--source", default=LANGUAGE_ENGLISH)
+    create.add_argument("--target", default=LANGUAGE_TURKISH)
+    create.add_argument("--chunk-size", type=int, default=DEFAULT_SUBTITLE_CHUNK_SIZE)
+    create.add_argument("--output-dir", help="Defaults to each input file's directory")
+    create.add_argument("--glossary-prefetch", action="store_true")
+
+    for command in ("run", "status"):
+        subparser = commands.add_parser(
+            command,
+            help=(
+                "Submit, wait for and merge a job, resuming where it stopped"
+                if command == "run"
+                else "Show a job's progress"
+            ),
+        )
+        subparser.add_argument("name")
+    commands.choices["run"].add_argument(
+        "--max-rounds", type=int, default=BATCH_MAX_ROUNDS
+    )
+    commands.choices["run"].add_argument(
+        "--poll-seconds", type=float, default=BATCH_POLL_SECONDS
+    )
+    commands.choices["run"].add_argument(
+        "--timeout", type=float, help="Stop waiting after this many seconds"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    if args.command == "create":
+        BatchTranslation.create(
+            args.srt_files,
+            args.name,
+            args.model,
+            args.source,
+            args.target,
+            chunk_size=args.chunk_size,
+            output_dir=args.output_dir,
+            glossary_prefetch_enabled=args.glossary_prefetch,
+            batch_dir=args.batch_dir,
+        )
+        return
+
+    if args.command == "status":
+        state = BatchTranslation.load(args.name, args.batch_dir).state
+        translated = len(state.chunks) - sum(
+            chunk.translated_srt is None for chunk in state.chunks
+        )
+        print(f"{state.name}: {translated}/{len(state.chunks)} chunks translated")
+        for number, batch_round in enumerate(state.rounds, start=1):
+            print(
+                f"  round {number}: batch {batch_round.batch_id} {batch_round.status}, "
+                f"{len(batch_round.custom_ids)} requests"
+            )
+        return
+
+    set_api_keys()
+    job = BatchTranslation.load(
+        args.name, args.batch_dir, client=create_batch_client(args.base_url)
+    )
+    for output_path in job.run(args.max_rounds, args.poll_seconds, args.timeout):
+        print(output_path)
+
+
+if __name__ == "__main__":
+    main()
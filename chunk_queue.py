@@ -0,0 +1,646 @@
+# chunk_queue.py
+
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set
+
+from agent_models import ChunkResult, ChunkTask
+from constants import (
+    CHUNK_QUEUE_REDIS_PREFIX,
+    CHUNK_TASK_MAX_ATTEMPTS,
+    UTF8_ENCODING,
+)
+
+
+def new_job_id() -> str:
+    """A job id that sorts by submission time, so older jobs are served first."""
+    return f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """A task claimed by a worker until `expires_at`, unless renewed.
+
+    `token` identifies this claim; once the lease expires and the task is
+    claimed again, renewals with the old token fail.
+    """
+
+    def __init__(
+        self, task: ChunkTask, token: str, attempts: int, expires_at: float, key=None
+    ):
+        self.task = task
+        self.token = token
+        self.attempts = attempts
+        self.expires_at = expires_at
+        # Backend specific handle, e.g. the lease file of a spool
+        self.key = key
+
+
+class ChunkQueue:
+    """Chunk tasks shared between a coordinator and any number of workers.
+
+    Workers claim a task for `lease_seconds` and renew the lease while they
+    work on it. Tasks whose lease expired, e.g. because their worker died,
+    are handed to the next worker that asks. The first result posted for a
+    chunk wins, so a slow worker finishing a reassigned chunk does no harm.
+    """
+
+    def publish(self, tasks: List[ChunkTask]):
+        raise NotImplementedError
+
+    def claim(self, lease_seconds: float) -> Optional[Lease]:
+        raise NotImplementedError
+
+    def renew(self, lease: Lease, lease_seconds: float) -> bool:
+        """Extend a lease, False if it expired and the task was reassigned."""
+        raise NotImplementedError
+
+    def complete(self, lease: Lease, result: ChunkResult):
+        raise NotImplementedError
+
+    def fail(
+        self, lease: Lease, error: str, max_attempts: int = CHUNK_TASK_MAX_ATTEMPTS
+    ) -> bool:
+        """Put a failed task back, or post `error` as its result once it ran out of attempts.
+
+        Returns whether the task was queued again.
+        """
+        raise NotImplementedError
+
+    def requeue_expired(self) -> int:
+        """Make tasks with expired leases available again and return how many."""
+        raise NotImplementedError
+
+    def results(self, job_id: str, skip: Set[int] = frozenset()) -> List[ChunkResult]:
+        """Posted results of a job, except for the chunk indices in `skip`."""
+        raise NotImplementedError
+
+    def counts(self, job_id: str) -> Dict[str, int]:
+        """Number of queued, leased and done chunks of a job."""
+        raise NotImplementedError
+
+    def purge(self, job_id: str):
+        """Remove a job's tasks and results."""
+        raise NotImplementedError
+
+
+class SpoolQueue(ChunkQueue):
+    """Queue in a directory shared between nodes, e.g. over NFS.
+
+    Every task is a file and every state change is an atomic rename, so
+    exactly one worker wins a claim. Each job has a `tasks`, `leased` and
+    `results` directory. Lease files carry their attempt count, expiry time
+    and token in the name, so expiry needs no clock shared through file
+    modification times.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _dir(self, job_id: str, state: str) -> str:
+        return os.path.join(self.directory, job_id, state)
+
+    def _write(self, path: str, payload: str):
+        # Written next to the target first, so nobody reads a partial file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding=UTF8_ENCODING) as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+
+    def _jobs(self) -> List[str]:
+        try:
+            return sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+
+    def _names(self, job_id: str, state: str) -> List[str]:
+        try:
+            return sorted(
+                name
+                for name in os.listdir(self._dir(job_id, state))
+                if name.endswith(".json")
+            )
+        except FileNotFoundError:
+            return []
+
+    def publish(self, tasks: List[ChunkTask]):
+        for task in tasks:
+            for state in ("tasks", "leased", "results"):
+                os.makedirs(self._dir(task.job_id, state), exist_ok=True)
+            self._write(
+                os.path.join(
+                    self._dir(task.job_id, "tasks"), f"{task.chunk_index:06d}.0.json"
+                ),
+                task.model_dump_json(),
+            )
+
+    def claim(self, lease_seconds: float) -> Optional[Lease]:
+        self.requeue_expired()
+        for job_id in self._jobs():
+            for name in self._names(job_id, "tasks"):
+                chunk, attempts, _ = name.split(".")
+                token = uuid.uuid4().hex
+                expires_at = time.time() + lease_seconds
+                lease_name = (
+                    f"{chunk}.{int(attempts) + 1}.{int(expires_at * 1000)}.{token}.json"
+                )
+                lease_path = os.path.join(self._dir(job_id, "leased"), lease_name)
+                try:
+                    os.rename(
+                        os.path.join(self._dir(job_id, "tasks"), name), lease_path
+                    )
+                except FileNotFoundError:
+                    # Another worker was faster
+                    continue
+                if os.path.exists(
+                    os.path.join(self._dir(job_id, "results"), f"{chunk}.json")
+                ):
+                    # Requeued after expiry, but its first worker finished after all
+                    os.remove(lease_path)
+                    continue
+                with open(lease_path, "r", encoding=UTF8_ENCODING) as f:
+                    task = ChunkTask.model_validate_json(f.read())
+                return Lease(task, token, int(attempts) + 1, expires_at, lease_path)
+        return None
+
+    def renew(self, lease: Lease, lease_seconds: float) -> bool:
+        expires_at = time.time() + lease_seconds
+        chunk, attempts, _, token, _ = os.path.basename(lease.key).split(".")
+        renewed_path = os.path.join(
+            os.path.dirname(lease.key),
+            f"{chunk}.{attempts}.{int(expires_at * 1000)}.{token}.json",
+        )
+        try:
+            os.rename(lease.key, renewed_path)
+        except FileNotFoundError:
+            return False
+        lease.key = renewed_path
+        lease.expires_at = expires_at
+        return True
+
+    def _post(self, job_id: str, chunk_index: int, result: ChunkResult):
+        path = os.path.join(self._dir(job_id, "results"), f"{chunk_index:06d}.json")
+        if os.path.exists(path):
+            return
+        try:
+            self._write(path, result.model_dump_json())
+        except FileNotFoundError:
+            logging.info(
+                f"Job {job_id} was purged, dropping the result of chunk {chunk_index}"
+            )
+
+    def complete(self, lease: Lease, result: ChunkResult):
+        self._post(lease.task.job_id, lease.task.chunk_index, result)
+        try:
+            os.remove(lease.key)
+        except FileNotFoundError:
+            pass
+
+    def fail(
+        self, lease: Lease, error: str, max_attempts: int = CHUNK_TASK_MAX_ATTEMPTS
+    ) -> bool:
+        task = lease.task
+        if lease.attempts >= max_attempts:
+            self.complete(
+                lease,
+                ChunkResult(
+                    job_id=task.job_id, chunk_index=task.chunk_index, error=error
+                ),
+            )
+            return False
+        try:
+            os.rename(
+                lease.key,
+                os.path.join(
+                    self._dir(task.job_id, "tasks"),
+                    f"{task.chunk_index:06d}.{lease.attempts}.json",
+                ),
+            )
+        except FileNotFoundError:
+            # The lease already expired and the task went back on its own
+            pass
+        return True
+
+    def requeue_expired(self) -> int:
+        now_ms = time.time() * 1000
+        requeued = 0
+        for job_id in self._jobs():
+            for name in self._names(job_id, "leased"):
+                chunk, attempts, expires_ms, _, _ = name.split(".")
+                if int(expires_ms) >= now_ms:
+                    continue
+                try:
+                    os.rename(
+                        os.path.join(self._dir(job_id, "leased"), name),
+                        os.path.join(
+                            self._dir(job_id, "tasks"), f"{chunk}.{attempts}.json"
+                        ),
+                    )
+                except FileNotFoundError:
+                    continue
+                logging.warning(f"Lease on chunk {int(chunk)} of job {job_id} expired")
+                requeued += 1
+        return requeued
+
+    def results(self, job_id: str, skip: Set[int] = frozenset()) -> List[ChunkResult]:
+        results = []
+        for name in self._names(job_id, "results"):
+            if int(name.split(".")[0]) in skip:
+                continue
+            with open(
+                os.path.join(self._dir(job_id, "results"), name),
+                "r",
+                encoding=UTF8_ENCODING,
+            ) as f:
+                results.append(ChunkResult.model_validate_json(f.read()))
+        return results
+
+    def counts(self, job_id: str) -> Dict[str, int]:
+        return {
+            "queued": len(self._names(job_id, "tasks")),
+            "leased": len(self._names(job_id, "leased")),
+            "done": len(self._names(job_id, "results")),
+        }
+
+    def purge(self, job_id: str):
+        shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_tasks (
+    job_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    lease_expires REAL,
+    PRIMARY KEY (job_id, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS chunk_results (
+    job_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, chunk_index)
+);
+"""
+
+
+class SQLiteQueue(ChunkQueue):
+    """Queue in a SQLite database, for workers on one machine and for tests.
+
+    Every operation opens its own connection, so one instance can be shared
+    between threads and several processes can use the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(SQLITE_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as connection:
+            # Take the write lock up front, so two claims cannot pick the same task
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def publish(self, tasks: List[ChunkTask]):
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO chunk_tasks (job_id, chunk_index, payload) VALUES (?, ?, ?)",
+                [
+                    (task.job_id, task.chunk_index, task.model_dump_json())
+                    for task in tasks
+                ],
+            )
+
+    def claim(self, lease_seconds: float) -> Optional[Lease]:
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT job_id, chunk_index, payload, attempts, lease_token FROM chunk_tasks "
+                "WHERE lease_token IS NULL OR lease_expires < ? "
+                "ORDER BY job_id, chunk_index LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, chunk_index, payload, attempts, expired_token = row
+            if expired_token is not None:
+                logging.warning(f"Lease on chunk {chunk_index} of job {job_id} expired")
+            token = uuid.uuid4().hex
+            expires_at = now + lease_seconds
+            connection.execute(
+                "UPDATE chunk_tasks SET lease_token = ?, lease_expires = ?, attempts = ? "
+                "WHERE job_id = ? AND chunk_index = ?",
+                (token, expires_at, attempts + 1, job_id, chunk_index),
+            )
+        return Lease(
+            ChunkTask.model_validate_json(payload), token, attempts + 1, expires_at
+        )
+
+    def renew(self, lease: Lease, lease_seconds: float) -> bool:
+        expires_at = time.time() + lease_seconds
+        with self._connect() as connection:
+            renewed = connection.execute(
+                "UPDATE chunk_tasks SET lease_expires = ? "
+                "WHERE job_id = ? AND chunk_index = ? AND lease_token = ?",
+                (
+                    expires_at,
+                    lease.task.job_id,
+                    lease.task.chunk_index,
+                    lease.token,
+                ),
+            ).rowcount
+        if renewed:
+            lease.expires_at = expires_at
+        return bool(renewed)
+
+    def complete(self, lease: Lease, result: ChunkResult):
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO chunk_results (job_id, chunk_index, payload) "
+                "VALUES (?, ?, ?)",
+                (result.job_id, result.chunk_index, result.model_dump_json()),
+            )
+            connection.execute(
+                "DELETE FROM chunk_tasks WHERE job_id = ? AND chunk_index = ?",
+                (result.job_id, result.chunk_index),
+            )
+
+    def fail(
+        self, lease: Lease, error: str, max_attempts: int = CHUNK_TASK_MAX_ATTEMPTS
+    ) -> bool:
+        task = lease.task
+        if lease.attempts >= max_attempts:
+            self.complete(
+                lease,
+                ChunkResult(
+                    job_id=task.job_id, chunk_index=task.chunk_index, error=error
+                ),
+            )
+            return False
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE chunk_tasks SET lease_token = NULL, lease_expires = NULL "
+                "WHERE job_id = ? AND chunk_index = ? AND lease_token = ?",
+                (task.job_id, task.chunk_index, lease.token),
+            )
+        return True
+
+    def requeue_expired(self) -> int:
+        # Claims skip expired leases on their own, this only keeps the counts honest
+        with self._connect() as connection:
+            return connection.execute(
+                "UPDATE chunk_tasks SET lease_token = NULL, lease_expires = NULL "
+                "WHERE lease_token IS NOT NULL AND lease_expires < ?",
+                (time.time(),),
+            ).rowcount
+
+    def results(self, job_id: str, skip: Set[int] = frozenset()) -> List[ChunkResult]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT chunk_index, payload FROM chunk_results WHERE job_id = ? "
+                "ORDER BY chunk_index",
+                (job_id,),
+            ).fetchall()
+        return [
+            ChunkResult.model_validate_json(payload)
+            for chunk_index, payload in rows
+            if chunk_index not in skip
+        ]
+
+    def counts(self, job_id: str) -> Dict[str, int]:
+        with self._connect() as connection:
+            queued, leased = connection.execute(
+                "SELECT COUNT(*) - COUNT(lease_token), COUNT(lease_token) "
+                "FROM chunk_tasks WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            (done,) = connection.execute(
+                "SELECT COUNT(*) FROM chunk_results WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return {"queued": queued, "leased": leased, "done": done}
+
+    def purge(self, job_id: str):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM chunk_tasks WHERE job_id = ?", (job_id,))
+            connection.execute("DELETE FROM chunk_results WHERE job_id = ?", (job_id,))
+
+
+# Requeues expired leases; KEYS: ready list, lease expiries, lease tokens
+REDIS_REQUEUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('HDEL', KEYS[3], member)
+    redis.call('RPUSH', KEYS[1], member)
+end
+return #expired
+"""
+
+# Pops the next task and leases it; ARGV: expiry, token
+REDIS_CLAIM_SCRIPT = """
+local member = redis.call('LPOP', KEYS[1])
+if not member then
+    return false
+end
+redis.call('ZADD', KEYS[2], ARGV[1], member)
+redis.call('HSET', KEYS[3], member, ARGV[2])
+return member
+"""
+
+# Extends a lease if the token still owns it; ARGV: member, token, expiry
+REDIS_RENEW_SCRIPT = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZADD', KEYS[2], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# Drops a lease the token still owns, and puts the task back if ARGV[3] is set
+REDIS_RELEASE_SCRIPT = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if ARGV[3] == '1' then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class RedisQueue(ChunkQueue):
+    """Queue in Redis, for workers spread over several nodes.
+
+    Ready tasks are a list shared by all jobs, leases a sorted set scored by
+    expiry time. Claims, renewals and releases run as Lua scripts, so they
+    are atomic on the server. Needs the `redis` package.
+    """
+
+    def __init__(self, url: str, prefix: str = CHUNK_QUEUE_REDIS_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "Redis chunk queues need the redis package: pip install redis"
+            ) from e
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._lease_keys = [
+            f"{prefix}:ready",
+            f"{prefix}:lease_expiries",
+            f"{prefix}:lease_tokens",
+        ]
+        self._requeue = self.client.register_script(REDIS_REQUEUE_SCRIPT)
+        self._claim = self.client.register_script(REDIS_CLAIM_SCRIPT)
+        self._renew = self.client.register_script(REDIS_RENEW_SCRIPT)
+        self._release = self.client.register_script(REDIS_RELEASE_SCRIPT)
+
+    def _key(self, kind: str, job_id: str) -> str:
+        return f"{self.prefix}:{kind}:{job_id}"
+
+    @staticmethod
+    def _member(job_id: str, chunk_index: int) -> str:
+        return f"{job_id}|{chunk_index}"
+
+    def publish(self, tasks: List[ChunkTask]):
+        pipeline = self.client.pipeline()
+        for task in tasks:
+            pipeline.hset(
+                self._key("tasks", task.job_id),
+                str(task.chunk_index),
+                task.model_dump_json(),
+            )
+            pipeline.rpush(
+                self._lease_keys[0], self._member(task.job_id, task.chunk_index)
+            )
+        pipeline.execute()
+
+    def claim(self, lease_seconds: float) -> Optional[Lease]:
+        self.requeue_expired()
+        while True:
+            token = uuid.uuid4().hex
+            expires_at = time.time() + lease_seconds
+            member = self._claim(keys=self._lease_keys, args=[expires_at, token])
+            if member is None:
+                return None
+            job_id, chunk = member.rsplit("|", 1)
+            payload = self.client.hget(self._key("tasks", job_id), chunk)
+            if payload is None:
+                # Left over from a purged job
+                self._release(keys=self._lease_keys, args=[member, token, "0"])
+                continue
+            if self.client.hexists(self._key("results", job_id), chunk):
+                # Requeued after its lease expired, but the first worker finished after all
+                self._release(keys=self._lease_keys, args=[member, token, "0"])
+                continue
+            attempts = self.client.hincrby(self._key("attempts", job_id), chunk, 1)
+            return Lease(
+                ChunkTask.model_validate_json(payload),
+                token,
+                attempts,
+                expires_at,
+                member,
+            )
+
+    def renew(self, lease: Lease, lease_seconds: float) -> bool:
+        expires_at = time.time() + lease_seconds
+        renewed = self._renew(
+            keys=self._lease_keys, args=[lease.key, lease.token, expires_at]
+        )
+        if renewed:
+            lease.expires_at = expires_at
+        return bool(renewed)
+
+    def complete(self, lease: Lease, result: ChunkResult):
+        self.client.hsetnx(
+            self._key("results", result.job_id),
+            str(result.chunk_index),
+            result.model_dump_json(),
+        )
+        self._release(keys=self._lease_keys, args=[lease.key, lease.token, "0"])
+
+    def fail(
+        self, lease: Lease, error: str, max_attempts: int = CHUNK_TASK_MAX_ATTEMPTS
+    ) -> bool:
+        task = lease.task
+        if lease.attempts >= max_attempts:
+            self.complete(
+                lease,
+                ChunkResult(
+                    job_id=task.job_id, chunk_index=task.chunk_index, error=error
+                ),
+            )
+            return False
+        self._release(keys=self._lease_keys, args=[lease.key, lease.token, "1"])
+        return True
+
+    def requeue_expired(self) -> int:
+        requeued = self._requeue(keys=self._lease_keys, args=[time.time()])
+        if requeued:
+            logging.warning(f"{requeued} expired chunk leases requeued")
+        return requeued
+
+    def results(self, job_id: str, skip: Set[int] = frozenset()) -> List[ChunkResult]:
+        key = self._key("results", job_id)
+        chunks = sorted(
+            int(chunk) for chunk in self.client.hkeys(key) if int(chunk) not in skip
+        )
+        if not chunks:
+            return []
+        return [
+            ChunkResult.model_validate_json(payload)
+            for payload in self.client.hmget(key, [str(chunk) for chunk in chunks])
+        ]
+
+    def counts(self, job_id: str) -> Dict[str, int]:
+        total = self.client.hlen(self._key("tasks", job_id))
+        done = self.client.hlen(self._key("results", job_id))
+        leased = sum(
+            1
+            for member in self.client.zrange(self._lease_keys[1], 0, -1)
+            if member.rsplit("|", 1)[0] == job_id
+        )
+        return {"queued": max(total - done - leased, 0), "leased": leased, "done": done}
+
+    def purge(self, job_id: str):
+        self.client.delete(
+            self._key("tasks", job_id),
+            self._key("attempts", job_id),
+            self._key("results", job_id),
+        )
+
+
+def open_chunk_queue(url: str) -> ChunkQueue:
+    """Open a queue from a URL: `spool://<directory>`, `sqlite:///<file>` or `redis://...`."""
+    if url.startswith("spool://"):
+        return SpoolQueue(url[len("spool://") :])
+    if url.startswith("sqlite:///"):
+        return SQLiteQueue(url[len("sqlite:///") :])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(url)
+    raise ValueError(f"Unsupported chunk queue URL: {url}")
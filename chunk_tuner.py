@@ -0,0 +1,348 @@
+# chunk_tuner.py
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent_models import ChunkReport, ChunkSizeStats, TranslationOptions
+from chunk_validator import ChunkValidator
+from constants import (
+    CHUNK_SIZE_CANDIDATES,
+    CHUNK_STATS_PATH,
+    DEFAULT_SUBTITLE_CHUNK_SIZE,
+    FAKE_LLM_CUE_DROP_RATE,
+    FAKE_LLM_MODEL,
+    FAKE_LLM_SECONDS_PER_CALL,
+    FAKE_LLM_SECONDS_PER_CUE,
+    LANGUAGE_ENGLISH,
+    LANGUAGE_FRENCH,
+    LLM_CACHE_MODE_RECORD,
+    LLM_CACHE_MODE_REPLAY,
+    LOG_FORMAT,
+    OPENAI_MODEL_GPT4O_MINI,
+    TUNER_MIN_SAMPLES,
+    UTF8_ENCODING,
+)
+from subtitle_utils import parse_srt, render_srt, verify_alignment
+from utils import estimate_tokens, split_subtitles
+
+# (translated chunk, seconds, tokens)
+ChunkRunner = Callable[[str], Tuple[str, float, int]]
+
+
+def translation_aligned(original_chunk: str, translated_chunk: str) -> bool:
+    """Whether a translated chunk has every cue of the original with matching timing."""
+    candidate = ChunkValidator(original_chunk).candidate(translated_chunk)
+    return (
+        candidate is not None and verify_alignment(original_chunk, candidate).is_aligned
+    )
+
+
+class ChunkStatsStore:
+    """Per-chunk run statistics keyed by model, language pair and chunk size.
+
+    Records are appended to a JSONL file so every job adds to the history
+    the next job is tuned on. Without a path the store only lives in memory.
+    """
+
+    def __init__(self, path: Optional[str] = CHUNK_STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Optional[List[Dict[str, Any]]] = None
+
+    def _load(self) -> List[Dict[str, Any]]:
+        if self._records is None:
+            self._records = []
+            if self.path and os.path.exists(self.path):
+                with open(self.path, "r", encoding=UTF8_ENCODING) as f:
+                    self._records = [json.loads(line) for line in f if line.strip()]
+        return self._records
+
+    def record(
+        self,
+        model: str,
+        source_lang: str,
+        target_lang: str,
+        chunk_size: int,
+        cue_count: int,
+        seconds: float,
+        tokens: int,
+        aligned: bool,
+        llm_calls: Optional[int] = None,
+    ):
+        record = {
+            "model": model,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "chunk_size": chunk_size,
+            "cue_count": cue_count,
+            "seconds": seconds,
+            "tokens": tokens,
+            "aligned": aligned,
+        }
+        if llm_calls is not None:
+            record["llm_calls"] = llm_calls
+        with self._lock:
+            self._load().append(record)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding=UTF8_ENCODING) as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def summarize(
+        self, model: str, source_lang: str, target_lang: str
+    ) -> List[ChunkSizeStats]:
+        """Aggregate the recorded chunks of one model and language pair per chunk size."""
+        by_size: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        with self._lock:
+            for record in self._load():
+                if (record["model"], record["source_lang"], record["target_lang"]) == (
+                    model,
+                    source_lang,
+                    target_lang,
+                ):
+                    by_size[record["chunk_size"]].append(record)
+
+        stats = []
+        for chunk_size, records in sorted(by_size.items()):
+            samples = len(records)
+            failures = sum(1 for record in records if not record["aligned"])
+            total_seconds = sum(record["seconds"] for record in records)
+            mean_cues = sum(record["cue_count"] for record in records) / samples
+            # Laplace smoothing keeps a few lucky runs from looking perfect
+            success_rate = (samples - failures + 1) / (samples + 2)
+            mean_seconds = total_seconds / samples
+            call_counts = [
+                record["llm_calls"] for record in records if "llm_calls" in record
+            ]
+            stats.append(
+                ChunkSizeStats(
+                    chunk_size=chunk_size,
+                    samples=samples,
+                    mean_seconds=mean_seconds,
+                    mean_tokens=sum(record["tokens"] for record in records) / samples,
+                    mean_llm_calls=(
+                        sum(call_counts) / len(call_counts) if call_counts else None
+                    ),
+                    failure_rate=failures / samples,
+                    # A failed chunk has to be redone, which takes 1 / success_rate attempts
+                    expected_cues_per_second=(
+                        mean_cues * success_rate / mean_seconds if mean_seconds else 0.0
+                    ),
+                )
+            )
+        return stats
+
+    def recommend(
+        self,
+        model: str,
+        source_lang: str,
+        target_lang: str,
+        candidates: List[int] = CHUNK_SIZE_CANDIDATES,
+        min_samples: int = TUNER_MIN_SAMPLES,
+    ) -> Tuple[int, Optional[ChunkSizeStats]]:
+        """Pick the chunk size with the best expected cues per second.
+
+        Candidates with fewer than `min_samples` recorded chunks are explored
+        first, the least sampled one and then the one nearest to
+        DEFAULT_SUBTITLE_CHUNK_SIZE, so a fresh history starts with the
+        default and every candidate gets measured in Auto mode.
+        """
+        stats_by_size = {
+            stats.chunk_size: stats
+            for stats in self.summarize(model, source_lang, target_lang)
+            if stats.chunk_size in candidates
+        }
+        unexplored = [
+            size
+            for size in candidates
+            if size not in stats_by_size or stats_by_size[size].samples < min_samples
+        ]
+        if unexplored:
+            size = min(
+                unexplored,
+                key=lambda size: (
+                    stats_by_size[size].samples if size in stats_by_size else 0,
+                    abs(size - DEFAULT_SUBTITLE_CHUNK_SIZE),
+                ),
+            )
+            logging.info(
+                f"Exploring chunk size {size} for {model} {source_lang}->{target_lang}: "
+                f"{len(unexplored)} of {len(candidates)} sizes have fewer than {min_samples} samples"
+            )
+            return size, stats_by_size.get(size)
+        if not stats_by_size:
+            return DEFAULT_SUBTITLE_CHUNK_SIZE, None
+        best = max(
+            stats_by_size.values(), key=lambda stats: stats.expected_cues_per_second
+        )
+        logging.info(
+            f"Chunk size {best.chunk_size} for {model} {source_lang}->{target_lang}: "
+            f"{best.expected_cues_per_second:.2f} cues/s over {best.samples} chunks"
+        )
+        return best.chunk_size, best
+
+
+class FakeLLM:
+    """Synthetic stand-in for a chunk conversation, used for offline sweeps.
+
+    Each chunk costs a fixed overhead plus a per-cue time, and every cue is
+    dropped with a small probability, so large chunks fail more often, as
+    they do with real models. No time is actually spent.
+    """
+
+    def __init__(
+        self,
+        seconds_per_call: float = FAKE_LLM_SECONDS_PER_CALL,
+        seconds_per_cue: float = FAKE_LLM_SECONDS_PER_CUE,
+        cue_drop_rate: float = FAKE_LLM_CUE_DROP_RATE,
+        seed: int = 0,
+    ):
+        self.seconds_per_call = seconds_per_call
+        self.seconds_per_cue = seconds_per_cue
+        self.cue_drop_rate = cue_drop_rate
+        self.rng = random.Random(seed)
+
+    def __call__(self, chunk: str) -> Tuple[str, float, int]:
+        subtitles = parse_srt(chunk)
+        translated = [
+            {**subtitle, "text": subtitle["text"].upper()}
+            for subtitle in subtitles
+            if self.rng.random() >= self.cue_drop_rate
+        ]
+        text = render_srt(translated)
+        seconds = self.seconds_per_call + self.seconds_per_cue * len(subtitles)
+        return text, seconds, estimate_tokens(chunk) + estimate_tokens(text)
+
+
+def llm_chunk_runner(
+    llm_config: Dict[str, Any], source_lang: str, target_lang: str
+) -> ChunkRunner:
+    """Run chunks through the real agent chat with the given llm_config."""
+    from translate import translate_srt_main
+
+    options = TranslationOptions(llm_config=llm_config)
+
+    def run(chunk: str) -> Tuple[str, float, int]:
+        report = ChunkReport(chunk_index=0, cue_count=len(parse_srt(chunk)))
+        translated = translate_srt_main(
+            chunk, source_lang, target_lang, options=options, chunk_report=report
+        )
+        return (
+            translated,
+            report.seconds,
+            report.prompt_tokens + report.completion_tokens,
+        )
+
+    return run
+
+
+def sweep(
+    srt_content: str,
+    runner: ChunkRunner,
+    store: ChunkStatsStore,
+    model: str,
+    source_lang: str,
+    target_lang: str,
+    chunk_sizes: List[int] = CHUNK_SIZE_CANDIDATES,
+    repeats: int = 1,
+) -> List[ChunkSizeStats]:
+    """Translate a file at every chunk size and record the statistics."""
+    for chunk_size in chunk_sizes:
+        for _ in range(repeats):
+            for chunk in split_subtitles(srt_content, chunk_size):
+                translated, seconds, tokens = runner(chunk)
+                store.record(
+                    model,
+                    source_lang,
+                    target_lang,
+                    chunk_size,
+                    cue_count=len(parse_srt(chunk)),
+                    seconds=seconds,
+                    tokens=tokens,
+                    aligned=translation_aligned(chunk, translated),
+                )
+        logging.info(f"Swept chunk size {chunk_size}")
+    return store.summarize(model, source_lang, target_lang)
+
+
+def format_stats(stats: List[ChunkSizeStats]) -> str:
+    lines = [
+        f"{'chunk size':>10} {'chunks':>7} {'mean s':>8} {'tokens':>8} {'failed':>7} {'cues/s':>7}"
+    ]
+    for entry in stats:
+        lines.append(
+            f"{entry.chunk_size:>10} {entry.samples:>7} {entry.mean_seconds:>8.2f} "
+            f"{entry.mean_tokens:>8.0f} {entry.failure_rate:>7.1%} "
+            f"{entry.expected_cues_per_second:>7.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep chunk sizes offline against a fake or recorded LLM."
+    )
+    parser.add_argument("srt_file", help="SRT file to translate at every chunk size")
+    parser.add_argument(
+        "--llm",
+        choices=["fake", LLM_CACHE_MODE_REPLAY, LLM_CACHE_MODE_RECORD],
+        default="fake",
+        help="fake: synthetic model; replay/record: OpenAI model through the LLM response cache",
+    )
+    parser.add_argument(
+        "--model",
+        help=f"Defaults to {FAKE_LLM_MODEL} for the fake LLM and {OPENAI_MODEL_GPT4O_MINI} otherwise",
+    )
+    parser.add_argument("--source", default=LANGUAGE_ENGLISH)
+    parser.add_argument("--target", default=LANGUAGE_FRENCH)
+    parser.add_argument("--sizes", type=int, nargs="+", default=CHUNK_SIZE_CANDIDATES)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help=f"Add the results to {CHUNK_STATS_PATH} for future jobs",
+    )
+    args = parser.parse_args()
+    if args.model is None:
+        args.model = FAKE_LLM_MODEL if args.llm == "fake" else OPENAI_MODEL_GPT4O_MINI
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    with open(args.srt_file, "r", encoding=UTF8_ENCODING) as f:
+        srt_content = f.read()
+
+    if args.llm == "fake":
+        runner = FakeLLM()
+    else:
+        from llm_cache import apply_llm_cache
+
+        llm_config = apply_llm_cache(
+            {"temperature": 0.0, "config_list": [{"model": args.model}]}, args.llm
+        )
+        runner = llm_chunk_runner(llm_config, args.source, args.target)
+
+    store = ChunkStatsStore(CHUNK_STATS_PATH if args.save else None)
+    stats = sweep(
+        srt_content,
+        runner,
+        store,
+        args.model,
+        args.source,
+        args.target,
+        chunk_sizes=args.sizes,
+        repeats=args.repeats,
+    )
+    print(format_stats(stats))
+    chunk_size, _ = store.recommend(
+        args.model, args.source, args.target, candidates=args.sizes, min_samples=1
+    )
+    print(f"Recommended chunk size: {chunk_size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# chunk_validator.py
+
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from agent_models import EarlyTerminationReport
+from constants import EXPECTED_ROUNDS_AFTER_SPEAKER
+from subtitle_utils import extract_srt_blocks, parse_srt, render_srt, verify_alignment
+from utils import calculate_subtitle_stats
+
+
+class ChunkValidator:
+    """Checks agent messages for a complete, valid translation of a chunk.
+
+    A candidate is the trailing block of cues in a message (agents repeat the
+    original before the translation). It is valid when `verify_alignment`
+    passes, `calculate_subtitle_stats` reports no issues and it is not just
+    the original text echoed back.
+    """
+
+    def __init__(self, original_srt: str):
+        self.original_srt = original_srt.strip()
+        self.original_subtitles = parse_srt(self.original_srt)
+        self.translation: Optional[str] = None
+        self.report = EarlyTerminationReport()
+        self._started = time.perf_counter()
+
+    def candidate(self, content: str) -> Optional[str]:
+        """Return the SRT of the last full set of cues in a message, if there is one."""
+        blocks = extract_srt_blocks(content)
+        if len(blocks) < len(self.original_subtitles):
+            return None
+        return render_srt(blocks[-len(self.original_subtitles) :])
+
+    def is_valid(self, candidate_srt: str) -> bool:
+        candidate_subtitles = parse_srt(candidate_srt)
+        if all(
+            orig["text"].strip() == trans["text"].strip()
+            for orig, trans in zip(self.original_subtitles, candidate_subtitles)
+        ):
+            return False
+        if not verify_alignment(self.original_srt, candidate_srt).is_aligned:
+            return False
+        return not calculate_subtitle_stats(self.original_srt, candidate_srt)
+
+    def check(
+        self, speaker_name: str, message: Dict[str, Any], round_number: int
+    ) -> bool:
+        """Validate a message as it arrives and record the translation if it is valid."""
+        if message.get("tool_calls") or not message.get("content"):
+            return False
+        start = time.perf_counter()
+        candidate = self.candidate(str(message["content"]))
+        valid = candidate is not None and self.is_valid(candidate)
+        self.report.validations += 1
+        self.report.validation_ms += (time.perf_counter() - start) * 1000
+        if not valid:
+            return False
+
+        self.translation = candidate
+        elapsed = time.perf_counter() - self._started
+        rounds_saved = EXPECTED_ROUNDS_AFTER_SPEAKER.get(speaker_name, 0)
+        self.report.terminated_by = speaker_name
+        self.report.rounds = round_number
+        self.report.rounds_saved = rounds_saved
+        self.report.estimated_seconds_saved = (
+            elapsed / round_number * rounds_saved if round_number else 0.0
+        )
+        logging.info(
+            f"Valid translation from {speaker_name} after {round_number} rounds, "
+            f"skipping ~{rounds_saved} rounds"
+        )
+        return True
@@ -0,0 +1,407 @@
+# chunk_worker.py
+
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent_models import ChunkReport, ChunkResult, ChunkTask, TranslationOptions
+from chunk_queue import ChunkQueue, Lease, new_job_id, open_chunk_queue
+from constants import (
+    CHUNK_JOB_IDLE_TIMEOUT_SECONDS,
+    CHUNK_LEASE_SECONDS,
+    CHUNK_QUEUE_DEFAULT_URL,
+    CHUNK_QUEUE_POLL_SECONDS,
+    CHUNK_QUEUE_URL_ENV,
+    CHUNK_TASK_API_KEY_ENVS,
+    CHUNK_TASK_MAX_ATTEMPTS,
+    CHUNK_TASK_PLACEHOLDER_API_KEYS,
+    DEFAULT_SUBTITLE_CHUNK_SIZE,
+    LANGUAGE_ENGLISH,
+    LANGUAGE_TURKISH,
+    LLM_CACHE_MODE_OFF,
+    LLM_CACHE_MODES,
+    LOG_FORMAT,
+    OPENAI_MODEL_GPT4O_MINI,
+    SRT_EXTENSION,
+    UTF8_ENCODING,
+)
+from output_writer import OrderedSubtitleWriter
+from utils import set_api_keys, split_subtitles
+
+# (translated chunk, report) for a task
+TaskRunner = Callable[[ChunkTask, Dict[str, Any]], Tuple[str, ChunkReport]]
+
+# Plain settings survive the trip through the queue, clients and secrets stay behind
+_PORTABLE_TYPES = (str, int, float, bool, type(None))
+# Names the environment variable a worker reads a config's API key from
+API_KEY_ENV_FIELD = "api_key_env"
+
+
+def chunk_queue_url() -> str:
+    return os.getenv(CHUNK_QUEUE_URL_ENV) or CHUNK_QUEUE_DEFAULT_URL
+
+
+def _portable_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    portable = {
+        key: value
+        for key, value in config.items()
+        if key != "api_key" and isinstance(value, _PORTABLE_TYPES)
+    }
+    api_key = config.get("api_key")
+    if api_key in CHUNK_TASK_PLACEHOLDER_API_KEYS:
+        portable["api_key"] = api_key
+    elif api_key:
+        api_key_env = next(
+            (name for name in CHUNK_TASK_API_KEY_ENVS if os.getenv(name) == api_key),
+            None,
+        )
+        if api_key_env is None:
+            raise ValueError(
+                f"The API key for {config.get('model')} is not in any of "
+                f"{', '.join(CHUNK_TASK_API_KEY_ENVS)}, workers could not look it up"
+            )
+        portable[API_KEY_ENV_FIELD] = api_key_env
+    return portable
+
+
+def portable_llm_config(llm_config: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of an llm_config a worker on another node can rebuild the client from.
+
+    HTTP clients are dropped. API keys are replaced by the name of the
+    environment variable they came from, which `resolve_api_keys` reads on
+    the worker; configs without a key use the client's default.
+    """
+    portable = {
+        key: value
+        for key, value in llm_config.items()
+        if key != "config_list" and isinstance(value, _PORTABLE_TYPES)
+    }
+    portable["config_list"] = [
+        _portable_config(config) for config in llm_config.get("config_list", [])
+    ]
+    return portable
+
+
+def resolve_api_keys(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in a portable config's API key from this worker's environment."""
+    config = dict(config)
+    api_key_env = config.pop(API_KEY_ENV_FIELD, None)
+    if api_key_env is not None:
+        api_key = os.getenv(api_key_env)
+        if not api_key:
+            raise RuntimeError(f"{api_key_env} is not set on this worker")
+        config["api_key"] = api_key
+    return config
+
+
+def translate_task(
+    task: ChunkTask, llm_config: Dict[str, Any]
+) -> Tuple[str, ChunkReport]:
+    """Translate a task's chunk with the usual group chat."""
+    # Imported here so the agent stack only loads once a worker gets a task
+    from translate import translate_srt_main
+
+    report = ChunkReport(
+        chunk_index=task.chunk_index,
+        cue_count=len(task.srt_content.strip().split("\n\n")),
+    )
+    options = task.options.model_copy(
+        update={"llm_config": llm_config, "chunk_queue_url": None}
+    )
+    translated = translate_srt_main(
+        task.srt_content,
+        task.source_lang,
+        task.target_lang,
+        options=options,
+        chunk_report=report,
+    )
+    return translated, report
+
+
+class ChunkWorker:
+    """Takes chunk tasks from a queue, translates them and posts the results.
+
+    Workers keep no state between tasks, so any number of them can run on
+    any node that reaches the queue. A lease is renewed in the background
+    while its chunk is translated; a worker that dies stops renewing, and
+    the chunk goes to another worker once the lease expires.
+    """
+
+    def __init__(
+        self,
+        queue: ChunkQueue,
+        worker_id: Optional[str] = None,
+        cache_mode: str = LLM_CACHE_MODE_OFF,
+        lease_seconds: float = CHUNK_LEASE_SECONDS,
+        poll_seconds: float = CHUNK_QUEUE_POLL_SECONDS,
+        max_attempts: int = CHUNK_TASK_MAX_ATTEMPTS,
+        runner: TaskRunner = translate_task,
+    ):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.cache_mode = cache_mode
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.runner = runner
+        self.stop_event = threading.Event()
+
+    def _llm_config(self, task: ChunkTask) -> Dict[str, Any]:
+        llm_config = {
+            **task.llm_config,
+            "config_list": [
+                resolve_api_keys(config) for config in task.llm_config["config_list"]
+            ],
+        }
+        if self.cache_mode != LLM_CACHE_MODE_OFF:
+            from llm_cache import apply_llm_cache
+
+            apply_llm_cache(llm_config, self.cache_mode)
+        return llm_config
+
+    def _keep_leased(self, lease: Lease, done: threading.Event):
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.renew(lease, self.lease_seconds):
+                logging.warning(
+                    f"{self.worker_id} lost the lease on chunk {lease.task.chunk_index}"
+                )
+                return
+
+    def process(self, lease: Lease):
+        task = lease.task
+        logging.info(
+            f"{self.worker_id} translating chunk {task.chunk_index + 1}/{task.chunk_count} "
+            f"of job {task.job_id} (attempt {lease.attempts})"
+        )
+        done = threading.Event()
+        renewer = threading.Thread(
+            target=self._keep_leased, args=(lease, done), daemon=True
+        )
+        renewer.start()
+        try:
+            translated, report = self.runner(task, self._llm_config(task))
+        except Exception as e:
+            logging.exception(f"{self.worker_id} failed on chunk {task.chunk_index}")
+            if not self.queue.fail(
+                lease, f"{type(e).__name__}: {e}", self.max_attempts
+            ):
+                logging.error(
+                    f"Chunk {task.chunk_index} of job {task.job_id} failed {lease.attempts} times"
+                )
+            return
+        finally:
+            done.set()
+            renewer.join()
+        report.worker = self.worker_id
+        report.attempts = lease.attempts
+        self.queue.complete(
+            lease,
+            ChunkResult(
+                job_id=task.job_id,
+                chunk_index=task.chunk_index,
+                translated_srt=translated,
+                report=report,
+            ),
+        )
+
+    def run(
+        self, max_tasks: Optional[int] = None, idle_exit_seconds: Optional[float] = None
+    ) -> int:
+        """Work until stopped, after `max_tasks` or after idling for `idle_exit_seconds`."""
+        processed = 0
+        idle_since = time.monotonic()
+        while not self.stop_event.is_set() and (
+            max_tasks is None or processed < max_tasks
+        ):
+            lease = self.queue.claim(self.lease_seconds)
+            if lease is None:
+                if (
+                    idle_exit_seconds is not None
+                    and time.monotonic() - idle_since > idle_exit_seconds
+                ):
+                    break
+                self.stop_event.wait(self.poll_seconds)
+                continue
+            self.process(lease)
+            processed += 1
+            idle_since = time.monotonic()
+        logging.info(f"{self.worker_id} stopped after {processed} chunks")
+        return processed
+
+
+def run_distributed_translation(
+    chunks: List[str],
+    source_lang: str,
+    target_lang: str,
+    llm_config: Dict[str, Any],
+    options: TranslationOptions,
+    on_chunk: Callable[[int, str, ChunkReport], None],
+    queue: Optional[ChunkQueue] = None,
+    poll_seconds: float = CHUNK_QUEUE_POLL_SECONDS,
+    timeout_seconds: Optional[float] = None,
+    idle_timeout_seconds: Optional[float] = CHUNK_JOB_IDLE_TIMEOUT_SECONDS,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> List[ChunkReport]:
+    """Publish chunks for workers and hand back their results as they arrive.
+
+    `on_chunk` receives each finished chunk on the calling thread, in
+    completion order; an `OrderedSubtitleWriter` puts them back in order.
+    `on_progress` gets the job's queued, leased and done counts on every
+    poll. A TimeoutError is raised after `timeout_seconds` in total, or
+    once no worker has held or finished a chunk for `idle_timeout_seconds`,
+    e.g. because none is running. The job is removed from the queue when
+    it ends, also on errors.
+    """
+    queue = queue or open_chunk_queue(options.chunk_queue_url or chunk_queue_url())
+    job_id = new_job_id()
+    task_options = options.model_copy(update={"llm_config": None})
+    queue.publish(
+        [
+            ChunkTask(
+                job_id=job_id,
+                chunk_index=index,
+                chunk_count=len(chunks),
+                srt_content=chunk,
+                source_lang=source_lang,
+                target_lang=target_lang,
+                llm_config=portable_llm_config(llm_config),
+                options=task_options,
+            )
+            for index, chunk in enumerate(chunks)
+        ]
+    )
+    logging.info(f"Published {len(chunks)} chunks as job {job_id}")
+
+    reports: Dict[int, ChunkReport] = {}
+    started = last_activity = time.monotonic()
+    try:
+        while len(reports) < len(chunks):
+            queue.requeue_expired()
+            results = queue.results(job_id, skip=set(reports))
+            for result in results:
+                if result.error:
+                    raise RuntimeError(
+                        f"Chunk {result.chunk_index} failed on every attempt: {result.error}"
+                    )
+                reports[result.chunk_index] = result.report
+                on_chunk(result.chunk_index, result.translated_srt, result.report)
+            counts = queue.counts(job_id)
+            if on_progress is not None:
+                on_progress(counts)
+            now = time.monotonic()
+            if results or counts.get("leased"):
+                last_activity = now
+            if results:
+                logging.info(f"Job {job_id}: {counts}")
+                continue
+            if timeout_seconds is not None and now - started > timeout_seconds:
+                raise TimeoutError(
+                    f"Job {job_id} timed out with {len(reports)} of {len(chunks)} chunks done"
+                )
+            if (
+                idle_timeout_seconds is not None
+                and now - last_activity > idle_timeout_seconds
+            ):
+                raise TimeoutError(
+                    f"No worker has taken a chunk of job {job_id} for {idle_timeout_seconds:g}s "
+                    f"({len(reports)} of {len(chunks)} chunks done); "
+                    f"start workers with `python chunk_worker.py work`"
+                )
+            time.sleep(poll_seconds)
+    finally:
+        queue.purge(job_id)
+    return [reports[index] for index in sorted(reports)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Translate subtitle chunks with workers spread over several nodes."
+    )
+    parser.add_argument(
+        "--queue",
+        default=chunk_queue_url(),
+        help="spool://<shared directory>, sqlite:///<file> or redis://host:port/db",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    work = commands.add_parser("work", help="Translate chunks from the queue")
+    work.add_argument("--threads", type=int, default=1)
+    work.add_argument(
+        "--llm-cache", choices=LLM_CACHE_MODES, default=LLM_CACHE_MODE_OFF
+    )
+    work.add_argument("--lease-seconds", type=float, default=CHUNK_LEASE_SECONDS)
+    work.add_argument(
+        "--idle-exit", type=float, help="Stop after this many seconds without work"
+    )
+
+    submit = commands.add_parser(
+        "submit", help="Publish files to the queue and merge the results"
+    )
+    submit.add_argument("srt_files", nargs="+")
+    submit.add_argument("--model", default=OPENAI_MODEL_GPT4O_MINI)
+    submit.add_argument("--source", default=LANGUAGE_ENGLISH)
+    submit.add_argument("--target", default=LANGUAGE_TURKISH)
+    submit.add_argument("--chunk-size", type=int, default=DEFAULT_SUBTITLE_CHUNK_SIZE)
+    submit.add_argument("--output-dir", help="Defaults to each input file's directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    queue = open_chunk_queue(args.queue)
+
+    if args.command == "work":
+        set_api_keys()
+        workers = [
+            ChunkWorker(
+                queue,
+                worker_id=f"{socket.gethostname()}-{os.getpid()}-{thread}",
+                cache_mode=args.llm_cache,
+                lease_seconds=args.lease_seconds,
+            )
+            for thread in range(args.threads)
+        ]
+        threads = [
+            threading.Thread(
+                target=worker.run, kwargs={"idle_exit_seconds": args.idle_exit}
+            )
+            for worker in workers
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            # Unfinished chunks go to other workers once their leases expire
+            for worker in workers:
+                worker.stop_event.set()
+        return
+
+    llm_config = {"temperature": 0.0, "config_list": [{"model": args.model}]}
+    options = TranslationOptions(chunk_size=args.chunk_size)
+    for srt_file in args.srt_files:
+        with open(srt_file, "r", encoding=UTF8_ENCODING) as f:
+            chunks = split_subtitles(f.read(), args.chunk_size)
+        stem = os.path.splitext(os.path.basename(srt_file))[0]
+        output_path = os.path.join(
+            args.output_dir or os.path.dirname(srt_file),
+            f"{stem}.{args.target.lower()}{SRT_EXTENSION}",
+        )
+        with OrderedSubtitleWriter(output_path, len(chunks)) as writer:
+            run_distributed_translation(
+                chunks,
+                args.source,
+                args.target,
+                llm_config,
+                options,
+                on_chunk=lambda index, text, report: writer.submit(index, text),
+                queue=queue,
+            )
+        print(f"{srt_file} -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
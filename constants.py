@@ -1,10 +1,12 @@
 import os
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
-from autogen import AssistantAgent, UserProxyAgent
+# autogen is heavy to import, so it is only loaded once a translation starts
+if TYPE_CHECKING:
+    from autogen import AssistantAgent, UserProxyAgent
 
 # Agent Types
-AgentType = Union[AssistantAgent, UserProxyAgent]
+AgentType = Union["AssistantAgent", "UserProxyAgent"]
 
 # File Paths
 AGENT_CONFIG_FILE = "agent_config.json"
@@ -14,6 +16,39 @@ ENV_FILE = ".env"
 # Directories
 DATA_DIR = "data"
 CODING_DIR = "coding"
+TRANSCRIPT_DIR = os.path.join(DATA_DIR, "transcripts")
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+LLM_CACHE_DIR = os.path.join(DATA_DIR, "llm_cache")
+JOB_REPORT_DIR = os.path.join(DATA_DIR, "reports")
+
+# Output
+PARTIAL_OUTPUT_SUFFIX = ".partial"
+# Translations larger than this stay on disk instead of in session state
+INLINE_OUTPUT_MAX_BYTES = 1024 * 1024
+
+# Chat Transcripts
+TRANSCRIPT_FILE_NAME = "transcripts.jsonl.gz"
+TRANSCRIPT_MAX_FILE_BYTES = 10 * 1024 * 1024
+TRANSCRIPT_BACKUP_COUNT = 5
+TRANSCRIPT_RING_SIZE = 20
+TRANSCRIPT_QUEUE_SIZE = 100
+
+# LLM Record/Replay Cache
+LLM_CACHE_MODE_OFF = "off"
+LLM_CACHE_MODE_RECORD = "record"
+LLM_CACHE_MODE_REPLAY = "replay"
+LLM_CACHE_MODE_PASSTHROUGH = "passthrough"
+LLM_CACHE_MODES = [
+    LLM_CACHE_MODE_OFF,
+    LLM_CACHE_MODE_RECORD,
+    LLM_CACHE_MODE_REPLAY,
+    LLM_CACHE_MODE_PASSTHROUGH,
+]
+LLM_CACHE_MODE_ENV = "LLM_CACHE_MODE"
+
+# Document Cache
+# Approximate memory for parsed views of the most recent source, chunk and translated documents
+DOCUMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
 
 # Model Providers
 MODEL_PROVIDER_OPENAI = "OpenAI"
@@ -38,6 +73,8 @@ HUGGINGFACE_MODEL_META_LLAMA_405B = "meta-llama/Meta-Llama-3.1-405B-Instruct"
 # API Configuration
 OLLAMA_BASE_URL = "http://0.0.0.0:4000"
 OLLAMA_API_KEY = "NULL"
+OPENAI_API_KEY_ENV = "OPENAI_API_KEY"
+HUGGINGFACE_API_TOKEN_ENV = "HUGGINGFACEHUB_API_TOKEN"
 
 # File Extensions
 SRT_EXTENSION = ".srt"
@@ -52,11 +89,141 @@ BYTE_ORDER_MARK = "\ufeff"
 MAX_SUBTITLE_LINES = 2
 MAX_SUBTITLE_LINE_LENGTH = 50
 
+# Subtitle Timing
+MIN_SUBTITLE_GAP_MS = 84
+MIN_SUBTITLE_DURATION_MS = 833
+COMMON_FRAMERATES = [23.976, 24.0, 25.0, 29.97, 30.0]
+TIMING_OPERATION_SHIFT = "Shift"
+TIMING_OPERATION_FRAMERATE = "Change framerate"
+TIMING_OPERATION_RESYNC = "Two-point resync"
+TIMING_OPERATION_REPAIR = "Repair overlaps"
+
+# Quality Analysis
+QUALITY_MAX_CPS = 17.0
+QUALITY_MAX_DURATION_MS = 7000
+# Histogram bucket edges, values below the first and above the last edge get their own bucket
+QUALITY_CPS_BINS = [5, 10, 15, 17, 20, 25, 30]
+QUALITY_DURATION_BINS_MS = [833, 1500, 3000, 5000, 7000, 10000]
+QUALITY_GAP_BINS_MS = [0, 84, 250, 500, 1000, 2000]
+QUALITY_LINE_LENGTH_BINS = [20, 30, 40, 43, 50, 60]
+
 # Wiktionary
 MAX_DEFINITIONS = 20
+WIKTIONARY_API_URL = "https://en.wiktionary.org/api/rest_v1/page/definition/"
+WIKTIONARY_INDEX_PATH_ENV = "WIKTIONARY_INDEX_PATH"
+WIKTIONARY_INDEX_BATCH_SIZE = 10000
+WIKTIONARY_CACHE_SIZE = 4096
+
+# Definition Prefetch
+WORD_FREQUENCY_DIR = "resources/word_frequency"
+PREFETCH_MIN_WORD_LENGTH = 4
+PREFETCH_MAX_DEFINITION_CHARS = 120
+PREFETCH_LOOKUP_WORKERS = 8
 
 # Chunk Sizes
 DEFAULT_SUBTITLE_CHUNK_SIZE = 30
+CHUNK_SIZE_CANDIDATES = [10, 20, 30, 40, 50]
+
+# Chunk Size Tuner
+CHUNK_STATS_PATH = os.path.join(DATA_DIR, "chunk_stats.jsonl")
+TUNER_MIN_SAMPLES = 3
+FAKE_LLM_MODEL = "fake-llm"
+FAKE_LLM_SECONDS_PER_CALL = 8.0
+FAKE_LLM_SECONDS_PER_CUE = 0.6
+FAKE_LLM_CUE_DROP_RATE = 0.004
+
+# Cue Editor
+CUE_EDITOR_PAGE_SIZES = [25, 50, 100]
+
+# Preflight
+# Used until the chunk statistics have enough runs with call counts
+PREFLIGHT_DEFAULT_LLM_CALLS_PER_CHUNK = 5
+PREFLIGHT_DEFAULT_SECONDS_PER_CALL = 10.0
+# Replies repeat the original cues before the translation
+PREFLIGHT_COMPLETION_TOKEN_RATIO = 2.0
+# Chunks are translated one after another
+TRANSLATION_CONCURRENCY = 1
+LLM_REQUESTS_PER_MINUTE_ENV = "LLM_REQUESTS_PER_MINUTE"
+LLM_TOKENS_PER_MINUTE_ENV = "LLM_TOKENS_PER_MINUTE"
+
+# Stage Pipeline
+PIPELINE_TRANSLATE_WORKERS = 2
+PIPELINE_REVIEW_WORKERS = 1
+PIPELINE_FORMAT_WORKERS = 1
+PIPELINE_QUEUE_SIZE = 2
+# How often blocked workers check whether the pipeline was aborted
+PIPELINE_POLL_SECONDS = 0.1
+PIPELINE_STAGE_TRANSLATE = "translate"
+PIPELINE_STAGE_REVIEW = "review"
+PIPELINE_STAGE_FORMAT = "format"
+
+# Distributed Workers
+CHUNK_QUEUE_URL_ENV = "CHUNK_QUEUE_URL"
+CHUNK_QUEUE_DEFAULT_URL = "spool://" + os.path.join(DATA_DIR, "chunk_queue")
+CHUNK_QUEUE_REDIS_PREFIX = "subtitle-translator"
+# Workers renew their lease while a chunk is being translated
+CHUNK_LEASE_SECONDS = 120
+CHUNK_QUEUE_POLL_SECONDS = 1.0
+# A chunk that failed this often is reported to the coordinator instead of retried
+CHUNK_TASK_MAX_ATTEMPTS = 3
+# The coordinator gives up when no worker has held or finished a chunk for this long
+CHUNK_JOB_IDLE_TIMEOUT_SECONDS = 300
+# Keys never travel with a task; workers read them from these variables in their own
+# environment. Placeholder keys of local servers are not secrets and are sent as they are.
+CHUNK_TASK_API_KEY_ENVS = [OPENAI_API_KEY_ENV, HUGGINGFACE_API_TOKEN_ENV]
+CHUNK_TASK_PLACEHOLDER_API_KEYS = [OLLAMA_API_KEY]
+
+# Batch Mode
+BATCH_DIR = os.path.join(DATA_DIR, "batches")
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_SECONDS = 60.0
+# Chunks whose result is missing or misaligned go into another batch, up to this many per run
+BATCH_MAX_ROUNDS = 3
+BATCH_STATUS_COMPILED = "compiled"
+# Saved before a batch is created, so a crash before its id is saved is detected on resume
+BATCH_STATUS_SUBMITTING = "submitting"
+BATCH_STATUS_COMPLETED = "completed"
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+BATCH_SERVER_PORT = 8765
+
+# Version Diff
+# Changed cues at least this similar to an old cue count as edited, others as new
+VERSION_DIFF_EDIT_SIMILARITY = 0.6
+# How far a moved cue may drift from the file's overall re-timing and still be reused
+VERSION_DIFF_MAX_SHIFT_MS = 2000
+
+# Review Gate
+REVIEW_SAMPLE_RATE = 0.1
+REVIEW_GATE_MIN_LENGTH_RATIO = 0.5
+REVIEW_GATE_MAX_LENGTH_RATIO = 2.0
+REVIEW_GATE_MIN_RATIO_CHARS = 15
+REVIEW_GATE_MAX_UNTRANSLATED_RATIO = 0.5
+REVIEW_GATE_MIN_UNTRANSLATED_WORDS = 2
+
+# Speaker Selection
+SPEAKER_SELECTION_FSM = "fsm"
+SPEAKER_SELECTION_AUTO = "auto"
+MAX_SPEAKER_RETRIES = 2
+
+# Early Termination
+# Rounds the usual workflow still runs after a speaker's message, not counting
+# the review: formatter tool calls and their results (4) + final formatter message (1)
+EXPECTED_ROUNDS_AFTER_SPEAKER = {
+    "Subtitle_Translator": 5,
+    "Translation_Reviewer": 5,
+    "Subtitle_Formatter": 0,
+}
+
+# Streaming
+STREAM_MAX_RETRIES = 2
+# Placeholder request attached to aborted streams
+STREAM_ABORT_URL = "http://localhost/stream-aborted"
+# Models whose API does not stream completions
+STREAMING_UNSUPPORTED_MODEL_PREFIXES = ("o1",)
+
+# Token Estimation
+CHARS_PER_TOKEN = 4
 
 # Messages
 TERMINATION_MESSAGE = "TERMINATE"
@@ -71,6 +238,26 @@ LANGUAGE_ITALIAN = "Italian"
 LANGUAGE_SPANISH = "Spanish"
 LANGUAGE_TURKISH = "Turkish"
 
+LANGUAGE_CODES = {
+    LANGUAGE_ENGLISH: "en",
+    LANGUAGE_FRENCH: "fr",
+    LANGUAGE_GERMAN: "de",
+    LANGUAGE_ITALIAN: "it",
+    LANGUAGE_SPANISH: "es",
+    LANGUAGE_TURKISH: "tr",
+}
+
+# Startup
+STARTUP_TARGET_SECONDS = 1.5
+STARTUP_HEAVY_MODULES = ["autogen", "flaml", "openai", "numpy"]
+
+# Resource Profiling
+# Set to 1 to trace allocations from startup; the debug panel can also switch it on
+RESOURCE_PROFILING_ENV = "RESOURCE_PROFILING"
+RESOURCE_PROFILE_PATH = os.path.join(PROFILE_DIR, "resource_profile.jsonl")
+RESOURCE_PROFILE_TRACE_FRAMES = 1
+RESOURCE_PROFILE_TOP_ALLOCATIONS = 15
+
 # Logging
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
@@ -0,0 +1,77 @@
+# cue_editor.py
+
+import itertools
+from typing import Dict, List, Optional, Set
+
+from constants import BYTE_ORDER_MARK
+from utils import check_subtitle_pair, remove_byte_order_mark, split_subtitle_blocks
+
+_generations = itertools.count()
+
+
+class CueDocument:
+    """Original and translated subtitles as per-cue blocks for the cue editor.
+
+    Blocks are split the same way `calculate_subtitle_stats` splits them, so a
+    block that does not parse still shows up and can be fixed. Edits replace
+    a cue's text lines and are only validated against their own original.
+    `generation` is unique per document and keeps widget keys from leaking
+    into the next loaded file.
+    """
+
+    def __init__(self, original_content: Optional[str], translated_content: str):
+        self.original_content = original_content
+        self.content = translated_content
+        self.generation = next(_generations)
+        self.original_blocks = (
+            split_subtitle_blocks(remove_byte_order_mark(original_content))
+            if original_content
+            else []
+        )
+        # split_subtitle_blocks returns a copy, edits never reach the cached split
+        self.blocks = split_subtitle_blocks(remove_byte_order_mark(translated_content))
+        self.edited: Set[int] = set()
+        self.issues: Dict[int, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def page_count(self, page_size: int) -> int:
+        return max(-(-len(self.blocks) // page_size), 1)
+
+    def window(self, page: int, page_size: int) -> range:
+        """Positions of the cues on a zero-based page."""
+        start = min(page, self.page_count(page_size) - 1) * page_size
+        return range(start, min(start + page_size, len(self.blocks)))
+
+    def header(self, position: int) -> str:
+        """The index and timing lines of a translated cue."""
+        return "\n".join(self.blocks[position].split("\n")[:2])
+
+    def text(self, position: int) -> str:
+        return "\n".join(self.blocks[position].split("\n")[2:])
+
+    def original_text(self, position: int) -> str:
+        if position >= len(self.original_blocks):
+            return ""
+        return "\n".join(self.original_blocks[position].split("\n")[2:])
+
+    def edit(self, position: int, text: str) -> List[str]:
+        """Replace a cue's text and return the issues of that cue alone."""
+        # Blank lines would end the block, so they are dropped
+        lines = [line.rstrip() for line in text.strip().split("\n") if line.strip()]
+        self.blocks[position] = "\n".join(self.blocks[position].split("\n")[:2] + lines)
+        self.edited.add(position)
+        self.issues[position] = (
+            check_subtitle_pair(
+                position + 1, self.original_blocks[position], self.blocks[position]
+            )
+            if position < len(self.original_blocks)
+            else []
+        )
+        self.content = self.render()
+        return self.issues[position]
+
+    def render(self) -> str:
+        prefix = BYTE_ORDER_MARK if self.content.startswith(BYTE_ORDER_MARK) else ""
+        return prefix + "\n\n".join(self.blocks)
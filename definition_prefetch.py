@@ -0,0 +1,159 @@
+# definition_prefetch.py
+
+import logging
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import requests
+
+from agent_models import GlossaryPrefetchReport, WiktionaryDefinition
+from constants import (
+    LANGUAGE_CODES,
+    MAX_DEFINITIONS,
+    PREFETCH_LOOKUP_WORKERS,
+    PREFETCH_MAX_DEFINITION_CHARS,
+    PREFETCH_MIN_WORD_LENGTH,
+    UTF8_ENCODING,
+    WORD_FREQUENCY_DIR,
+)
+from subtitle_utils import lookup_definition, parse_srt
+from wiktionary_index import stem_candidates
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?", re.UNICODE)
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+SENTENCE_END_PATTERN = re.compile(r"[.!?…]")
+
+
+@lru_cache(maxsize=None)
+def load_frequency_list(language_code: str) -> FrozenSet[str]:
+    """Load the bundled list of common words for a language, if there is one."""
+    path = os.path.join(WORD_FREQUENCY_DIR, f"{language_code}.txt")
+    if not os.path.exists(path):
+        logging.info(f"No word frequency list for language: {language_code}")
+        return frozenset()
+    with open(path, "r", encoding=UTF8_ENCODING) as f:
+        return frozenset(
+            line.strip().casefold()
+            for line in f
+            if line.strip() and not line.startswith("#")
+        )
+
+
+def prefetch_supported(source_lang: str) -> bool:
+    """Prefetching needs a bundled frequency list for the source language."""
+    return bool(load_frequency_list(LANGUAGE_CODES.get(source_lang, "")))
+
+
+def _is_common(word: str, common_words: FrozenSet[str]) -> bool:
+    return word in common_words or any(
+        stem in common_words for stem in stem_candidates(word)
+    )
+
+
+def find_rare_words(
+    srt_content: str, language_code: str, max_words: int = MAX_DEFINITIONS
+) -> List[str]:
+    """Return the rarest-looking words of a chunk, in order of appearance."""
+    common_words = load_frequency_list(language_code)
+    if not common_words:
+        return []
+
+    rare_words: List[str] = []
+    # Sentences run on across cues, so the text is scanned as a whole
+    text = "\n".join(
+        HTML_TAG_PATTERN.sub("", subtitle["text"])
+        for subtitle in parse_srt(srt_content)
+    )
+    previous_end = None
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group()
+        sentence_initial = previous_end is None or bool(
+            SENTENCE_END_PATTERN.search(text, previous_end, match.start())
+        )
+        previous_end = match.end()
+        if len(word) < PREFETCH_MIN_WORD_LENGTH:
+            continue
+        # Capitalized words are mostly names, which have no useful definition,
+        # unless the capital only starts a sentence
+        if not word.islower():
+            if not (sentence_initial and word[0].isupper() and word[1:].islower()):
+                continue
+            word = word.lower()
+        word = word.split("'")[0]
+        if word in rare_words or _is_common(word, common_words):
+            continue
+        rare_words.append(word)
+        if len(rare_words) >= max_words:
+            return rare_words
+    return rare_words
+
+
+def _safe_lookup(word: str, language_code: str) -> Optional[str]:
+    try:
+        return lookup_definition(word, language_code)
+    except requests.RequestException as e:
+        logging.warning(f"Definition prefetch failed for '{word}': {str(e)}")
+        return None
+
+
+def resolve_definitions(
+    words: List[str], language_code: str
+) -> List[WiktionaryDefinition]:
+    """Resolve a batch of words concurrently through the cached lookup path."""
+    if not words:
+        return []
+    with ThreadPoolExecutor(max_workers=PREFETCH_LOOKUP_WORKERS) as executor:
+        definitions = list(
+            executor.map(lambda word: _safe_lookup(word, language_code), words)
+        )
+    return [
+        WiktionaryDefinition(word=word, definition=definition, language=language_code)
+        for word, definition in zip(words, definitions)
+        if definition
+    ]
+
+
+def format_glossary(definitions: List[WiktionaryDefinition]) -> str:
+    """Render definitions as a compact glossary block for the chunk prompt."""
+    lines = []
+    for entry in definitions:
+        definition = entry.definition
+        if len(definition) > PREFETCH_MAX_DEFINITION_CHARS:
+            definition = (
+                definition[: PREFETCH_MAX_DEFINITION_CHARS - 3].rstrip() + "..."
+            )
+        lines.append(f"- {entry.word}: {definition}")
+    return "\n".join(lines)
+
+
+def prefetch_glossary(
+    srt_content: str, source_lang: str
+) -> Tuple[GlossaryPrefetchReport, str]:
+    """Find rare words in a chunk and resolve their definitions before the chat starts."""
+    language_code = LANGUAGE_CODES.get(source_lang, "en")
+    rare_words = find_rare_words(srt_content, language_code)
+    definitions = resolve_definitions(rare_words, language_code)
+    report = GlossaryPrefetchReport(
+        rare_words=len(rare_words),
+        glossary_terms=len(definitions),
+        # The translator batches up to MAX_DEFINITIONS words per tool call
+        estimated_tool_round_trips_removed=math.ceil(len(rare_words) / MAX_DEFINITIONS),
+    )
+    logging.info(
+        f"Prefetched {report.glossary_terms} definitions for {report.rare_words} rare words"
+    )
+    return report, format_glossary(definitions)
+
+
+def count_definition_tool_calls(chat_history: List[Dict[str, Any]]) -> int:
+    """Count the `get_wiktionary_definition` calls the agents still made in a chat."""
+    return sum(
+        1
+        for message in chat_history
+        for tool_call in message.get("tool_calls") or []
+        if tool_call.get("function", {}).get("name") == "get_wiktionary_definition"
+    )
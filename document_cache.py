@@ -0,0 +1,124 @@
+# document_cache.py
+
+import hashlib
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from constants import DOCUMENT_CACHE_MAX_BYTES
+
+# Kinds of parsed views, one cache entry per kind and document
+KIND_SUBTITLES = "subtitles"
+KIND_BLOCKS = "blocks"
+KIND_TIMINGS = "timings"
+
+# Parsed views nest cue lists, cue dicts and their strings, or arrays and texts
+SIZE_ESTIMATE_DEPTH = 3
+
+
+def approximate_size(value: Any, depth: int = SIZE_ESTIMATE_DEPTH) -> int:
+    """Rough size in bytes of a parsed view, including the objects it holds."""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value, 0)
+    if depth == 0 or isinstance(value, (str, bytes)):
+        return size
+    if isinstance(value, dict):
+        return size + sum(approximate_size(item, depth - 1) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return size + sum(approximate_size(item, depth - 1) for item in value)
+    if hasattr(value, "__dict__"):
+        return size + approximate_size(vars(value), depth)
+    return size
+
+
+class DocumentCache:
+    """Thread-safe LRU cache of parsed views of SRT documents.
+
+    Entries are keyed by the SHA-1 digest of the document text, so the
+    cache never keeps a document alive only to compare keys. The views are
+    bounded by their approximate size in bytes rather than their number,
+    because one large file can outweigh hundreds of chunks; a view larger
+    than the whole budget is returned without being cached. Parsed views
+    are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def get(self, kind: str, content: str, build: Callable[[str], Any]) -> Any:
+        """Return the cached `kind` view of `content`, building it on a miss."""
+        key = (kind, hashlib.sha1(content.encode()).digest())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return self._entries[key][0]
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+
+        # Built outside the lock; a concurrent miss on the same document builds twice
+        value = build(content)
+        size = approximate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries[key][1]
+            self._entries[key] = (value, size)
+            self._entries.move_to_end(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def hit_rate(self, kind: str = None) -> float:
+        with self._lock:
+            kinds = [kind] if kind else set(self.hits) | set(self.misses)
+            hits = sum(self.hits.get(k, 0) for k in kinds)
+            lookups = hits + sum(self.misses.get(k, 0) for k in kinds)
+        return hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            stats = {
+                kind: {
+                    "hits": self.hits.get(kind, 0),
+                    "misses": self.misses.get(kind, 0),
+                }
+                for kind in kinds
+            }
+            entries = len(self._entries)
+            cached_bytes = self.bytes
+        for kind in kinds:
+            stats[kind]["hit_rate"] = round(self.hit_rate(kind), 4)
+        return {
+            "entries": entries,
+            "bytes": cached_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate(), 4),
+            **stats,
+        }
+
+    def log_stats(self):
+        logging.info(f"Document cache: {self.as_dict()}")
+
+
+DOCUMENT_CACHE = DocumentCache()
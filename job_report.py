@@ -0,0 +1,57 @@
+# job_report.py
+
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from agent_models import (
+    ChunkReport,
+    JobReport,
+    PipelineReport,
+    PreflightPlan,
+    VersionDiffReport,
+)
+from constants import APP_VERSION, JOB_REPORT_DIR, UTF8_ENCODING
+
+
+def build_job_report(
+    preflight: PreflightPlan,
+    chunk_reports: List[ChunkReport],
+    input_file: Optional[str] = None,
+    output_file: Optional[str] = None,
+    pipeline: Optional[PipelineReport] = None,
+    version_diff: Optional[VersionDiffReport] = None,
+) -> JobReport:
+    """Put the preflight estimates next to what the job actually used."""
+    return JobReport(
+        app_version=APP_VERSION,
+        created_at=datetime.now(timezone.utc).isoformat(),
+        input_file=input_file,
+        output_file=output_file,
+        preflight=preflight,
+        chunks=chunk_reports,
+        # Pipelined chunks overlap, so their times do not add up to the job's
+        seconds=(
+            pipeline.seconds
+            if pipeline
+            else sum(report.seconds for report in chunk_reports)
+        ),
+        prompt_tokens=sum(report.prompt_tokens for report in chunk_reports),
+        completion_tokens=sum(report.completion_tokens for report in chunk_reports),
+        llm_calls=sum(report.llm_calls for report in chunk_reports),
+        pipeline=pipeline,
+        version_diff=version_diff,
+    )
+
+
+def write_job_report(report: JobReport, report_dir: str = JOB_REPORT_DIR) -> str:
+    """Write the report as JSON named after the output file and return its path."""
+    os.makedirs(report_dir, exist_ok=True)
+    name = Path(report.output_file or report.input_file or "translation").stem
+    path = os.path.join(report_dir, f"{name}-job.json")
+    with open(path, "w", encoding=UTF8_ENCODING) as f:
+        f.write(report.model_dump_json(indent=2))
+    logging.info(f"Job report written to {path}")
+    return path
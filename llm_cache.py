@@ -0,0 +1,253 @@
+# llm_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from constants import (
+    LLM_CACHE_DIR,
+    LLM_CACHE_MODE_OFF,
+    LLM_CACHE_MODE_PASSTHROUGH,
+    LLM_CACHE_MODE_RECORD,
+    LLM_CACHE_MODE_REPLAY,
+    UTF8_ENCODING,
+)
+
+
+class ReplayCacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class LLMCacheStats:
+    """Thread-safe counters shared by every record/replay transport in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.network_calls = 0
+
+    def count(self, **increments: int):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+            "network_calls": self.network_calls,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+LLM_CACHE_STATS = LLMCacheStats()
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Content-address a completion request (model, messages, temperature, tools, ...)."""
+    canonical = json.dumps(
+        body, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode(UTF8_ENCODING)).hexdigest()
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Passes response bytes through as they arrive and stores them once complete."""
+
+    def __init__(self, stream: httpx.SyncByteStream, on_complete):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._chunks: List[bytes] = []
+        self._complete = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+        self._complete = True
+
+    def close(self):
+        self._stream.close()
+        # Aborted streams are not recorded
+        if self._complete:
+            self._on_complete(b"".join(self._chunks))
+
+
+class RecordReplayTransport(httpx.BaseTransport):
+    """httpx transport under the OpenAI client that records and replays chat completions.
+
+    Modes:
+    - record: serve recorded responses, call the API and record on a miss
+    - replay: serve recorded responses only, never touch the network
+    - passthrough: always call the API, only measure how often a recording exists
+    """
+
+    def __init__(self, mode: str, cache_dir: str = LLM_CACHE_DIR):
+        if mode not in (
+            LLM_CACHE_MODE_RECORD,
+            LLM_CACHE_MODE_REPLAY,
+            LLM_CACHE_MODE_PASSTHROUGH,
+        ):
+            raise ValueError(f"Unknown LLM cache mode: {mode}")
+        self.mode = mode
+        self.cache_dir = cache_dir
+        self._network: Optional[httpx.HTTPTransport] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding=UTF8_ENCODING) as f:
+            return json.load(f)
+
+    def _store(
+        self, key: str, body: Dict[str, Any], response: httpx.Response, content: bytes
+    ):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "request": body,
+            "status_code": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "content": content.decode(UTF8_ENCODING),
+        }
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding=UTF8_ENCODING) as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        LLM_CACHE_STATS.count(recorded=1)
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        if self._network is None:
+            self._network = httpx.HTTPTransport()
+        LLM_CACHE_STATS.count(network_calls=1)
+        return self._network.handle_request(request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or not request.url.path.endswith(
+            "/chat/completions"
+        ):
+            if self.mode == LLM_CACHE_MODE_REPLAY:
+                raise ReplayCacheMissError(f"Replay mode cannot serve {request.url}")
+            return self._send(request)
+
+        body = json.loads(request.read())
+        key = request_key(body)
+        recorded = self._load(key)
+        LLM_CACHE_STATS.count(
+            requests=1, hits=int(bool(recorded)), misses=int(not recorded)
+        )
+
+        if recorded and self.mode != LLM_CACHE_MODE_PASSTHROUGH:
+            logging.info(f"LLM cache hit: {key[:12]}")
+            return httpx.Response(
+                recorded["status_code"],
+                headers={"content-type": recorded["content_type"]},
+                content=recorded["content"].encode(UTF8_ENCODING),
+                request=request,
+            )
+        if self.mode == LLM_CACHE_MODE_REPLAY:
+            raise ReplayCacheMissError(f"No recorded response for request {key[:12]}")
+
+        response = self._send(request)
+        if self.mode != LLM_CACHE_MODE_RECORD or response.status_code != 200:
+            return response
+        if response.is_stream_consumed:
+            # In-memory responses arrive already read
+            self._store(key, body, response, response.content)
+        else:
+            response.stream = _RecordingStream(
+                response.stream,
+                lambda content: self._store(key, body, response, content),
+            )
+        return response
+
+    def close(self):
+        if self._network is not None:
+            self._network.close()
+
+
+class RecordReplayHTTPClient(httpx.Client):
+    """httpx client that autogen can safely deep-copy along with the llm_config."""
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "RecordReplayHTTPClient":
+        return self
+
+
+class HookedHTTPClient(RecordReplayHTTPClient):
+    """Client that sends through another client's transport and runs event hooks on the way.
+
+    Lets one agent's requests be observed without losing the record/replay
+    transport its llm_config may already route through.
+    """
+
+    def __init__(
+        self,
+        base: Optional[httpx.Client] = None,
+        event_hooks: Optional[Dict[str, List[Callable]]] = None,
+    ):
+        super().__init__(
+            transport=base._transport if base is not None else None,
+            timeout=base.timeout if base is not None else httpx.Timeout(600.0),
+            event_hooks=event_hooks,
+        )
+
+
+def hooked_llm_config(
+    llm_config: Dict[str, Any], event_hooks: Dict[str, List[Callable]]
+) -> Tuple[Dict[str, Any], HookedHTTPClient]:
+    """A copy of an llm_config whose requests run the given httpx event hooks."""
+    config_list = llm_config.get("config_list", [])
+    base = next(
+        (config["http_client"] for config in config_list if config.get("http_client")),
+        None,
+    )
+    client = HookedHTTPClient(base, event_hooks)
+    return {
+        **llm_config,
+        "config_list": [{**config, "http_client": client} for config in config_list],
+    }, client
+
+
+@lru_cache(maxsize=None)
+def get_http_client(
+    mode: str, cache_dir: str = LLM_CACHE_DIR
+) -> RecordReplayHTTPClient:
+    """Return the shared record/replay HTTP client for a cache mode."""
+    logging.info(f"LLM record/replay cache enabled in {mode} mode: {cache_dir}")
+    return RecordReplayHTTPClient(
+        transport=RecordReplayTransport(mode, cache_dir), timeout=httpx.Timeout(600.0)
+    )
+
+
+def apply_llm_cache(llm_config: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    """Route every config of an llm_config through the record/replay layer."""
+    if mode == LLM_CACHE_MODE_OFF:
+        return llm_config
+    http_client = get_http_client(mode)
+    for config in llm_config.get("config_list", []):
+        config["http_client"] = http_client
+        if mode == LLM_CACHE_MODE_REPLAY:
+            # No request leaves the process, but the OpenAI client insists on a key
+            config.setdefault("api_key", os.getenv("OPENAI_API_KEY") or "replay")
+    # autogen's own disk cache would hide requests from this layer
+    llm_config["cache_seed"] = None
+    return llm_config
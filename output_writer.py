@@ -0,0 +1,105 @@
+# output_writer.py
+
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from constants import BYTE_ORDER_MARK, PARTIAL_OUTPUT_SUFFIX, UTF8_ENCODING
+
+
+class OrderedSubtitleWriter:
+    """Writes translated chunks to disk in chunk order as they complete.
+
+    Chunks may arrive in any order; those that are ahead of the next expected
+    chunk wait in a reorder buffer, so memory only grows with the number of
+    out-of-order chunks, not with the file. Output goes to a partial file
+    next to the destination, which can be read at any time, and is renamed
+    into place atomically once every chunk has been written.
+    """
+
+    def __init__(self, output_path: str, total_chunks: int):
+        self.output_path = output_path
+        self.partial_path = output_path + PARTIAL_OUTPUT_SUFFIX
+        self.total_chunks = total_chunks
+        self.next_chunk = 0
+        self.bytes_written = 0
+        self._has_content = False
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        self._file = open(self.partial_path, "w", encoding=UTF8_ENCODING)
+        self._write(BYTE_ORDER_MARK)
+
+    def __enter__(self) -> "OrderedSubtitleWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def pending_chunks(self) -> int:
+        return len(self._pending)
+
+    @property
+    def complete(self) -> bool:
+        return self.next_chunk == self.total_chunks
+
+    def _write(self, text: str):
+        self._file.write(text)
+        self.bytes_written += len(text.encode(UTF8_ENCODING))
+
+    def submit(self, chunk_index: int, translated_chunk: str):
+        """Hand over a finished chunk and write every chunk that is now in order."""
+        if not 0 <= chunk_index < self.total_chunks:
+            raise ValueError(f"Chunk index out of range: {chunk_index}")
+        with self._lock:
+            if chunk_index < self.next_chunk or chunk_index in self._pending:
+                raise ValueError(f"Chunk {chunk_index} was already submitted")
+            self._pending[chunk_index] = translated_chunk
+            while self.next_chunk in self._pending:
+                text = self._pending.pop(self.next_chunk).lstrip(BYTE_ORDER_MARK)
+                text = text.strip()
+                if text:
+                    if self._has_content:
+                        self._write("\n\n")
+                    self._write(text)
+                    self._has_content = True
+                self.next_chunk += 1
+            self._file.flush()
+
+    def read_partial(self) -> str:
+        """Return everything written so far, e.g. to offer it for download mid-job."""
+        with self._lock:
+            self._file.flush()
+            with open(self.partial_path, "r", encoding=UTF8_ENCODING) as f:
+                return f.read()
+
+    def close(self) -> str:
+        """Move the finished file into place and return its path."""
+        with self._lock:
+            if not self.complete:
+                raise ValueError(
+                    f"Only {self.next_chunk} of {self.total_chunks} chunks were written"
+                )
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.partial_path, self.output_path)
+        logging.info(
+            f"Wrote {self.total_chunks} chunks ({self.bytes_written} bytes) to {self.output_path}"
+        )
+        return self.output_path
+
+    def abort(self, keep_partial: bool = True):
+        """Stop writing; the partial file is kept unless asked otherwise."""
+        with self._lock:
+            self._file.close()
+            if not keep_partial and os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+        logging.warning(
+            f"Output stopped after {self.next_chunk} of {self.total_chunks} chunks: {self.partial_path}"
+        )
@@ -0,0 +1,497 @@
+# pipeline.py
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from autogen import gather_usage_summary
+
+from agent_models import (
+    ChunkReport,
+    PipelineReport,
+    StageReport,
+    TranslationOptions,
+)
+from agents import create_agents
+from chunk_validator import ChunkValidator
+from constants import (
+    FORMATTED_SUBTITLES_END,
+    FORMATTED_SUBTITLES_START,
+    MAX_SPEAKER_RETRIES,
+    PIPELINE_POLL_SECONDS,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_STAGE_FORMAT,
+    PIPELINE_STAGE_REVIEW,
+    PIPELINE_STAGE_TRANSLATE,
+)
+from definition_prefetch import prefetch_glossary, prefetch_supported
+from quality_analysis import TIMING_RULES, analyze_quality
+from review_gate import decide_review
+from subtitle_utils import parse_srt, render_srt, verify_alignment, wrap_subtitles
+
+# Marks the end of a queue's items
+_STOP = object()
+
+
+class Stage:
+    """One step of a StagePipeline: a function applied to each item by its own workers."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.report = StageReport(name=name, workers=workers)
+        self.queue_waits: List[float] = []
+
+
+class StagePipeline:
+    """Runs items through stages connected by bounded queues.
+
+    Every stage has its own worker threads, so the stages of different items
+    overlap and the slowest stage sets the throughput. Full queues block the
+    stage in front of them, which keeps at most `queue_size` items waiting
+    between two stages. Results are handed to `on_result` on the calling
+    thread, in completion order. The first error stops every stage and is
+    re-raised by `run`. A pipeline runs once.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = PIPELINE_QUEUE_SIZE):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.report = PipelineReport()
+        self._lock = threading.Lock()
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _put(self, target: queue.Queue, entry: Any) -> bool:
+        while not self._abort.is_set():
+            try:
+                # Stamped per attempt, so time blocked on a full queue is not queue wait
+                target.put(
+                    entry if entry is _STOP else (time.perf_counter(), *entry),
+                    timeout=PIPELINE_POLL_SECONDS,
+                )
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue) -> Any:
+        while not self._abort.is_set():
+            try:
+                return source.get(timeout=PIPELINE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._abort.set()
+
+    def _feed(self, items: Iterable[Tuple[int, Any]], target: queue.Queue):
+        try:
+            for index, item in items:
+                if not self._put(target, (index, item)):
+                    return
+        except Exception as e:
+            self._fail(e)
+            return
+        for _ in range(self.stages[0].workers):
+            self._put(target, _STOP)
+
+    def _work(
+        self,
+        position: int,
+        source: queue.Queue,
+        target: queue.Queue,
+        remaining: List[int],
+    ):
+        stage = self.stages[position]
+        while True:
+            entry = self._get(source)
+            if entry is _STOP:
+                break
+            enqueued, index, item = entry
+            started = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                logging.error(
+                    f"Pipeline stage {stage.name} failed on {index}: {str(e)}"
+                )
+                self._fail(e)
+                break
+            finished = time.perf_counter()
+            delivered = self._put(target, (index, result))
+            with self._lock:
+                stage.report.items += 1
+                stage.report.busy_seconds += finished - started
+                stage.report.blocked_seconds += time.perf_counter() - finished
+                stage.queue_waits.append(started - enqueued)
+            if not delivered:
+                break
+
+        # The last worker of a stage tells every worker of the next one to stop
+        with self._lock:
+            remaining[position] -= 1
+            last = remaining[position] == 0
+        if last:
+            next_workers = (
+                self.stages[position + 1].workers
+                if position + 1 < len(self.stages)
+                else 1
+            )
+            for _ in range(next_workers):
+                self._put(target, _STOP)
+
+    def run(
+        self,
+        items: Iterable[Tuple[int, Any]],
+        on_result: Callable[[int, Any], None],
+    ) -> PipelineReport:
+        """Push (index, item) pairs through every stage and return the stage report."""
+        queues = [
+            queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)
+        ]
+        remaining = [stage.workers for stage in self.stages]
+        threads = [
+            threading.Thread(
+                target=self._feed, args=(items, queues[0]), name="pipeline-feed"
+            )
+        ]
+        for position, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(
+                            position,
+                            queues[position],
+                            queues[position + 1],
+                            remaining,
+                        ),
+                        name=f"pipeline-{stage.name}-{worker}",
+                    )
+                )
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                entry = self._get(queues[-1])
+                if entry is _STOP:
+                    break
+                _, index, result = entry
+                on_result(index, result)
+        except BaseException as e:
+            self._fail(e)
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            self._finish_report(time.perf_counter() - start)
+        if self._error is not None:
+            raise self._error
+        return self.report
+
+    def _finish_report(self, seconds: float):
+        self.report.seconds = seconds
+        self.report.stages = []
+        for stage in self.stages:
+            waits = stage.queue_waits
+            stage.report.utilisation = (
+                stage.report.busy_seconds / (stage.workers * seconds)
+                if seconds
+                else 0.0
+            )
+            stage.report.mean_queue_wait_ms = (
+                sum(waits) / len(waits) * 1000 if waits else 0.0
+            )
+            stage.report.max_queue_wait_ms = max(waits, default=0.0) * 1000
+            self.report.stages.append(stage.report)
+        self.report.bottleneck = max(
+            self.stages, key=lambda stage: stage.report.utilisation
+        ).name
+        for stage in self.report.stages:
+            logging.info(
+                f"Stage {stage.name}: {stage.items} items, {stage.utilisation:.0%} busy, "
+                f"{stage.mean_queue_wait_ms:.0f} ms mean queue wait"
+            )
+
+
+def translation_prompt(
+    original_srt: str, source_lang: str, target_lang: str, glossary_block: str = ""
+) -> str:
+    """The single-call translation request, also used for batch requests."""
+    return f"""
+    Translate the following SRT subtitles from {source_lang} to {target_lang}.
+    - Keep every subtitle's index and timestamps exactly as in the original.
+    - Keep the line breaks and any HTML tags.
+    - Reply with the translated subtitles only, in SRT format.
+    {glossary_block}
+    Original SRT content in {source_lang}:
+    {original_srt}
+    """
+
+
+def format_locally(translated_srt: str) -> str:
+    """Wrap cue text like `format_subtitles` does, without the LLM."""
+    subtitles = parse_srt(translated_srt)
+    formatted = []
+    for subtitle, wrapped in zip(subtitles, wrap_subtitles(subtitles)):
+        # wrap_subtitles drops words past its line limit, keep those cues as they are
+        if wrapped["text"].split() != subtitle["text"].split():
+            logging.warning(f"Subtitle {subtitle['index']} is too long to wrap")
+            wrapped = subtitle
+        formatted.append(wrapped)
+    formatted_srt = render_srt(formatted)
+    flagged = analyze_quality(formatted_srt).flagged_positions(TIMING_RULES)
+    if len(flagged):
+        logging.warning(
+            f"{len(flagged)} of {len(formatted)} cues break the reading speed or timing limits"
+        )
+    return formatted_srt
+
+
+class ChunkWork:
+    """A chunk on its way through the translation pipeline."""
+
+    def __init__(self, chunk_index: int, original_srt: str):
+        self.original_srt = original_srt.strip()
+        self.validator = ChunkValidator(self.original_srt)
+        self.text = ""
+        self.report = ChunkReport(
+            chunk_index=chunk_index, cue_count=len(self.validator.original_subtitles)
+        )
+
+
+class TranslationStages:
+    """Translate, review and format/verify steps for StagePipeline.
+
+    Each step is a single call to the matching agent instead of a group
+    chat. Agents keep their usage counters, so every worker thread gets its
+    own set.
+    """
+
+    def __init__(
+        self,
+        source_lang: str,
+        target_lang: str,
+        llm_config: Dict[str, Any],
+        options: TranslationOptions,
+    ):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        # autogen's disk cache would answer a retried prompt with the same reply;
+        # caching is left to the record/replay layer of the LLM cache setting
+        self.llm_config = {**llm_config, "cache_seed": None}
+        self.options = options
+        self._local = threading.local()
+
+    def _agents(self) -> Dict[str, Any]:
+        if not hasattr(self._local, "agents"):
+            self._local.agents = create_agents(
+                self.llm_config, enable_definition_tool=False
+            )
+        return self._local.agents
+
+    def _ask(
+        self, work: ChunkWork, agent_key: str, messages: List[Dict[str, str]]
+    ) -> str:
+        agent = self._agents()[agent_key]
+        before = _usage_tokens(agent)
+        reply = agent.generate_reply(messages=messages)
+        after = _usage_tokens(agent)
+        work.report.llm_calls += 1
+        work.report.prompt_tokens += after[0] - before[0]
+        work.report.completion_tokens += after[1] - before[1]
+        content = reply.get("content") if isinstance(reply, dict) else reply
+        return str(content or "")
+
+    def _aligned_candidate(self, work: ChunkWork, content: str) -> Optional[str]:
+        candidate = work.validator.candidate(content)
+        if candidate is None:
+            return None
+        if not verify_alignment(work.original_srt, candidate).is_aligned:
+            return None
+        return candidate
+
+    def translate(self, work: ChunkWork) -> ChunkWork:
+        started = time.perf_counter()
+        glossary_block = ""
+        if self.options.glossary_prefetch_enabled and prefetch_supported(
+            self.source_lang
+        ):
+            work.report.glossary_prefetch, glossary = prefetch_glossary(
+                work.original_srt, self.source_lang
+            )
+            if glossary:
+                glossary_block = (
+                    f"Glossary of uncommon {self.source_lang} words:\n{glossary}\n"
+                )
+        messages = [
+            {
+                "role": "user",
+                "content": translation_prompt(
+                    work.original_srt,
+                    self.source_lang,
+                    self.target_lang,
+                    glossary_block,
+                ),
+            }
+        ]
+        for attempt in range(MAX_SPEAKER_RETRIES + 1):
+            content = self._ask(work, "subtitle_translator", messages)
+            work.text = self._aligned_candidate(work, content) or ""
+            if work.text:
+                break
+            logging.warning(
+                f"Chunk {work.report.chunk_index}: translation attempt {attempt + 1} is misaligned"
+            )
+            messages = messages + [
+                {"role": "assistant", "content": content},
+                {
+                    "role": "user",
+                    "content": "The translation does not match the original cues. "
+                    "Reply again with every cue's index and timestamps exactly as in the original.",
+                },
+            ]
+        else:
+            # One bad chunk should not end the job; it keeps its original text
+            work.text = work.original_srt
+            work.report.error = (
+                f"No aligned translation after {MAX_SPEAKER_RETRIES + 1} attempts"
+            )
+            logging.error(
+                f"Chunk {work.report.chunk_index}: {work.report.error}, keeping the original"
+            )
+        work.report.seconds += time.perf_counter() - started
+        return work
+
+    def review(self, work: ChunkWork) -> ChunkWork:
+        if work.report.error:
+            return work
+        started = time.perf_counter()
+        if self.options.review_gate_enabled:
+            work.report.review_gate = decide_review(
+                work.original_srt,
+                work.text,
+                sample_rate=self.options.review_sample_rate,
+                limits=self.options.quality_limits,
+            )
+        if work.report.review_gate is None or work.report.review_gate.review_required:
+            content = self._ask(
+                work,
+                "translation_reviewer",
+                [
+                    {
+                        "role": "user",
+                        "content": f"""
+    Review this {self.target_lang} translation of {self.source_lang} subtitles and correct it where necessary.
+    - Do not alter subtitle indices or timestamps.
+    - Reply with the reviewed translated subtitles only, in SRT format.
+
+    Original subtitles:
+    {work.original_srt}
+
+    Translated subtitles:
+    {work.text}
+    """,
+                    }
+                ],
+            )
+            reviewed = self._aligned_candidate(work, content)
+            if reviewed:
+                work.text = reviewed
+            else:
+                logging.warning(
+                    f"Chunk {work.report.chunk_index}: keeping the translation, the review is misaligned"
+                )
+        work.report.seconds += time.perf_counter() - started
+        return work
+
+    def format(self, work: ChunkWork) -> ChunkWork:
+        if work.report.error:
+            return work
+        started = time.perf_counter()
+        formatted = None
+        if not self.options.local_formatter:
+            content = self._ask(
+                work,
+                "subtitle_formatter",
+                [
+                    {
+                        "role": "user",
+                        "content": f"""
+    Format these translated subtitles to at most 2 lines of 50 characters each, keeping indices, timestamps and HTML tags.
+    Do not call any functions. Begin your response with '{FORMATTED_SUBTITLES_START}' and end with '{FORMATTED_SUBTITLES_END}'.
+
+    {work.text}
+    """,
+                    }
+                ],
+            )
+            formatted = self._aligned_candidate(work, content)
+        work.text = formatted or format_locally(work.text)
+        alignment = verify_alignment(work.original_srt, work.text)
+        if not alignment.is_aligned:
+            logging.warning(
+                f"Chunk {work.report.chunk_index}: misaligned cues {alignment.misaligned_indices}"
+            )
+        work.report.seconds += time.perf_counter() - started
+        return work
+
+
+def _usage_tokens(agent: Any) -> Tuple[int, int]:
+    usage = gather_usage_summary([agent])["usage_including_cached_inference"]
+    prompt_tokens = completion_tokens = 0
+    for model_usage in usage.values():
+        if isinstance(model_usage, dict):
+            prompt_tokens += model_usage.get("prompt_tokens", 0)
+            completion_tokens += model_usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+def run_translation_pipeline(
+    chunks: List[str],
+    source_lang: str,
+    target_lang: str,
+    llm_config: Dict[str, Any],
+    options: TranslationOptions,
+    on_chunk: Callable[[int, str, ChunkReport], None],
+) -> Tuple[List[ChunkReport], PipelineReport]:
+    """Translate chunks through the translate, review and format/verify stages.
+
+    `on_chunk` receives each finished chunk on the calling thread, in
+    completion order.
+    """
+    stages = TranslationStages(source_lang, target_lang, llm_config, options)
+    pipeline = StagePipeline(
+        [
+            Stage(
+                PIPELINE_STAGE_TRANSLATE, stages.translate, options.translate_workers
+            ),
+            Stage(PIPELINE_STAGE_REVIEW, stages.review, options.review_workers),
+            Stage(PIPELINE_STAGE_FORMAT, stages.format, options.format_workers),
+        ]
+    )
+    chunk_reports: Dict[int, ChunkReport] = {}
+
+    def finish_chunk(chunk_index: int, work: ChunkWork):
+        chunk_reports[chunk_index] = work.report
+        on_chunk(chunk_index, work.text, work.report)
+
+    report = pipeline.run(
+        ((index, ChunkWork(index, chunk)) for index, chunk in enumerate(chunks)),
+        finish_chunk,
+    )
+    return [chunk_reports[index] for index in sorted(chunk_reports)], report
@@ -0,0 +1,223 @@
+# preflight.py
+
+import argparse
+import heapq
+import json
+import logging
+import os
+from typing import List, Optional
+
+from agent_definitions import merge_agent_definitions
+from agent_models import ChunkPlan, PreflightPlan, TranslationOptions
+from chunk_tuner import ChunkStatsStore
+from constants import (
+    AGENT_CONFIG_FILE,
+    LANGUAGE_ENGLISH,
+    LANGUAGE_TURKISH,
+    LLM_REQUESTS_PER_MINUTE_ENV,
+    LLM_TOKENS_PER_MINUTE_ENV,
+    LOG_FORMAT,
+    PREFLIGHT_COMPLETION_TOKEN_RATIO,
+    PREFLIGHT_DEFAULT_LLM_CALLS_PER_CHUNK,
+    PREFLIGHT_DEFAULT_SECONDS_PER_CALL,
+    TRANSLATION_CONCURRENCY,
+    TUNER_MIN_SAMPLES,
+    UTF8_ENCODING,
+)
+from utils import estimate_tokens, split_subtitles
+
+BOTTLENECK_CONCURRENCY = "concurrency"
+BOTTLENECK_REQUESTS = "requests per minute"
+BOTTLENECK_TOKENS = "tokens per minute"
+
+
+def rate_limit_from_env(name: str) -> Optional[int]:
+    """Read a per-minute provider limit from the environment; unset or 0 means none."""
+    value = os.getenv(name, "").strip()
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        logging.warning(f"Ignoring {name}={value}: not a whole number")
+        return None
+    return limit if limit > 0 else None
+
+
+def system_message_tokens() -> int:
+    """Average size of the agents' system messages, which precede every call."""
+    with open(AGENT_CONFIG_FILE, "r", encoding=UTF8_ENCODING) as f:
+        configs = json.load(f)
+    messages = [config["system_message"] for config in configs.values()]
+    return sum(estimate_tokens(message) for message in messages) // len(messages)
+
+
+def schedule_seconds(chunk_seconds: List[float], concurrency: int) -> float:
+    """Wall-clock time when chunks are handed in order to the first free worker."""
+    workers = [0.0] * max(concurrency, 1)
+    for seconds in chunk_seconds:
+        heapq.heappush(workers, heapq.heappop(workers) + seconds)
+    return max(workers)
+
+
+def plan_job(
+    srt_content: str,
+    model: str,
+    source_lang: str,
+    target_lang: str,
+    options: Optional[TranslationOptions] = None,
+    store: Optional[ChunkStatsStore] = None,
+    concurrency: Optional[int] = None,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+) -> PreflightPlan:
+    """Estimate tokens, LLM calls and wall-clock time of a translation job.
+
+    Every call of a chunk conversation sends the system message, the task
+    (the merged agent definitions plus the chunk) and all earlier replies,
+    so prompt tokens grow with each round. Calls and seconds per call come
+    from the recorded chunk statistics of this model, language pair and
+    chunk size when there are enough of them. Without an explicit
+    concurrency, the pipeline's translate workers run chunks side by side.
+    """
+    options = options or TranslationOptions()
+    concurrency = concurrency or (
+        options.translate_workers
+        if options.pipeline_enabled
+        else TRANSLATION_CONCURRENCY
+    )
+    store = store or ChunkStatsStore()
+    chunk_size = options.chunk_size
+    if chunk_size is None:
+        chunk_size, _ = store.recommend(model, source_lang, target_lang)
+    chunks = split_subtitles(srt_content, chunk_size)
+
+    llm_calls = float(PREFLIGHT_DEFAULT_LLM_CALLS_PER_CHUNK)
+    seconds_per_call = PREFLIGHT_DEFAULT_SECONDS_PER_CALL
+    history_samples = 0
+    for stats in store.summarize(model, source_lang, target_lang):
+        if (
+            stats.chunk_size == chunk_size
+            and stats.samples >= TUNER_MIN_SAMPLES
+            and stats.mean_llm_calls
+        ):
+            llm_calls = stats.mean_llm_calls
+            seconds_per_call = stats.mean_seconds / stats.mean_llm_calls
+            history_samples = stats.samples
+
+    definition_tokens = estimate_tokens(
+        merge_agent_definitions(
+            source_lang, target_lang, options.glossary_prefetch_enabled
+        )
+    )
+    system_tokens = system_message_tokens()
+    chunk_plans = []
+    for chunk_index, chunk in enumerate(chunks):
+        chunk_tokens = estimate_tokens(chunk)
+        base_prompt = system_tokens + definition_tokens + chunk_tokens
+        reply_tokens = chunk_tokens * PREFLIGHT_COMPLETION_TOKEN_RATIO
+        # Call n also carries the n - 1 replies before it
+        chunk_plans.append(
+            ChunkPlan(
+                chunk_index=chunk_index,
+                cue_count=len(chunk.strip().split("\n\n")),
+                prompt_tokens=round(
+                    llm_calls * base_prompt
+                    + reply_tokens * llm_calls * (llm_calls - 1) / 2
+                ),
+                completion_tokens=round(reply_tokens * llm_calls),
+                llm_calls=llm_calls,
+                seconds=llm_calls * seconds_per_call,
+            )
+        )
+
+    plan = PreflightPlan(
+        model=model,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        chunk_size=chunk_size,
+        total_cues=sum(chunk.cue_count for chunk in chunk_plans),
+        chunks=chunk_plans,
+        prompt_tokens=sum(chunk.prompt_tokens for chunk in chunk_plans),
+        completion_tokens=sum(chunk.completion_tokens for chunk in chunk_plans),
+        llm_calls=sum(chunk.llm_calls for chunk in chunk_plans),
+        history_samples=history_samples,
+        seconds_per_call=seconds_per_call,
+        concurrency=concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        bottleneck=BOTTLENECK_CONCURRENCY,
+    )
+
+    # The job takes as long as its slowest constraint
+    limits = [
+        (
+            schedule_seconds([chunk.seconds for chunk in chunk_plans], concurrency),
+            BOTTLENECK_CONCURRENCY,
+        )
+    ]
+    if requests_per_minute:
+        limits.append((plan.llm_calls / requests_per_minute * 60, BOTTLENECK_REQUESTS))
+    if tokens_per_minute:
+        limits.append(
+            (
+                (plan.prompt_tokens + plan.completion_tokens) / tokens_per_minute * 60,
+                BOTTLENECK_TOKENS,
+            )
+        )
+    plan.eta_seconds, plan.bottleneck = max(limits)
+    logging.info(
+        f"Preflight: {len(chunk_plans)} chunks, ~{plan.llm_calls:.0f} LLM calls, "
+        f"~{plan.prompt_tokens + plan.completion_tokens} tokens, "
+        f"ETA {plan.eta_seconds:.0f}s ({plan.bottleneck})"
+    )
+    return plan
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate tokens, LLM calls and duration of translating SRT files."
+    )
+    parser.add_argument("srt_files", nargs="+")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--source", default=LANGUAGE_ENGLISH)
+    parser.add_argument("--target", default=LANGUAGE_TURKISH)
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument(
+        "--rpm", type=int, default=rate_limit_from_env(LLM_REQUESTS_PER_MINUTE_ENV)
+    )
+    parser.add_argument(
+        "--tpm", type=int, default=rate_limit_from_env(LLM_TOKENS_PER_MINUTE_ENV)
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format=LOG_FORMAT)
+    store = ChunkStatsStore()
+    options = TranslationOptions(chunk_size=args.chunk_size)
+    plans = []
+    for srt_file in args.srt_files:
+        with open(srt_file, "r", encoding=UTF8_ENCODING) as f:
+            plan = plan_job(
+                f.read(),
+                args.model,
+                args.source,
+                args.target,
+                options=options,
+                store=store,
+                concurrency=args.concurrency,
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+            )
+        plans.append({"file": srt_file, **plan.model_dump(exclude={"chunks"})})
+    print(json.dumps(plans, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# quality_analysis.py
+
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from agent_models import MetricDistribution, QualityLimits, QualitySummary
+from constants import (
+    QUALITY_CPS_BINS,
+    QUALITY_DURATION_BINS_MS,
+    QUALITY_GAP_BINS_MS,
+    QUALITY_LINE_LENGTH_BINS,
+)
+from document_cache import DOCUMENT_CACHE, KIND_TIMINGS
+from subtitle_timing import SubtitleTimings
+
+# Tags are not read on screen; they never span a line or a cue
+TAG_PATTERN = re.compile(r"</?[a-zA-Z][^>\n\x00]*>|\{\\[^}\n\x00]*\}")
+CUE_SEPARATOR = "\x00"
+
+RULE_READING_SPEED = "reading_speed"
+RULE_TOO_SHORT = "too_short"
+RULE_TOO_LONG = "too_long"
+RULE_OVERLAP = "overlap"
+RULE_SHORT_GAP = "short_gap"
+RULE_LINE_LENGTH = "line_length"
+RULE_LINE_COUNT = "line_count"
+RULES = [
+    RULE_READING_SPEED,
+    RULE_TOO_SHORT,
+    RULE_TOO_LONG,
+    RULE_OVERLAP,
+    RULE_SHORT_GAP,
+    RULE_LINE_LENGTH,
+    RULE_LINE_COUNT,
+]
+# Rules the formatter cannot fix by re-wrapping text
+TIMING_RULES = [
+    RULE_READING_SPEED,
+    RULE_TOO_SHORT,
+    RULE_TOO_LONG,
+    RULE_OVERLAP,
+    RULE_SHORT_GAP,
+]
+RULE_BITS = {rule: np.uint8(1 << bit) for bit, rule in enumerate(RULES)}
+
+
+def _text_metrics(texts: Sequence[str]):
+    """Per-cue character count, line count and longest line, in one pass over all text.
+
+    The cues are joined into a single string and read as an array of code
+    points, so line breaks and cue boundaries are found with array
+    operations instead of a Python loop per cue.
+    """
+    count = len(texts)
+    if not count:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    joined = CUE_SEPARATOR.join(texts) + CUE_SEPARATOR
+    if "<" in joined or "{" in joined:
+        joined = TAG_PATTERN.sub("", joined)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    # One comparison over all code points, then only the few candidates are checked
+    line_ends = np.flatnonzero(codes <= 10)
+    line_ends = line_ends[(codes[line_ends] == 0) | (codes[line_ends] == 10)]
+    line_lengths = np.diff(line_ends, prepend=-1) - 1
+    is_last_line = codes[line_ends] == 0
+    # Lines are grouped by cue, the first line of a cue follows the previous cue's last
+    line_cues = np.cumsum(is_last_line) - is_last_line
+    first_lines = np.concatenate(([0], np.flatnonzero(is_last_line)[:-1] + 1))
+
+    chars = np.bincount(line_cues, weights=line_lengths, minlength=count)
+    longest_lines = np.maximum.reduceat(line_lengths, first_lines)
+    line_counts = np.bincount(line_cues, weights=line_lengths > 0, minlength=count)
+    return (
+        chars.astype(np.int64),
+        line_counts.astype(np.int64),
+        longest_lines.astype(np.int64),
+    )
+
+
+def _distribution(
+    name: str, unit: str, values: np.ndarray, edges: List[float]
+) -> MetricDistribution:
+    """Summary statistics and a histogram with open-ended first and last buckets."""
+    values = values[np.isfinite(values)]
+    labels = (
+        [f"< {edges[0]:g}"]
+        + [f"{low:g}-{high:g}" for low, high in zip(edges, edges[1:])]
+        + [f">= {edges[-1]:g}"]
+    )
+    counts = np.bincount(
+        np.searchsorted(edges, values, side="right"), minlength=len(labels)
+    )
+    distribution = MetricDistribution(
+        name=name, unit=unit, buckets=labels, counts=counts.tolist()
+    )
+    if len(values):
+        p50, p95 = np.percentile(values, [50, 95])
+        distribution.mean = round(float(values.mean()), 2)
+        distribution.p50 = round(float(p50), 2)
+        distribution.p95 = round(float(p95), 2)
+        distribution.max = round(float(values.max()), 2)
+    return distribution
+
+
+class QualityAnalysis:
+    """Reading speed, duration, gap and line length of every cue of a document.
+
+    All metrics are numpy arrays aligned with the cues of `timings`. `flags`
+    holds one bit per rule in `RULES` for each cue that breaks `limits`.
+    `gap_after_ms` is the time to the next cue, negative for overlaps and
+    NaN for the last cue.
+    """
+
+    def __init__(self, timings: SubtitleTimings, limits: QualityLimits):
+        started = time.perf_counter()
+        self.timings = timings
+        self.limits = limits
+        self.chars, self.line_counts, self.longest_lines = _text_metrics(timings.texts)
+        self.duration_ms = timings.end_ms - timings.start_ms
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cps = np.where(
+                self.duration_ms > 0,
+                self.chars * 1000.0 / self.duration_ms,
+                np.where(self.chars > 0, np.inf, 0.0),
+            )
+        self.gap_after_ms = np.full(len(timings), np.nan)
+        self.gap_after_ms[:-1] = timings.start_ms[1:] - timings.end_ms[:-1]
+
+        flags = np.zeros(len(timings), dtype=np.uint8)
+        for rule, broken in (
+            (RULE_READING_SPEED, self.cps > limits.max_cps),
+            (RULE_TOO_SHORT, self.duration_ms < limits.min_duration_ms),
+            (RULE_TOO_LONG, self.duration_ms > limits.max_duration_ms),
+            (RULE_OVERLAP, self.gap_after_ms < 0),
+            (
+                RULE_SHORT_GAP,
+                (self.gap_after_ms >= 0) & (self.gap_after_ms < limits.min_gap_ms),
+            ),
+            (RULE_LINE_LENGTH, self.longest_lines > limits.max_line_length),
+            (RULE_LINE_COUNT, self.line_counts > limits.max_lines),
+        ):
+            flags[broken] |= RULE_BITS[rule]
+        self.flags = flags
+        self.analysis_ms = (time.perf_counter() - started) * 1000
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def flagged_positions(self, rules: Optional[List[str]] = None) -> np.ndarray:
+        """Positions of the cues that break any of `rules` (all rules by default)."""
+        mask = np.uint8(0)
+        for rule in rules or RULES:
+            mask |= RULE_BITS[rule]
+        return np.flatnonzero(self.flags & mask)
+
+    def issues(self, rules: Optional[List[str]] = None) -> List[str]:
+        """Readable messages for the flagged cues, in the style of `calculate_subtitle_stats`."""
+        rules = rules or RULES
+        limits = self.limits
+        issues = []
+        for position in self.flagged_positions(rules).tolist():
+            index = int(self.timings.indices[position])
+            flags = self.flags[position]
+            for rule in rules:
+                if not flags & RULE_BITS[rule]:
+                    continue
+                if rule == RULE_READING_SPEED:
+                    issue = f"Reading speed {self.cps[position]:.1f} cps above {limits.max_cps:g}"
+                elif rule == RULE_TOO_SHORT:
+                    issue = f"Shown for {self.duration_ms[position]} ms, less than {limits.min_duration_ms} ms"
+                elif rule == RULE_TOO_LONG:
+                    issue = f"Shown for {self.duration_ms[position]} ms, more than {limits.max_duration_ms} ms"
+                elif rule == RULE_OVERLAP:
+                    issue = f"Overlaps the next subtitle by {-self.gap_after_ms[position]:.0f} ms"
+                elif rule == RULE_SHORT_GAP:
+                    issue = f"Gap of {self.gap_after_ms[position]:.0f} ms to the next subtitle, less than {limits.min_gap_ms} ms"
+                elif rule == RULE_LINE_LENGTH:
+                    issue = f"Line of {self.longest_lines[position]} characters, more than {limits.max_line_length}"
+                else:
+                    issue = f"{self.line_counts[position]} lines, more than {limits.max_lines}"
+                issues.append(f"Subtitle {index}: {issue}")
+        return issues
+
+    def summary(self) -> QualitySummary:
+        durations = self.duration_ms.astype(np.float64)
+        line_lengths = self.longest_lines[self.line_counts > 0].astype(np.float64)
+        return QualitySummary(
+            cue_count=len(self),
+            limits=self.limits,
+            distributions=[
+                _distribution("Reading speed", "cps", self.cps, QUALITY_CPS_BINS),
+                _distribution("Duration", "ms", durations, QUALITY_DURATION_BINS_MS),
+                _distribution(
+                    "Gap to next", "ms", self.gap_after_ms, QUALITY_GAP_BINS_MS
+                ),
+                _distribution(
+                    "Longest line", "chars", line_lengths, QUALITY_LINE_LENGTH_BINS
+                ),
+            ],
+            flagged={
+                rule: int(np.count_nonzero(self.flags & RULE_BITS[rule]))
+                for rule in RULES
+            },
+            flagged_cues=int(np.count_nonzero(self.flags)),
+            analysis_ms=round(self.analysis_ms, 3),
+        )
+
+
+def analyze_quality(
+    subtitles: Union[str, SubtitleTimings], limits: Optional[QualityLimits] = None
+) -> QualityAnalysis:
+    """Analyze an SRT document, or an already parsed one, against `limits`."""
+    if isinstance(subtitles, str):
+        subtitles = DOCUMENT_CACHE.get(
+            KIND_TIMINGS, subtitles, SubtitleTimings.from_srt
+        )
+    analysis = QualityAnalysis(subtitles, limits or QualityLimits())
+    logging.info(
+        f"Quality analysis of {len(analysis)} cues: "
+        f"{int(np.count_nonzero(analysis.flags))} flagged in {analysis.analysis_ms:.1f} ms"
+    )
+    return analysis
+
+
+def reading_speed_regressions(
+    original_subtitles: List[Dict[str, str]],
+    translated_subtitles: List[Dict[str, str]],
+    limits: Optional[QualityLimits] = None,
+) -> List[str]:
+    """Cues whose translation is too fast to read although the original was not.
+
+    Both lists are aligned by position and the translation is timed with
+    the original's timestamps.
+    """
+    original = SubtitleTimings.from_subtitles(original_subtitles)
+    translated = SubtitleTimings(
+        original.indices,
+        original.start_ms,
+        original.end_ms,
+        [subtitle["text"] for subtitle in translated_subtitles],
+    )
+    limits = limits or QualityLimits()
+    original_cps = QualityAnalysis(original, limits).cps
+    translated_cps = QualityAnalysis(translated, limits).cps
+    regressions = np.flatnonzero(
+        (translated_cps > limits.max_cps) & (original_cps <= limits.max_cps)
+    )
+    return [
+        f"Subtitle {original.indices[position]}: Reading speed {translated_cps[position]:.1f} cps "
+        f"above {limits.max_cps:g} (original {original_cps[position]:.1f})"
+        for position in regressions.tolist()
+    ]
@@ -0,0 +1,286 @@
+# resource_profile.py
+
+import functools
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from agent_models import AllocationStat, ResourceSnapshot, StageProfile
+from constants import (
+    BYTE_ORDER_MARK,
+    RESOURCE_PROFILE_PATH,
+    RESOURCE_PROFILE_TOP_ALLOCATIONS,
+    RESOURCE_PROFILE_TRACE_FRAMES,
+    RESOURCE_PROFILING_ENV,
+    UTF8_ENCODING,
+)
+
+# Allocations made by the profiler and the import machinery are not the app's
+TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+# Session state values are measured this many references deep
+SIZE_MAX_DEPTH = 8
+
+
+def _kb(size: int) -> float:
+    return round(size / 1024, 1)
+
+
+def _rss_kb() -> Optional[int]:
+    """Resident set size of the process, where /proc is available."""
+    try:
+        with open("/proc/self/status", "r", encoding=UTF8_ENCODING) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _allocation_stats(statistics: List[Any], diff: bool) -> List[AllocationStat]:
+    stats = []
+    for stat in statistics[:RESOURCE_PROFILE_TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        stats.append(
+            AllocationStat(
+                location=f"{frame.filename}:{frame.lineno}",
+                size_kb=_kb(stat.size),
+                count=stat.count,
+                size_kb_diff=_kb(stat.size_diff) if diff else None,
+                count_diff=stat.count_diff if diff else None,
+            )
+        )
+    return stats
+
+
+def _subclasses(cls: type) -> set:
+    found = {cls}
+    for subclass in cls.__subclasses__():
+        found |= _subclasses(subclass)
+    return found
+
+
+def live_agent_counts() -> Tuple[Dict[str, int], int]:
+    """Count live autogen agents and group chats and the messages they hold.
+
+    Agents only exist once the agent stack is loaded; autogen is not
+    imported here otherwise.
+    """
+    agentchat = sys.modules.get("autogen.agentchat")
+    if agentchat is None:
+        return {}, 0
+    agent_types = _subclasses(agentchat.ConversableAgent)
+    group_chat_types = _subclasses(agentchat.GroupChat)
+    counts: Dict[str, int] = {}
+    messages = 0
+    for obj in gc.get_objects():
+        # Exact type lookups; isinstance would load lazy proxies such as openai's
+        # and fill the ABC caches the snapshot diff is meant to watch
+        kind = type(obj)
+        if kind in agent_types:
+            messages += sum(len(history) for history in obj.chat_messages.values())
+        elif kind in group_chat_types:
+            messages += len(obj.messages)
+        else:
+            continue
+        counts[kind.__name__] = counts.get(kind.__name__, 0) + 1
+    return counts, messages
+
+
+def _deep_size(value: Any, seen: set, depth: int = 0) -> int:
+    if id(value) in seen or depth > SIZE_MAX_DEPTH:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, dict):
+        size += sum(
+            _deep_size(key, seen, depth + 1) + _deep_size(item, seen, depth + 1)
+            for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen, depth + 1) for item in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += _deep_size(vars(value), seen, depth + 1)
+    return size
+
+
+def session_state_usage(
+    session_state: Mapping[str, Any],
+) -> Tuple[Dict[str, float], List[List[str]]]:
+    """Approximate size of each session state value and keys holding copies of the same text.
+
+    Values shared between keys are only counted for the first key. Keys
+    that refer to the same string object are not copies, only one key per
+    object is listed.
+    """
+    seen: set = set()
+    sizes = {}
+    # Text -> first key holding each distinct object with that text
+    texts: Dict[str, Dict[int, str]] = {}
+    for key, value in session_state.items():
+        sizes[str(key)] = _kb(_deep_size(value, seen))
+        if isinstance(value, str) and value:
+            texts.setdefault(value.lstrip(BYTE_ORDER_MARK), {}).setdefault(
+                id(value), str(key)
+            )
+    duplicated = [
+        sorted(holders.values()) for holders in texts.values() if len(holders) > 1
+    ]
+    return dict(sorted(sizes.items(), key=lambda item: -item[1])), duplicated
+
+
+class ResourceProfiler:
+    """Opt-in memory and CPU profiling of translation stages.
+
+    While enabled, tracemalloc traces allocations and every `profiled`
+    stage adds its wall time, the CPU time of the whole process and the
+    change in traced memory over its calls, so work a stage hands to worker
+    threads is included, and so is anything else running at the time.
+    `snapshot` reports the stages since the previous snapshot with the
+    largest allocators, the growth since the previous snapshot and the live
+    autogen agents, and appends the report to `RESOURCE_PROFILE_PATH`.
+    Disabled, a stage costs one attribute check.
+    """
+
+    def __init__(self, report_path: str = RESOURCE_PROFILE_PATH):
+        self.report_path = report_path
+        self.enabled = False
+        self.latest: Optional[ResourceSnapshot] = None
+        self._stages: Dict[str, StageProfile] = {}
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    def enable(self, frames: int = RESOURCE_PROFILE_TRACE_FRAMES):
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._started_tracing = True
+        # Growth in the first snapshot is measured from here
+        self._previous = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        self.enabled = True
+        logging.info(f"Resource profiling enabled, reports go to {self.report_path}")
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        with self._lock:
+            self._stages.clear()
+        self._previous = None
+        logging.info("Resource profiling disabled")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            traced_after = tracemalloc.get_traced_memory()[0]
+            with self._lock:
+                profile = self._stages.setdefault(name, StageProfile(name=name))
+                profile.calls += 1
+                profile.wall_seconds += time.perf_counter() - started
+                profile.cpu_seconds += time.process_time() - cpu_started
+                profile.traced_kb_delta += (traced_after - traced_before) / 1024
+
+    def snapshot(
+        self, label: str, session_state: Optional[Mapping[str, Any]] = None
+    ) -> Optional[ResourceSnapshot]:
+        """Report on the stages since the last snapshot and the memory held now."""
+        if not self.enabled:
+            return None
+        # Only what is still referenced after a collection counts as held
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            stages = sorted(
+                self._stages.values(), key=lambda profile: -profile.cpu_seconds
+            )
+            self._stages = {}
+        agent_counts, agent_messages = live_agent_counts()
+        report = ResourceSnapshot(
+            label=label,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            rss_kb=_rss_kb(),
+            traced_kb=_kb(traced),
+            traced_peak_kb=_kb(traced_peak),
+            stages=[
+                profile.model_copy(
+                    update={
+                        "wall_seconds": round(profile.wall_seconds, 3),
+                        "cpu_seconds": round(profile.cpu_seconds, 3),
+                        "traced_kb_delta": round(profile.traced_kb_delta, 1),
+                    }
+                )
+                for profile in stages
+            ],
+            top_allocations=_allocation_stats(
+                snapshot.statistics("lineno"), diff=False
+            ),
+            top_growth=(
+                _allocation_stats(
+                    snapshot.compare_to(self._previous, "lineno"), diff=True
+                )
+                if self._previous is not None
+                else []
+            ),
+            agent_counts=agent_counts,
+            agent_messages=agent_messages,
+        )
+        if session_state is not None:
+            report.session_state_kb, report.duplicated_session_text = (
+                session_state_usage(session_state)
+            )
+        self._previous = snapshot
+        self.latest = report
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        with open(self.report_path, "a", encoding=UTF8_ENCODING) as f:
+            f.write(json.dumps(report.model_dump()) + "\n")
+        logging.info(
+            f"Resource snapshot '{label}': RSS {report.rss_kb} kB, traced {report.traced_kb} kB, "
+            f"{sum(agent_counts.values())} live agents holding {agent_messages} messages"
+        )
+        return report
+
+
+RESOURCE_PROFILER = ResourceProfiler()
+if os.getenv(RESOURCE_PROFILING_ENV) == "1":
+    RESOURCE_PROFILER.enable()
+
+
+def profiled(stage: str) -> Callable[[Callable], Callable]:
+    """Count a function's calls as `stage` while resource profiling is enabled."""
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not RESOURCE_PROFILER.enabled:
+                return function(*args, **kwargs)
+            with RESOURCE_PROFILER.stage(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,187 @@
+# review_gate.py
+
+import logging
+import random
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from agent_models import QualityLimits, ReviewGateDecision
+from constants import (
+    REVIEW_GATE_MAX_LENGTH_RATIO,
+    REVIEW_GATE_MAX_UNTRANSLATED_RATIO,
+    REVIEW_GATE_MIN_LENGTH_RATIO,
+    REVIEW_GATE_MIN_RATIO_CHARS,
+    REVIEW_GATE_MIN_UNTRANSLATED_WORDS,
+    REVIEW_SAMPLE_RATE,
+)
+from quality_analysis import reading_speed_regressions
+from subtitle_utils import extract_srt_blocks, parse_srt
+from utils import estimate_tokens
+
+HTML_TAG_PATTERN = re.compile(r"</?[a-zA-Z][^>]*>")
+WORD_PATTERN = re.compile(r"\w{4,}", re.UNICODE)
+
+
+def _html_tags(text: str) -> List[str]:
+    return sorted(
+        tag.lower().replace(" ", "") for tag in HTML_TAG_PATTERN.findall(text)
+    )
+
+
+def _plain_text(text: str) -> str:
+    return HTML_TAG_PATTERN.sub("", text)
+
+
+def _untranslated_ratio(original_text: str, translated_text: str) -> float:
+    """Share of the translated words that were copied verbatim from the original."""
+    original_words = {word.casefold() for word in WORD_PATTERN.findall(original_text)}
+    translated_words = [
+        word.casefold() for word in WORD_PATTERN.findall(_plain_text(translated_text))
+    ]
+    if len(translated_words) < REVIEW_GATE_MIN_UNTRANSLATED_WORDS:
+        return 0.0
+    copied = sum(1 for word in translated_words if word in original_words)
+    return copied / len(translated_words)
+
+
+def find_translation_issues(
+    original_srt: str,
+    translated_text: str,
+    limits: Optional[QualityLimits] = None,
+) -> List[str]:
+    """Run the local review heuristics on a translated chunk.
+
+    `translated_text` may be a raw agent message that repeats the original
+    subtitles before the translation, so only its trailing cues are checked.
+    Cues that the translation made too fast to read are flagged as well.
+    """
+    original_subtitles = parse_srt(original_srt)
+    candidates = extract_srt_blocks(translated_text)
+    if len(candidates) < len(original_subtitles):
+        return [
+            f"Cue count mismatch: expected {len(original_subtitles)}, found {len(candidates)}"
+        ]
+    translated_subtitles = candidates[-len(original_subtitles) :]
+
+    issues = []
+    original_chars = 0
+    translated_chars = 0
+    for orig, trans in zip(original_subtitles, translated_subtitles):
+        index = orig["index"]
+        if (
+            orig["index"] != trans["index"]
+            or orig["start_time"] != trans["start_time"]
+            or orig["end_time"] != trans["end_time"]
+        ):
+            issues.append(f"Subtitle {index}: Index or timestamp mismatch")
+        if len(orig["text"].split("\n")) != len(trans["text"].split("\n")):
+            issues.append(f"Subtitle {index}: Line count mismatch")
+        if _html_tags(orig["text"]) != _html_tags(trans["text"]):
+            issues.append(f"Subtitle {index}: HTML tags not preserved")
+
+        orig_length = len(_plain_text(orig["text"]).strip())
+        trans_length = len(_plain_text(trans["text"]).strip())
+        original_chars += orig_length
+        translated_chars += trans_length
+        if orig_length >= REVIEW_GATE_MIN_RATIO_CHARS:
+            ratio = trans_length / orig_length
+            if (
+                not REVIEW_GATE_MIN_LENGTH_RATIO
+                <= ratio
+                <= REVIEW_GATE_MAX_LENGTH_RATIO
+            ):
+                issues.append(
+                    f"Subtitle {index}: Length ratio {ratio:.2f} out of bounds"
+                )
+
+        if (
+            _untranslated_ratio(orig["text"], trans["text"])
+            > REVIEW_GATE_MAX_UNTRANSLATED_RATIO
+        ):
+            issues.append(f"Subtitle {index}: Looks untranslated")
+
+    issues.extend(
+        reading_speed_regressions(original_subtitles, translated_subtitles, limits)
+    )
+
+    if original_chars:
+        ratio = translated_chars / original_chars
+        if not REVIEW_GATE_MIN_LENGTH_RATIO <= ratio <= REVIEW_GATE_MAX_LENGTH_RATIO:
+            issues.append(f"Chunk length ratio {ratio:.2f} out of bounds")
+
+    return issues
+
+
+def decide_review(
+    original_srt: str,
+    translated_text: str,
+    sample_rate: float = REVIEW_SAMPLE_RATE,
+    rng: Optional[random.Random] = None,
+    prompt_tokens: int = 0,
+    limits: Optional[QualityLimits] = None,
+) -> ReviewGateDecision:
+    """Decide whether a translated chunk still needs the Translation_Reviewer."""
+    reasons = find_translation_issues(original_srt, translated_text, limits)
+    flagged = bool(reasons)
+    sampled = not flagged and (rng or random).random() < sample_rate
+    review_required = flagged or sampled
+
+    decision = ReviewGateDecision(
+        flagged=flagged,
+        sampled=sampled,
+        review_required=review_required,
+        reasons=reasons,
+    )
+    if not review_required:
+        # The reviewer would read the whole conversation and re-emit the chunk
+        decision.llm_calls_saved = 1
+        decision.estimated_tokens_saved = prompt_tokens + estimate_tokens(
+            translated_text
+        )
+    logging.info(
+        f"Review gate: flagged={flagged}, sampled={sampled}, review_required={review_required}"
+    )
+    return decision
+
+
+class ReviewGate:
+    """GroupChat speaker selector that routes clean translations straight to the formatter."""
+
+    def __init__(
+        self,
+        original_srt: str,
+        sample_rate: float = REVIEW_SAMPLE_RATE,
+        rng: Optional[random.Random] = None,
+        limits: Optional[QualityLimits] = None,
+    ):
+        self.original_srt = original_srt
+        self.sample_rate = sample_rate
+        self.rng = rng
+        self.limits = limits
+        self.decision: Optional[ReviewGateDecision] = None
+
+    def evaluate(self, messages: List[Dict[str, Any]]) -> ReviewGateDecision:
+        prompt_tokens = sum(
+            estimate_tokens(str(message.get("content") or "")) for message in messages
+        )
+        self.decision = decide_review(
+            self.original_srt,
+            messages[-1]["content"],
+            sample_rate=self.sample_rate,
+            rng=self.rng,
+            prompt_tokens=prompt_tokens,
+            limits=self.limits,
+        )
+        return self.decision
+
+    def select_speaker(self, last_speaker: Any, groupchat: Any) -> Union[Any, str]:
+        message = groupchat.messages[-1]
+        if (
+            self.decision is None
+            and last_speaker.name == "Subtitle_Translator"
+            and message.get("content")
+            and not message.get("tool_calls")
+        ):
+            if not self.evaluate(groupchat.messages).review_required:
+                return groupchat.agent_by_name("Subtitle_Formatter")
+        return "auto"
@@ -0,0 +1,198 @@
+# speaker_transitions.py
+
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from agent_models import SpeakerTransitionReport
+from chunk_validator import ChunkValidator
+from constants import (
+    FORMATTED_SUBTITLES_END,
+    MAX_SPEAKER_RETRIES,
+    SPEAKER_SELECTION_AUTO,
+    SPEAKER_SELECTION_FSM,
+    TERMINATION_MESSAGE,
+)
+from llm_cache import hooked_llm_config
+from review_gate import ReviewGate
+from subtitle_utils import extract_srt_blocks, parse_srt
+
+USER_PROXY = "User_Proxy"
+SUBTITLE_TRANSLATOR = "Subtitle_Translator"
+TRANSLATION_REVIEWER = "Translation_Reviewer"
+SUBTITLE_FORMATTER = "Subtitle_Formatter"
+
+# Every hop the fixed workflow allows. Tool calls hop to User_Proxy and back,
+# and each working agent may retry itself when its output is incomplete.
+SPEAKER_TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    USER_PROXY: frozenset(
+        {SUBTITLE_TRANSLATOR, TRANSLATION_REVIEWER, SUBTITLE_FORMATTER}
+    ),
+    SUBTITLE_TRANSLATOR: frozenset(
+        {USER_PROXY, SUBTITLE_TRANSLATOR, TRANSLATION_REVIEWER, SUBTITLE_FORMATTER}
+    ),
+    TRANSLATION_REVIEWER: frozenset({TRANSLATION_REVIEWER, SUBTITLE_FORMATTER}),
+    SUBTITLE_FORMATTER: frozenset({USER_PROXY, SUBTITLE_FORMATTER}),
+}
+
+
+class RequestCounter:
+    """httpx request hook that counts the requests sent through a client."""
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: Any):
+        with self._lock:
+            self.requests += 1
+
+
+def counted_llm_config(
+    llm_config: Dict[str, Any],
+) -> Tuple[Dict[str, Any], RequestCounter]:
+    """A copy of an llm_config whose requests are counted, e.g. for the GroupChatManager.
+
+    The manager's speaker selections run through throwaway agents built from
+    its llm_config, so counting at the client catches every one of them.
+    """
+    counter = RequestCounter()
+    counted_config, _ = hooked_llm_config(llm_config, {"request": [counter]})
+    return counted_config, counter
+
+
+class SpeakerSelector:
+    """GroupChat speaker selector that counts every selection it hands to the manager LLM.
+
+    In "fsm" mode the next speaker follows `SPEAKER_TRANSITIONS`
+    (Translator -> Reviewer -> Formatter) without any LLM call; the review
+    gate may route a clean translation straight to the formatter. In "auto"
+    mode each selection is delegated to the GroupChatManager; the manager's
+    calls are counted at its client (see `counted_llm_config`), so the report
+    shows what the fixed order saves. A hop the graph does not allow falls
+    back to the manager instead of failing the chunk. In both modes an optional validator ends
+    the chat as soon as a message holds a valid translation of the chunk.
+    """
+
+    def __init__(
+        self,
+        original_srt: str,
+        mode: str = SPEAKER_SELECTION_FSM,
+        review_gate: Optional[ReviewGate] = None,
+        validator: Optional[ChunkValidator] = None,
+        max_retries: int = MAX_SPEAKER_RETRIES,
+    ):
+        if mode not in (SPEAKER_SELECTION_FSM, SPEAKER_SELECTION_AUTO):
+            raise ValueError(f"Unknown speaker selection mode: {mode}")
+        self.mode = mode
+        self.review_gate = review_gate
+        self.validator = validator
+        self.max_retries = max_retries
+        self.cue_count = len(parse_srt(original_srt))
+        self.retries: Counter = Counter()
+        self.report = SpeakerTransitionReport(mode=mode)
+
+    def select_speaker(self, last_speaker: Any, groupchat: Any) -> Union[Any, str]:
+        if self.mode == SPEAKER_SELECTION_FSM:
+            next_name = self._next_speaker(last_speaker.name, groupchat.messages)
+        else:
+            next_name = self._review_gate_shortcut(last_speaker, groupchat)
+
+        if self._accepts(last_speaker.name, groupchat.messages):
+            logging.info(
+                "Stopping the chunk conversation at the first valid translation"
+            )
+            return None
+        if next_name is not None:
+            if self._record(last_speaker.name, next_name):
+                return groupchat.agent_by_name(next_name)
+            return SPEAKER_SELECTION_AUTO
+        if self.mode == SPEAKER_SELECTION_FSM:
+            logging.info("Speaker FSM reached the end of the workflow")
+            return None
+        return SPEAKER_SELECTION_AUTO
+
+    def _review_gate_shortcut(self, last_speaker: Any, groupchat: Any) -> Optional[str]:
+        if self.review_gate is None:
+            return None
+        speaker = self.review_gate.select_speaker(last_speaker, groupchat)
+        return None if speaker == SPEAKER_SELECTION_AUTO else speaker.name
+
+    def _accepts(self, last_name: str, messages: List[Dict[str, Any]]) -> bool:
+        """Run the validator on messages that may hold the final translation."""
+        if self.validator is None:
+            return False
+        if last_name == SUBTITLE_TRANSLATOR:
+            # The raw translation only counts when the review gate skips the review
+            decision = self.review_gate.decision if self.review_gate else None
+            if decision is None or decision.review_required:
+                return False
+        elif last_name not in (TRANSLATION_REVIEWER, SUBTITLE_FORMATTER):
+            return False
+        return self.validator.check(last_name, messages[-1], len(messages) - 1)
+
+    def _record(self, last_name: str, next_name: str) -> bool:
+        """Record a hop, or return False if the graph does not allow it."""
+        if next_name not in SPEAKER_TRANSITIONS.get(last_name, frozenset()):
+            logging.warning(
+                f"Undefined speaker transition {last_name} -> {next_name}, "
+                "leaving the selection to the manager"
+            )
+            return False
+        self.report.transitions.append(f"{last_name} -> {next_name}")
+        return True
+
+    def _next_speaker(
+        self, last_name: str, messages: List[Dict[str, Any]]
+    ) -> Optional[str]:
+        message = messages[-1]
+        if message.get("tool_calls"):
+            return USER_PROXY
+        if last_name == USER_PROXY:
+            if message.get("tool_responses"):
+                return self._tool_caller(messages)
+            # The task message, or a User_Proxy reply we do not route further
+            return SUBTITLE_TRANSLATOR if len(messages) == 1 else None
+
+        content = str(message.get("content") or "")
+        if last_name == SUBTITLE_TRANSLATOR:
+            if not self._has_all_cues(content) and self._retry(last_name):
+                return SUBTITLE_TRANSLATOR
+            if (
+                self.review_gate is not None
+                and self.review_gate.decision is None
+                and not self.review_gate.evaluate(messages).review_required
+            ):
+                return SUBTITLE_FORMATTER
+            return TRANSLATION_REVIEWER
+        if last_name == TRANSLATION_REVIEWER:
+            if not self._has_all_cues(content) and self._retry(last_name):
+                return TRANSLATION_REVIEWER
+            return SUBTITLE_FORMATTER
+        if last_name == SUBTITLE_FORMATTER:
+            finished = (
+                FORMATTED_SUBTITLES_END in content or TERMINATION_MESSAGE in content
+            )
+            if not finished and self._retry(last_name):
+                return SUBTITLE_FORMATTER
+            return None
+        raise ValueError(f"Unknown speaker: {last_name}")
+
+    def _tool_caller(self, messages: List[Dict[str, Any]]) -> str:
+        for message in reversed(messages):
+            if message.get("tool_calls"):
+                return message["name"]
+        raise ValueError("Tool response without a preceding tool call")
+
+    def _has_all_cues(self, content: str) -> bool:
+        return len(extract_srt_blocks(content)) >= self.cue_count
+
+    def _retry(self, agent_name: str) -> bool:
+        if self.retries[agent_name] >= self.max_retries:
+            logging.warning(f"{agent_name} used up its {self.max_retries} retries")
+            return False
+        self.retries[agent_name] += 1
+        self.report.retries += 1
+        logging.info(f"Retry edge {agent_name} -> {agent_name}")
+        return True
@@ -0,0 +1,126 @@
+# startup_profile.py
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+from constants import (
+    LOG_FORMAT,
+    PROFILE_DIR,
+    STARTUP_HEAVY_MODULES,
+    STARTUP_TARGET_SECONDS,
+    UTF8_ENCODING,
+)
+
+# Renders the first page in a fresh interpreter and reports what got imported
+FIRST_RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app_test = AppTest.from_file("app.py", default_timeout=60)
+app_test.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "exception": [str(e.value) for e in app_test.exception],
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def profile_imports(module: str = "app", top: int = 25) -> List[Tuple[int, int, str]]:
+    """Return the slowest imports of a module as (cumulative us, self us, name)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        timings.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+def benchmark_first_render(runs: int = 5) -> Dict[str, Any]:
+    """Measure time-to-first-render of the app in fresh interpreters."""
+    samples = []
+    heavy_modules = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", FIRST_RENDER_SCRIPT % (STARTUP_HEAVY_MODULES,)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        measurement = json.loads(result.stdout.strip().splitlines()[-1])
+        if measurement["exception"]:
+            raise RuntimeError(f"App failed to render: {measurement['exception']}")
+        samples.append(measurement["seconds"])
+        heavy_modules.update(measurement["heavy_modules"])
+    median = statistics.median(samples)
+    return {
+        "runs": runs,
+        "median_seconds": median,
+        "min_seconds": min(samples),
+        "max_seconds": max(samples),
+        "target_seconds": STARTUP_TARGET_SECONDS,
+        "meets_target": median <= STARTUP_TARGET_SECONDS and not heavy_modules,
+        "heavy_modules_loaded": sorted(heavy_modules),
+    }
+
+
+def format_report(
+    import_timings: List[Tuple[int, int, str]], benchmark: Dict[str, Any]
+) -> str:
+    lines = ["Import-time profile of app (slowest first)", ""]
+    lines.append(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in import_timings:
+        lines.append(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    lines += [
+        "",
+        f"Time to first render over {benchmark['runs']} runs: "
+        f"median {benchmark['median_seconds']:.2f}s "
+        f"(min {benchmark['min_seconds']:.2f}s, max {benchmark['max_seconds']:.2f}s)",
+        f"Target: {benchmark['target_seconds']:.2f}s -> "
+        f"{'PASS' if benchmark['meets_target'] else 'FAIL'}",
+        "Heavy modules loaded before first render: "
+        f"{', '.join(benchmark['heavy_modules_loaded']) or 'none'}",
+    ]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Profile app imports and benchmark time-to-first-render."
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Benchmark repetitions")
+    parser.add_argument("--top", type=int, default=25, help="Imports to list")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    import_timings = profile_imports(top=args.top)
+    benchmark = benchmark_first_render(args.runs)
+    report = format_report(import_timings, benchmark)
+    print(report)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    report_path = os.path.join(PROFILE_DIR, "startup_report.txt")
+    with open(report_path, "w", encoding=UTF8_ENCODING) as f:
+        f.write(report + "\n")
+    logging.info(f"Startup report written to {report_path}")
+    sys.exit(0 if benchmark["meets_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
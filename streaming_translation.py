@@ -0,0 +1,243 @@
+# streaming_translation.py
+
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+from autogen.io.base import IOStream
+from openai import APIError
+
+from agent_models import StreamingReport
+from constants import (
+    FORMATTED_SUBTITLES_END,
+    STREAM_ABORT_URL,
+    STREAM_MAX_RETRIES,
+    TERMINATION_MESSAGE,
+)
+from llm_cache import hooked_llm_config
+from subtitle_utils import parse_srt
+from utils import estimate_tokens
+
+CueCallback = Callable[[Dict[str, str]], None]
+
+HEADER_PATTERN = re.compile(
+    r"^[ \t]*(\d+)[ \t]*\n"
+    r"[ \t]*(\d{2}:\d{2}:\d{2},\d{3})[ \t]*-->[ \t]*(\d{2}:\d{2}:\d{2},\d{3})[ \t]*\n",
+    re.MULTILINE,
+)
+# A cue's text ends at a blank line, the next cue header or a closing marker
+TEXT_END_PATTERN = re.compile(
+    r"\n[ \t]*\n"
+    r"|\n(?=[ \t]*\d+[ \t]*\n[ \t]*\d{2}:\d{2}:\d{2},\d{3})"
+    rf"|\n(?=[ \t]*(?:{FORMATTED_SUBTITLES_END}|{TERMINATION_MESSAGE}|```))"
+)
+ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class StreamDivergence(APIError):
+    """Raised when a streamed reply stops matching the source cues.
+
+    It is an API error because autogen's completion error handling only
+    re-raises those cleanly.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason, httpx.Request("POST", STREAM_ABORT_URL), body=None)
+
+
+class IncrementalCueParser:
+    """Parses SRT cues out of a reply while it streams in and checks them against the source.
+
+    Every cue header must continue the source sequence with the same index
+    and timestamps. The translator repeats the original before the
+    translation, so the sequence may start over once it is complete. Cues
+    whose text differs from the source, or that come after the first pass,
+    count as translated.
+    """
+
+    def __init__(self, source_subtitles: List[Dict[str, str]], strict: bool = True):
+        self.source = source_subtitles
+        self.strict = strict
+        self.buffer = ""
+        self.position = 0
+        self.next_cue = 0
+        self.passes = 0
+        self.divergence: Optional[str] = None
+        self._checked_header: Optional[int] = None
+
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        """Add streamed text and return the translated cues it completed."""
+        self.buffer += text
+        return self._parse(final=False)
+
+    def finish(self) -> List[Dict[str, str]]:
+        """Flush the last cue once the stream has ended."""
+        return self._parse(final=True)
+
+    def _diverge(self, reason: str):
+        if self.divergence is None:
+            self.divergence = reason
+        if self.strict:
+            raise StreamDivergence(reason)
+
+    def _check_header(self, header: re.Match):
+        if self._checked_header == header.start():
+            return
+        self._checked_header = header.start()
+        if self.next_cue == len(self.source):
+            self.next_cue = 0
+        if self.next_cue == 0:
+            self.passes += 1
+        expected = self.source[self.next_cue]
+        index, start_time, end_time = header.groups()
+        if int(index) != expected["index"]:
+            self._diverge(f"Expected cue {expected['index']}, got cue {index}")
+        elif (start_time, end_time) != (expected["start_time"], expected["end_time"]):
+            self._diverge(
+                f"Cue {index}: timing {start_time} --> {end_time} does not match the source"
+            )
+
+    def _parse(self, final: bool) -> List[Dict[str, str]]:
+        completed = []
+        while True:
+            header = HEADER_PATTERN.search(self.buffer, self.position)
+            if header is None:
+                break
+            self._check_header(header)
+            text_end = TEXT_END_PATTERN.search(self.buffer, header.end())
+            if text_end is None and not final:
+                break
+            end = text_end.start() if text_end else len(self.buffer)
+            text = "\n".join(
+                line.strip() for line in self.buffer[header.end() : end].split("\n")
+            ).strip()
+            expected = self.source[self.next_cue]
+            self.position = end
+            self.next_cue += 1
+            if not text:
+                self._diverge(f"Cue {expected['index']} has no text")
+                continue
+            if self.passes > 1 or text != expected["text"].strip():
+                completed.append({**expected, "text": text})
+        return completed
+
+
+class CueValidatingIOStream:
+    """autogen output stream that feeds streamed completion text into a cue parser."""
+
+    def __init__(self, parser: IncrementalCueParser, on_cues: Callable):
+        self.parser = parser
+        self.on_cues = on_cues
+        self.received = False
+
+    def print(
+        self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False
+    ):
+        # autogen only wraps streamed content in terminal color codes
+        text = ANSI_ESCAPE_PATTERN.sub("", sep.join(str(o) for o in objects))
+        if text:
+            self.received = True
+            self.on_cues(self.parser.feed(text))
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        raise RuntimeError("Streaming translation does not take human input")
+
+
+class StreamingTranslatorReply:
+    """Reply function for the Subtitle_Translator that validates its reply while it streams.
+
+    The translator's llm_config must enable `stream` and should come from
+    `llm_config`. When a reply diverges from the source cues, the stream is
+    abandoned and its response closed, and the request is retried at once
+    with a note about the problem. The last retry runs to the end.
+    Translated cues are handed to `on_cue` as soon as they are verified.
+    """
+
+    def __init__(
+        self,
+        original_srt: str,
+        on_cue: Optional[CueCallback] = None,
+        max_retries: int = STREAM_MAX_RETRIES,
+    ):
+        self.source = parse_srt(original_srt)
+        self.on_cue = on_cue
+        self.max_retries = max_retries
+        self.verified: Dict[int, Dict[str, str]] = {}
+        self.report = StreamingReport()
+        self._started: Optional[float] = None
+        self._response: Optional[httpx.Response] = None
+
+    def llm_config(self, llm_config: Dict[str, Any]) -> Dict[str, Any]:
+        """The translator's llm_config, through a client that keeps the streamed response."""
+        translator_config, _ = hooked_llm_config(
+            llm_config, {"response": [self._track_response]}
+        )
+        return translator_config
+
+    def _track_response(self, response: httpx.Response):
+        self._response = response
+
+    def _publish(self, cues: List[Dict[str, str]]):
+        for cue in cues:
+            if cue["index"] in self.verified:
+                continue
+            self.verified[cue["index"]] = cue
+            self.report.verified_cues = len(self.verified)
+            if self.report.time_to_first_cue_ms is None:
+                self.report.time_to_first_cue_ms = (
+                    time.perf_counter() - self._started
+                ) * 1000
+            if self.on_cue is not None:
+                self.on_cue(cue)
+
+    def reply(
+        self,
+        recipient: Any,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        sender: Any = None,
+        config: Any = None,
+    ) -> Tuple[bool, Union[str, Dict, None]]:
+        if self._started is None:
+            self._started = time.perf_counter()
+        messages = list(messages or [])
+        for attempt in range(self.max_retries + 1):
+            parser = IncrementalCueParser(
+                self.source, strict=attempt < self.max_retries
+            )
+            stream = CueValidatingIOStream(parser, self._publish)
+            self.report.streams += 1
+            try:
+                with IOStream.set_default(stream):
+                    final, reply = recipient.generate_oai_reply(messages, sender)
+            except StreamDivergence as e:
+                # autogen stops reading the stream but leaves it open; closing
+                # it releases the connection now instead of at garbage collection
+                if self._response is not None:
+                    self._response.close()
+                self.report.aborted_streams += 1
+                self.report.divergences.append(str(e))
+                self.report.wasted_completion_tokens += estimate_tokens(parser.buffer)
+                self.report.wasted_prompt_tokens += sum(
+                    estimate_tokens(str(message.get("content") or ""))
+                    for message in recipient._oai_system_message + messages
+                )
+                logging.warning(f"Aborted translator stream: {str(e)}")
+                messages = messages + [
+                    {
+                        "role": "user",
+                        "content": f"Your previous reply was cut off because it went wrong: {str(e)}. "
+                        "Reply again and keep every cue's index and timestamps exactly as in the original.",
+                    }
+                ]
+                continue
+
+            content = reply.get("content") if isinstance(reply, dict) else reply
+            if not stream.received and content:
+                # Served without streaming, e.g. from a cache
+                self._publish(parser.feed(content))
+            self._publish(parser.finish())
+            if parser.divergence:
+                self.report.divergences.append(parser.divergence)
+            return final, reply
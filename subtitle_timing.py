@@ -0,0 +1,214 @@
+# subtitle_timing.py
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from constants import BYTE_ORDER_MARK, MIN_SUBTITLE_DURATION_MS, MIN_SUBTITLE_GAP_MS
+from resource_profile import profiled
+
+CUE_HEADER_PATTERN = re.compile(
+    r"^[ \t]*(\d+)[ \t]*\n"
+    r"[ \t]*(\d+):(\d{2}):(\d{2})[,.](\d{3})[ \t]*-->[ \t]*(\d+):(\d{2}):(\d{2})[,.](\d{3})[^\n]*(?:\n|\Z)",
+    re.MULTILINE,
+)
+TIMESTAMP_PATTERN = re.compile(r"^\s*(-)?(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*$")
+
+MS_PER_HOUR = 3_600_000
+MS_PER_MINUTE = 60_000
+MS_PER_SECOND = 1_000
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """Convert an SRT timestamp such as "00:01:02,500" (optionally signed) to milliseconds."""
+    match = TIMESTAMP_PATTERN.match(timestamp)
+    if not match:
+        raise ValueError(f"Invalid timestamp: {timestamp}")
+    sign, hours, minutes, seconds, millis = match.groups()
+    value = (
+        int(hours) * MS_PER_HOUR
+        + int(minutes) * MS_PER_MINUTE
+        + int(seconds) * MS_PER_SECOND
+        + int(millis)
+    )
+    return -value if sign else value
+
+
+def format_timestamps(milliseconds: np.ndarray) -> List[str]:
+    """Format an array of millisecond offsets as SRT timestamps."""
+    milliseconds = np.maximum(milliseconds, 0)
+    hours, rest = np.divmod(milliseconds, MS_PER_HOUR)
+    minutes, rest = np.divmod(rest, MS_PER_MINUTE)
+    seconds, millis = np.divmod(rest, MS_PER_SECOND)
+    return [
+        f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+        for h, m, s, ms in zip(
+            hours.tolist(), minutes.tolist(), seconds.tolist(), millis.tolist()
+        )
+    ]
+
+
+class SubtitleTimings:
+    """Columnar view of an SRT document with cue times as int64 millisecond arrays.
+
+    Every operation works on the whole file at once and returns a new instance,
+    so operations can be chained before serializing back with `to_srt`.
+    """
+
+    def __init__(
+        self,
+        indices: np.ndarray,
+        start_ms: np.ndarray,
+        end_ms: np.ndarray,
+        texts: List[str],
+    ):
+        self.indices = indices
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.texts = texts
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    @profiled("parse_timings")
+    def from_srt(cls, srt_content: str) -> "SubtitleTimings":
+        content = srt_content.lstrip(BYTE_ORDER_MARK).replace("\r\n", "\n")
+        headers = []
+        spans = []
+        for match in CUE_HEADER_PATTERN.finditer(content):
+            headers.append(match.groups())
+            spans.append((match.start(), match.end()))
+
+        texts = []
+        for position, (_, text_start) in enumerate(spans):
+            text_end = spans[position + 1][0] if position + 1 < len(spans) else None
+            texts.append(content[text_start:text_end].strip())
+
+        fields = np.array(headers, dtype=np.int64).reshape(-1, 9)
+        scale = np.array([MS_PER_HOUR, MS_PER_MINUTE, MS_PER_SECOND, 1], dtype=np.int64)
+        return cls(
+            indices=fields[:, 0],
+            start_ms=fields[:, 1:5] @ scale,
+            end_ms=fields[:, 5:9] @ scale,
+            texts=texts,
+        )
+
+    @classmethod
+    def from_subtitles(cls, subtitles: List[Dict[str, str]]) -> "SubtitleTimings":
+        """Build the columnar view from cues as returned by `parse_srt`."""
+        return cls(
+            indices=np.array(
+                [subtitle["index"] for subtitle in subtitles], dtype=np.int64
+            ),
+            start_ms=np.array(
+                [parse_timestamp(subtitle["start_time"]) for subtitle in subtitles],
+                dtype=np.int64,
+            ),
+            end_ms=np.array(
+                [parse_timestamp(subtitle["end_time"]) for subtitle in subtitles],
+                dtype=np.int64,
+            ),
+            texts=[subtitle["text"] for subtitle in subtitles],
+        )
+
+    def to_srt(self, renumber: bool = False) -> str:
+        indices = range(1, len(self) + 1) if renumber else self.indices.tolist()
+        starts = format_timestamps(self.start_ms)
+        ends = format_timestamps(self.end_ms)
+        return "\n\n".join(
+            f"{index}\n{start} --> {end}\n{text}"
+            for index, start, end, text in zip(indices, starts, ends, self.texts)
+        )
+
+    def _with_times(
+        self, start_ms: np.ndarray, end_ms: np.ndarray
+    ) -> "SubtitleTimings":
+        return SubtitleTimings(
+            self.indices,
+            np.maximum(start_ms, 0),
+            np.maximum(end_ms, 0),
+            self.texts,
+        )
+
+    def shift(self, offset_ms: int) -> "SubtitleTimings":
+        """Move every cue by a constant offset."""
+        return self._with_times(self.start_ms + offset_ms, self.end_ms + offset_ms)
+
+    def scale(self, factor: float, anchor_ms: int = 0) -> "SubtitleTimings":
+        """Stretch or compress all times linearly around an anchor point."""
+        start_ms = np.rint(anchor_ms + (self.start_ms - anchor_ms) * factor)
+        end_ms = np.rint(anchor_ms + (self.end_ms - anchor_ms) * factor)
+        return self._with_times(start_ms.astype(np.int64), end_ms.astype(np.int64))
+
+    def convert_framerate(self, from_fps: float, to_fps: float) -> "SubtitleTimings":
+        """Retime cues for a video sped up or slowed down to a different framerate (e.g. 23.976 -> 25)."""
+        if from_fps <= 0 or to_fps <= 0:
+            raise ValueError("Framerates must be positive")
+        return self.scale(from_fps / to_fps)
+
+    def resync(
+        self, first_point: Tuple[int, int], second_point: Tuple[int, int]
+    ) -> "SubtitleTimings":
+        """Map two (current time, correct time) pairs onto each other and interpolate the rest."""
+        (old_first, new_first), (old_second, new_second) = first_point, second_point
+        if old_first == old_second:
+            raise ValueError("Resync points must refer to two different times")
+        factor = (new_second - new_first) / (old_second - old_first)
+        # One step, so times are only clamped once they are final
+        start_ms = np.rint(new_first + (self.start_ms - old_first) * factor)
+        end_ms = np.rint(new_first + (self.end_ms - old_first) * factor)
+        return self._with_times(start_ms.astype(np.int64), end_ms.astype(np.int64))
+
+    def repair_overlaps(
+        self,
+        min_gap_ms: int = MIN_SUBTITLE_GAP_MS,
+        min_duration_ms: int = MIN_SUBTITLE_DURATION_MS,
+    ) -> "SubtitleTimings":
+        """Trim cue ends so consecutive cues never overlap and keep at least `min_gap_ms` apart.
+
+        A cue is never shortened below `min_duration_ms` (or its original
+        duration if that is shorter); its successors are pushed back instead.
+        """
+        start_ms = self.start_ms.copy()
+        end_ms = self.end_ms.copy()
+        if len(self) > 1:
+            shortest_end = np.minimum(self.end_ms, start_ms + min_duration_ms)
+            end_ms[:-1] = np.minimum(end_ms[:-1], start_ms[1:] - min_gap_ms)
+            end_ms = np.maximum(end_ms, shortest_end)
+            # Cues that could not be shortened enough push their successors back.
+            # shift[i + 1] = max(0, shift[i] + overrun[i]) is a running-minimum scan.
+            overrun = end_ms[:-1] + min_gap_ms - start_ms[1:]
+            totals = np.concatenate(([0], np.cumsum(overrun)))
+            shift = totals - np.minimum.accumulate(totals)
+            start_ms = start_ms + shift
+            end_ms = end_ms + shift
+        return self._with_times(start_ms, end_ms)
+
+
+def apply_timing_operation(
+    srt_content: str,
+    operation: str,
+    offset_ms: int = 0,
+    from_fps: Optional[float] = None,
+    to_fps: Optional[float] = None,
+    first_point: Optional[Tuple[int, int]] = None,
+    second_point: Optional[Tuple[int, int]] = None,
+    min_gap_ms: int = MIN_SUBTITLE_GAP_MS,
+) -> str:
+    """Parse, retime and re-serialize a whole SRT document in one call."""
+    timings = SubtitleTimings.from_srt(srt_content)
+    if operation == "shift":
+        timings = timings.shift(offset_ms)
+    elif operation == "framerate":
+        timings = timings.convert_framerate(from_fps, to_fps)
+    elif operation == "resync":
+        timings = timings.resync(first_point, second_point)
+    elif operation == "repair":
+        timings = timings.repair_overlaps(min_gap_ms)
+    else:
+        raise ValueError(f"Unknown timing operation: {operation}")
+    logging.info(f"Applied timing operation '{operation}' to {len(timings)} cues")
+    return timings.to_srt()
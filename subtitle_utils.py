@@ -2,7 +2,8 @@
 
 import logging
 import re
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 import requests
 from typing_extensions import Annotated
@@ -13,12 +14,37 @@ from agent_models import (
     WiktionaryDefinition,
     WiktionaryResult,
 )
-from constants import MAX_DEFINITIONS
+from constants import (
+    FORMATTED_SUBTITLES_END,
+    MAX_DEFINITIONS,
+    TERMINATION_MESSAGE,
+    WIKTIONARY_API_URL,
+    WIKTIONARY_CACHE_SIZE,
+)
+from document_cache import DOCUMENT_CACHE, KIND_SUBTITLES
+from resource_profile import profiled
+from wiktionary_index import extract_lemma, get_wiktionary_index
+
+SRT_BLOCK_PATTERN = re.compile(
+    r"^[ \t]*(\d+)[ \t]*\n"
+    r"[ \t]*(\d{2}:\d{2}:\d{2},\d{3})[ \t]*-->[ \t]*(\d{2}:\d{2}:\d{2},\d{3})[^\n]*\n"
+    # Text lines run until a blank line, the next cue or a closing marker
+    r"((?:(?![ \t]*\d+[ \t]*\n[ \t]*\d{2}:\d{2}:\d{2},\d{3})"
+    rf"(?![ \t]*(?:{FORMATTED_SUBTITLES_END}|{TERMINATION_MESSAGE})[ \t]*(?:\n|\Z))"
+    r"[ \t]*[^\s`][^\n]*(?:\n|\Z))*)",
+    re.MULTILINE,
+)
 
 
 def parse_srt(
-    srt_content: Annotated[str, "SRT content as a string"]
+    srt_content: Annotated[str, "SRT content as a string"],
 ) -> List[Dict[str, str]]:
+    # The cue dicts are shared through the document cache and must not be modified
+    return list(DOCUMENT_CACHE.get(KIND_SUBTITLES, srt_content, _parse_srt))
+
+
+@profiled("parse_srt")
+def _parse_srt(srt_content: str) -> List[Dict[str, str]]:
     subtitles = []
     for block in srt_content.strip().split("\n\n"):
         lines = block.split("\n")
@@ -36,6 +62,31 @@ def parse_srt(
     return subtitles
 
 
+def extract_srt_blocks(text: str) -> List[Dict[str, str]]:
+    """Leniently extract every SRT cue found in free-form text such as an agent message."""
+    subtitles = []
+    for match in SRT_BLOCK_PATTERN.finditer(text):
+        subtitles.append(
+            {
+                "index": int(match.group(1)),
+                "start_time": match.group(2),
+                "end_time": match.group(3),
+                "text": "\n".join(
+                    line.strip() for line in match.group(4).strip().split("\n")
+                ),
+            }
+        )
+    return subtitles
+
+
+def render_srt(subtitles: List[Dict[str, str]]) -> str:
+    """Serialize parsed subtitles back into SRT text."""
+    return "\n\n".join(
+        f"{subtitle['index']}\n{subtitle['start_time']} --> {subtitle['end_time']}\n{subtitle['text']}"
+        for subtitle in subtitles
+    )
+
+
 def verify_alignment(
     original_srt: List[Dict[str, str]], formatted_srt: List[Dict[str, str]]
 ) -> AlignmentResult:
@@ -56,14 +107,9 @@ def verify_alignment(
     return AlignmentResult(is_aligned=is_aligned, misaligned_indices=misaligned_indices)
 
 
-def format_subtitles(
-    reviewed_srt: Annotated[str, "Reviewed SRT content as a string"]
-) -> FormattingResult:
-    subtitles = parse_srt(reviewed_srt)
-
+def wrap_subtitles(subtitles: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Re-wrap each subtitle's text into at most 2 lines of 50 characters."""
     formatted_srt = []
-    warnings = []
-
     for subtitle in subtitles:
         start_time = subtitle["start_time"]
         end_time = subtitle["end_time"]
@@ -92,6 +138,14 @@ def format_subtitles(
                 "text": formatted_text,
             }
         )
+    return formatted_srt
+
+
+def format_subtitles(
+    reviewed_srt: Annotated[str, "Reviewed SRT content as a string"],
+) -> FormattingResult:
+    formatted_srt = wrap_subtitles(parse_srt(reviewed_srt))
+    warnings = []
 
     for subtitle in formatted_srt:
         lines = subtitle["text"].split("\n")
@@ -104,6 +158,11 @@ def format_subtitles(
                 warnings.append(
                     f"Subtitle {subtitle['index']} has a line longer than 50 characters: {line}"
                 )
+    # Re-wrapping cannot fix these, they tell the formatter where to condense.
+    # numpy is heavy to import and this module loads at startup, so it is imported here
+    from quality_analysis import TIMING_RULES, analyze_quality
+
+    warnings.extend(analyze_quality(reviewed_srt).issues(TIMING_RULES))
 
     result = FormattingResult(
         total_subtitles=len(formatted_srt),
@@ -122,44 +181,68 @@ def format_subtitles(
     return result
 
 
+@lru_cache(maxsize=WIKTIONARY_CACHE_SIZE)
+def _fetch_definition(word: str, language: str) -> Optional[str]:
+    response = requests.get(WIKTIONARY_API_URL + word)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    data = response.json()
+
+    for entry in data.get(language, []):
+        if "definitions" in entry and entry["definitions"]:
+            return clean_definition(entry["definitions"][0]["definition"])
+    return None
+
+
+def lookup_definition(word: str, language: str = "en") -> Optional[str]:
+    """Look up the first definition of a word, preferring the offline index.
+
+    An inflection is followed to its lemma once, as the offline index does,
+    so lemmas that point at each other cannot loop. Fetched definitions are memoized;
+    failed network requests raise and are not cached.
+    """
+    index = get_wiktionary_index()
+    if index is not None:
+        return index.lookup(word, language)
+
+    definition = _fetch_definition(word, language)
+    if definition is None:
+        return None
+    lemma = extract_lemma(definition)
+    if lemma and lemma.casefold() != word.casefold():
+        lemma_definition = _fetch_definition(lemma, language)
+        if lemma_definition:
+            return f"{definition}: {lemma_definition}"
+    return definition
+
+
 def get_wiktionary_definition(
     words: List[str],
     language: str = "en",
     max_attempts: int = 1,
     max_definitions: int = MAX_DEFINITIONS,
 ) -> WiktionaryResult:
-    base_url = "https://en.wiktionary.org/api/rest_v1/page/definition/"
     result = WiktionaryResult()
 
     for word in words[:max_definitions]:
-        url = base_url + word
-
-        for _ in range(max_attempts):
+        for attempt in range(max_attempts):
             try:
-                response = requests.get(url)
-                response.raise_for_status()
-                data = response.json()
-
-                if language in data:
-                    for entry in data[language]:
-                        if "definitions" in entry and entry["definitions"]:
-                            definition = entry["definitions"][0]["definition"]
-                            result.definitions.append(
-                                WiktionaryDefinition(
-                                    word=word,
-                                    definition=clean_definition(definition),
-                                    language=language,
-                                )
-                            )
-                            break
-                    else:
-                        result.not_found.append(word)
+                definition = lookup_definition(word, language)
+                if definition:
+                    result.definitions.append(
+                        WiktionaryDefinition(
+                            word=word,
+                            definition=definition,
+                            language=language,
+                        )
+                    )
                 else:
                     result.not_found.append(word)
 
                 break
             except requests.RequestException:
-                if _ == max_attempts - 1:
+                if attempt == max_attempts - 1:
                     result.not_found.append(word)
 
     return result
@@ -0,0 +1,57 @@
+# tests/test_batch_translation.py
+
+import httpx
+
+from batch_server import LocalBatchServer, LocalBatchService, uppercase_responder
+from batch_translation import BatchTranslation, create_batch_client
+from constants import BYTE_ORDER_MARK, UTF8_ENCODING
+from subtitle_utils import parse_srt
+
+SRT = "\n\n".join(
+    f"{index}\n00:00:{index:02d},000 --> 00:00:{index:02d},900\nLine number {index}"
+    for index in range(1, 6)
+)
+
+
+def run_job(tmp_path, responder):
+    srt_path = tmp_path / "episode.srt"
+    srt_path.write_text(SRT, encoding=UTF8_ENCODING)
+    with LocalBatchServer(LocalBatchService(responder), port=0) as server:
+        client = create_batch_client(server.base_url, httpx.Client())
+        job = BatchTranslation.create(
+            [str(srt_path)],
+            "episode",
+            "gpt-4o-mini",
+            "English",
+            "French",
+            chunk_size=2,
+            batch_dir=str(tmp_path / "batches"),
+            client=client,
+        )
+        outputs = job.run(poll_seconds=0.05)
+    with open(outputs[0], "r", encoding=UTF8_ENCODING) as f:
+        return job, parse_srt(f.read().lstrip(BYTE_ORDER_MARK))
+
+
+def test_batch_job_translates_and_merges_every_chunk(tmp_path):
+    job, subtitles = run_job(tmp_path, uppercase_responder)
+    assert [subtitle["text"] for subtitle in subtitles] == [
+        f"LINE NUMBER {index}" for index in range(1, 6)
+    ]
+    assert len(job.state.rounds) == 1
+    assert job.state.merged
+
+
+def test_failed_requests_are_retried_in_the_next_round(tmp_path):
+    calls = []
+
+    def flaky(body):
+        calls.append(body)
+        if len(calls) == 1:
+            raise RuntimeError("Server error")
+        return uppercase_responder(body)
+
+    job, subtitles = run_job(tmp_path, flaky)
+    assert len(subtitles) == 5
+    assert len(job.state.rounds) == 2
+    assert len(calls) == 4
@@ -0,0 +1,83 @@
+# tests/test_chunk_queue.py
+
+import time
+
+import pytest
+
+from agent_models import ChunkResult, ChunkTask, TranslationOptions
+from chunk_queue import SpoolQueue, SQLiteQueue
+
+JOB_ID = "job"
+
+
+@pytest.fixture(params=["spool", "sqlite"])
+def queue(request, tmp_path):
+    if request.param == "spool":
+        return SpoolQueue(str(tmp_path / "spool"))
+    return SQLiteQueue(str(tmp_path / "queue.db"))
+
+
+def publish(queue, chunk_count):
+    queue.publish(
+        [
+            ChunkTask(
+                job_id=JOB_ID,
+                chunk_index=index,
+                chunk_count=chunk_count,
+                srt_content=f"chunk {index}",
+                source_lang="English",
+                target_lang="French",
+                llm_config={},
+                options=TranslationOptions(),
+            )
+            for index in range(chunk_count)
+        ]
+    )
+
+
+def result(lease):
+    return ChunkResult(
+        job_id=lease.task.job_id,
+        chunk_index=lease.task.chunk_index,
+        translated_srt=f"translated {lease.task.chunk_index}",
+    )
+
+
+def test_claim_leases_each_task_once(queue):
+    publish(queue, 2)
+    first = queue.claim(lease_seconds=60)
+    second = queue.claim(lease_seconds=60)
+    assert [first.task.chunk_index, second.task.chunk_index] == [0, 1]
+    assert first.attempts == 1
+    assert queue.claim(lease_seconds=60) is None
+    assert queue.counts(JOB_ID) == {"queued": 0, "leased": 2, "done": 0}
+
+
+def test_expired_lease_is_claimed_again(queue):
+    publish(queue, 1)
+    expired = queue.claim(lease_seconds=0.01)
+    time.sleep(0.05)
+    reassigned = queue.claim(lease_seconds=60)
+    assert reassigned.task.chunk_index == expired.task.chunk_index
+    assert reassigned.attempts == 2
+    assert not queue.renew(expired, lease_seconds=60)
+
+
+def test_chunk_finished_after_its_lease_expired_is_not_claimed_again(queue):
+    publish(queue, 1)
+    expired = queue.claim(lease_seconds=0.01)
+    time.sleep(0.05)
+    queue.requeue_expired()
+    queue.complete(expired, result(expired))
+    assert queue.claim(lease_seconds=60) is None
+    assert queue.counts(JOB_ID)["done"] == 1
+
+
+def test_results_come_back_in_chunk_order(queue):
+    publish(queue, 3)
+    leases = [queue.claim(lease_seconds=60) for _ in range(3)]
+    for lease in reversed(leases):
+        queue.complete(lease, result(lease))
+    assert [r.chunk_index for r in queue.results(JOB_ID)] == [0, 1, 2]
+    assert [r.chunk_index for r in queue.results(JOB_ID, skip={1})] == [0, 2]
+    assert queue.counts(JOB_ID) == {"queued": 0, "leased": 0, "done": 3}
@@ -0,0 +1,50 @@
+# tests/test_chunk_tuner.py
+
+from chunk_tuner import ChunkStatsStore
+from constants import (
+    CHUNK_SIZE_CANDIDATES,
+    DEFAULT_SUBTITLE_CHUNK_SIZE,
+    TUNER_MIN_SAMPLES,
+)
+
+MODEL = "gpt-4o-mini"
+
+
+def run_auto_job(store: ChunkStatsStore, seconds_per_cue: dict) -> int:
+    """Record one Auto-mode job of three chunks at the recommended size."""
+    chunk_size, _ = store.recommend(MODEL, "English", "Turkish")
+    for _ in range(3):
+        store.record(
+            MODEL,
+            "English",
+            "Turkish",
+            chunk_size,
+            cue_count=chunk_size,
+            seconds=seconds_per_cue[chunk_size] * chunk_size,
+            tokens=100,
+            aligned=True,
+        )
+    return chunk_size
+
+
+def test_fresh_history_starts_with_the_default():
+    store = ChunkStatsStore(path=None)
+    assert store.recommend(MODEL, "English", "Turkish")[0] == (
+        DEFAULT_SUBTITLE_CHUNK_SIZE
+    )
+
+
+def test_auto_mode_explores_every_candidate_and_moves_to_the_fastest():
+    store = ChunkStatsStore(path=None)
+    # Larger chunks are faster per cue, so 50 should win once it is measured
+    seconds_per_cue = {size: 1.0 / size for size in CHUNK_SIZE_CANDIDATES}
+    used = [run_auto_job(store, seconds_per_cue) for _ in CHUNK_SIZE_CANDIDATES]
+
+    assert sorted(used) == sorted(CHUNK_SIZE_CANDIDATES)
+    assert all(
+        stats.samples >= TUNER_MIN_SAMPLES
+        for stats in store.summarize(MODEL, "English", "Turkish")
+    )
+    chunk_size, best = store.recommend(MODEL, "English", "Turkish")
+    assert chunk_size == 50
+    assert best.chunk_size == 50
@@ -0,0 +1,48 @@
+# tests/test_chunk_validator.py
+
+from chunk_validator import ChunkValidator
+from constants import EXPECTED_ROUNDS_AFTER_SPEAKER
+
+ORIGINAL = """1
+00:00:01,000 --> 00:00:04,000
+Where are you going tonight?
+
+2
+00:00:05,000 --> 00:00:08,000
+I am going to the market."""
+
+TRANSLATION = """1
+00:00:01,000 --> 00:00:04,000
+Où vas-tu ce soir ?
+
+2
+00:00:05,000 --> 00:00:08,000
+Je vais au marché."""
+
+
+def test_translation_after_the_repeated_original_is_accepted():
+    validator = ChunkValidator(ORIGINAL)
+    message = {"content": f"Original:\n{ORIGINAL}\n\nTranslation:\n{TRANSLATION}"}
+    assert validator.check("Translation_Reviewer", message, round_number=4)
+    assert validator.translation == TRANSLATION
+    assert validator.report.terminated_by == "Translation_Reviewer"
+    assert validator.report.rounds_saved == (
+        EXPECTED_ROUNDS_AFTER_SPEAKER["Translation_Reviewer"]
+    )
+
+
+def test_echoed_truncated_and_tool_call_messages_are_rejected():
+    validator = ChunkValidator(ORIGINAL)
+    assert not validator.check("Subtitle_Translator", {"content": ORIGINAL}, 1)
+    truncated = {"content": TRANSLATION.split("\n\n")[0]}
+    assert not validator.check("Subtitle_Translator", truncated, 1)
+    tool_call = {"content": TRANSLATION, "tool_calls": [{"id": "call"}]}
+    assert not validator.check("Subtitle_Formatter", tool_call, 2)
+    assert validator.translation is None
+    assert validator.report.validations == 2
+
+
+def test_shifted_timestamps_are_rejected():
+    validator = ChunkValidator(ORIGINAL)
+    shifted = TRANSLATION.replace("00:00:05,000", "00:00:05,500")
+    assert not validator.check("Subtitle_Formatter", {"content": shifted}, 3)
@@ -0,0 +1,41 @@
+# tests/test_document_cache.py
+
+from document_cache import DocumentCache, approximate_size
+
+
+def test_repeated_documents_are_built_once():
+    cache = DocumentCache()
+    builds = []
+
+    def build(content):
+        builds.append(content)
+        return content.split()
+
+    assert cache.get("words", "a b c", build) == ["a", "b", "c"]
+    assert cache.get("words", "a b c", build) == ["a", "b", "c"]
+    assert cache.get("chars", "a b c", list) == list("a b c")
+    assert builds == ["a b c"]
+    assert cache.hit_rate("words") == 0.5
+    assert cache.as_dict()["entries"] == 2
+
+
+def test_least_recently_used_views_are_evicted_by_size():
+    size = approximate_size("x" * 1000)
+    cache = DocumentCache(max_bytes=2 * size)
+    for content in ("a" * 1000, "b" * 1000):
+        cache.get("text", content, str)
+    cache.get("text", "a" * 1000, str)
+    cache.get("text", "c" * 1000, str)
+    assert cache.evictions == 1
+    assert cache.bytes <= cache.max_bytes
+    cache.get("text", "a" * 1000, str)
+    cache.get("text", "b" * 1000, str)
+    assert cache.hits["text"] == 2
+    assert cache.misses["text"] == 4
+
+
+def test_views_larger_than_the_budget_are_not_cached():
+    cache = DocumentCache(max_bytes=100)
+    assert cache.get("text", "x" * 1000, str) == "x" * 1000
+    assert cache.as_dict()["entries"] == 0
+    assert cache.bytes == 0
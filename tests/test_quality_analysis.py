@@ -0,0 +1,53 @@
+# tests/test_quality_analysis.py
+
+from agent_models import QualityLimits
+from quality_analysis import (
+    RULE_OVERLAP,
+    RULE_READING_SPEED,
+    analyze_quality,
+    reading_speed_regressions,
+)
+from subtitle_utils import parse_srt
+
+SRT = """1
+00:00:01,000 --> 00:00:03,000
+Fine.
+
+2
+00:00:04,000 --> 00:00:05,000
+This line is far too long to read in a second.
+
+3
+00:00:04,800 --> 00:00:06,800
+Short."""
+
+
+def test_fast_and_overlapping_cues_are_flagged():
+    analysis = analyze_quality(SRT)
+    assert analysis.flagged_positions().tolist() == [1]
+    assert analysis.issues() == [
+        "Subtitle 2: Reading speed 46.0 cps above 17",
+        "Subtitle 2: Overlaps the next subtitle by 200 ms",
+    ]
+    summary = analysis.summary()
+    assert summary.flagged_cues == 1
+    assert summary.flagged[RULE_READING_SPEED] == 1
+    assert summary.flagged[RULE_OVERLAP] == 1
+
+
+def test_limits_and_rules_narrow_the_issues():
+    analysis = analyze_quality(SRT, QualityLimits(max_cps=50))
+    assert analysis.issues() == ["Subtitle 2: Overlaps the next subtitle by 200 ms"]
+    assert analysis.issues([RULE_READING_SPEED]) == []
+
+
+def test_only_translations_slower_than_their_original_are_regressions():
+    original = parse_srt(SRT)
+    translated = [
+        {**original[0], "text": "A much longer translation of the word fine."},
+        {**original[1], "text": "Far too long, as the original already was."},
+        original[2],
+    ]
+    assert reading_speed_regressions(original, translated) == [
+        "Subtitle 1: Reading speed 21.5 cps above 17 (original 2.5)"
+    ]
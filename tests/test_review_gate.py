@@ -0,0 +1,74 @@
+# tests/test_review_gate.py
+
+import random
+from types import SimpleNamespace
+
+from review_gate import ReviewGate, decide_review
+
+ORIGINAL = """1
+00:00:01,000 --> 00:00:04,000
+Where are you going tonight?
+
+2
+00:00:05,000 --> 00:00:08,000
+I am going to the market."""
+
+TRANSLATION = """1
+00:00:01,000 --> 00:00:04,000
+Où vas-tu ce soir ?
+
+2
+00:00:05,000 --> 00:00:08,000
+Je vais au marché."""
+
+
+def test_clean_translation_skips_the_review():
+    decision = decide_review(ORIGINAL, TRANSLATION, sample_rate=0.0)
+    assert not decision.flagged
+    assert not decision.review_required
+    assert decision.llm_calls_saved == 1
+
+
+def test_clean_translation_can_be_sampled_for_review():
+    decision = decide_review(
+        ORIGINAL, TRANSLATION, sample_rate=1.0, rng=random.Random(0)
+    )
+    assert decision.sampled
+    assert decision.review_required
+    assert decision.llm_calls_saved == 0
+
+
+def test_only_the_trailing_cues_of_a_message_are_checked():
+    message = f"Original:\n{ORIGINAL}\n\nTranslation:\n{TRANSLATION}"
+    assert not decide_review(ORIGINAL, message, sample_rate=0.0).review_required
+
+
+def test_echoed_original_is_flagged():
+    decision = decide_review(ORIGINAL, ORIGINAL, sample_rate=0.0)
+    assert decision.review_required
+    assert "Subtitle 1: Looks untranslated" in decision.reasons
+
+
+def test_changed_timestamps_and_missing_cues_are_flagged():
+    shifted = TRANSLATION.replace("00:00:05,000", "00:00:05,500")
+    assert decide_review(ORIGINAL, shifted, sample_rate=0.0).reasons == [
+        "Subtitle 2: Index or timestamp mismatch"
+    ]
+    truncated = TRANSLATION.split("\n\n")[0]
+    assert decide_review(ORIGINAL, truncated, sample_rate=0.0).reasons == [
+        "Cue count mismatch: expected 2, found 1"
+    ]
+
+
+def test_gate_sends_clean_translations_to_the_formatter():
+    formatter = SimpleNamespace(name="Subtitle_Formatter")
+    groupchat = SimpleNamespace(
+        messages=[{"content": ORIGINAL}, {"content": TRANSLATION}],
+        agent_by_name={formatter.name: formatter}.get,
+    )
+    gate = ReviewGate(ORIGINAL, sample_rate=0.0)
+    translator = SimpleNamespace(name="Subtitle_Translator")
+    assert gate.select_speaker(translator, groupchat) is formatter
+    assert gate.decision.estimated_tokens_saved > 0
+    # The decision is made once per chunk
+    assert gate.select_speaker(translator, groupchat) == "auto"
@@ -0,0 +1,33 @@
+# tests/test_subtitle_timing.py
+
+from subtitle_timing import SubtitleTimings
+
+SRT = """1
+00:00:00,000 --> 00:00:02,000
+First
+
+2
+00:00:10,000 --> 00:00:12,000
+Second
+
+3
+00:00:20,000 --> 00:00:22,000
+Third"""
+
+
+def test_resync_maps_both_points_exactly():
+    timings = SubtitleTimings.from_srt(SRT).resync((10000, 30000), (20000, 41000))
+    assert timings.start_ms[1:].tolist() == [30000, 41000]
+
+
+def test_resync_keeps_cues_before_the_first_point_that_stretch_below_zero():
+    # The stretch alone puts the first cue at -1000 ms; the shift moves it to 19000
+    timings = SubtitleTimings.from_srt(SRT).resync((10000, 30000), (20000, 41000))
+    assert timings.start_ms[0] == 19000
+    assert timings.end_ms[0] == 21200
+    assert "00:00:19,000 --> 00:00:21,200" in timings.to_srt()
+
+
+def test_resync_clamps_final_times_at_zero():
+    timings = SubtitleTimings.from_srt(SRT).resync((10000, 0), (20000, 10000))
+    assert timings.start_ms.tolist() == [0, 0, 10000]
@@ -0,0 +1,69 @@
+# tests/test_version_diff.py
+
+import pytest
+
+from constants import BYTE_ORDER_MARK
+from version_diff import diff_source_versions
+
+PREVIOUS_SOURCE = """1
+00:00:01,000 --> 00:00:02,000
+Good morning.
+
+2
+00:00:03,000 --> 00:00:04,000
+How are you?
+
+3
+00:00:05,000 --> 00:00:06,000
+See you later."""
+
+PREVIOUS_TRANSLATION = """1
+00:00:01,000 --> 00:00:02,000
+Bonjour.
+
+2
+00:00:03,000 --> 00:00:04,000
+Comment ça va ?
+
+3
+00:00:05,000 --> 00:00:06,000
+À plus tard."""
+
+
+def test_unchanged_text_is_reused_with_the_new_timing():
+    new_source = PREVIOUS_SOURCE.replace("00:00:0", "00:00:1")
+    diff = diff_source_versions(PREVIOUS_SOURCE, PREVIOUS_TRANSLATION, new_source)
+    assert diff.pending_srt == ""
+    assert (diff.report.reused, diff.report.retimed) == (3, 3)
+    merged = diff.merge()
+    assert merged.startswith(BYTE_ORDER_MARK)
+    assert "00:00:13,000 --> 00:00:14,000\nComment ça va ?" in merged
+
+
+def test_only_edited_and_new_cues_are_pending():
+    new_source = (
+        PREVIOUS_SOURCE.replace("How are you?", "How are you doing?")
+        + "\n\n4\n00:00:07,000 --> 00:00:08,000\nGoodbye."
+    )
+    diff = diff_source_versions(PREVIOUS_SOURCE, PREVIOUS_TRANSLATION, new_source)
+    assert [cue["index"] for cue in diff.pending] == [2, 4]
+    assert (diff.report.reused, diff.report.edited, diff.report.new) == (2, 1, 1)
+
+    with pytest.raises(ValueError, match="Missing translation for subtitle 2"):
+        diff.merge()
+    translated_pending = diff.pending_srt.replace(
+        "How are you doing?", "Comment allez-vous ?"
+    ).replace("Goodbye.", "Au revoir.")
+    merged = diff.merge(translated_pending)
+    assert [line for line in merged.split("\n") if line and line[0].isalpha()] == [
+        "Bonjour.",
+        "Comment allez-vous ?",
+        "À plus tard.",
+        "Au revoir.",
+    ]
+
+
+def test_translation_out_of_step_with_its_source_is_not_reused():
+    previous_translation = PREVIOUS_TRANSLATION.replace("00:00:03,000", "00:00:03,500")
+    diff = diff_source_versions(PREVIOUS_SOURCE, previous_translation, PREVIOUS_SOURCE)
+    assert [cue["index"] for cue in diff.pending] == [2]
@@ -0,0 +1,130 @@
+# transcript_store.py
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from constants import (
+    TRANSCRIPT_BACKUP_COUNT,
+    TRANSCRIPT_DIR,
+    TRANSCRIPT_FILE_NAME,
+    TRANSCRIPT_MAX_FILE_BYTES,
+    TRANSCRIPT_QUEUE_SIZE,
+    TRANSCRIPT_RING_SIZE,
+    UTF8_ENCODING,
+)
+
+
+class TranscriptSink:
+    """Persists chunk chat transcripts from a background writer thread.
+
+    `submit` only enqueues the transcript; serialization, gzip compression and
+    size-based rotation happen on the writer thread. The most recent
+    transcripts are also kept in memory for the debug panel.
+    """
+
+    def __init__(
+        self,
+        directory: str = TRANSCRIPT_DIR,
+        max_file_bytes: int = TRANSCRIPT_MAX_FILE_BYTES,
+        backup_count: int = TRANSCRIPT_BACKUP_COUNT,
+        ring_size: int = TRANSCRIPT_RING_SIZE,
+        queue_size: int = TRANSCRIPT_QUEUE_SIZE,
+    ):
+        self.path = os.path.join(directory, TRANSCRIPT_FILE_NAME)
+        name, self._extension = TRANSCRIPT_FILE_NAME.split(".", 1)
+        self._stem = os.path.join(directory, name)
+        self.max_file_bytes = max_file_bytes
+        self.backup_count = backup_count
+        self.recent: deque = deque(maxlen=ring_size)
+        self.written = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name="transcript-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, chat_history: List[Dict[str, Any]], **metadata: Any) -> bool:
+        """Hand a transcript to the writer thread. Drops it if the queue is full."""
+        try:
+            self._queue.put_nowait((time.time(), chat_history, metadata))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every submitted transcript has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logging.error(f"Failed to write chat transcript: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(
+        self, timestamp: float, chat_history: List[Dict[str, Any]], metadata: Dict
+    ):
+        record = {"timestamp": timestamp, **metadata, "messages": chat_history}
+        self.recent.append(record)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+        # One gzip member per record keeps the file readable while it grows
+        with gzip.open(self.path, "ab") as f:
+            f.write(line.encode(UTF8_ENCODING))
+        self.written += 1
+
+        if os.path.getsize(self.path) >= self.max_file_bytes:
+            self._rotate()
+
+    def _backup_path(self, number: int) -> str:
+        return f"{self._stem}.{number}.{self._extension}"
+
+    def _rotate(self):
+        for number in range(self.backup_count - 1, 0, -1):
+            source = self._backup_path(number)
+            if os.path.exists(source):
+                os.replace(source, self._backup_path(number + 1))
+        if self.backup_count > 0:
+            os.replace(self.path, self._backup_path(1))
+        else:
+            os.remove(self.path)
+        logging.info(f"Rotated chat transcript file: {self.path}")
+
+
+_sink: Optional[TranscriptSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_transcript_sink() -> TranscriptSink:
+    """Return the process-wide transcript sink, starting its writer on first use."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = TranscriptSink()
+            atexit.register(_sink.close)
+        return _sink
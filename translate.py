@@ -1,13 +1,16 @@
 # translate_srt.py
 
 import logging
-from typing import Any, Dict, List
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 import streamlit as st
-from autogen import GroupChat, GroupChatManager
+from autogen import Agent, GroupChat, GroupChatManager, gather_usage_summary
 
 from agent_definitions import merge_agent_definitions
+from agent_models import ChunkReport, GlossaryPrefetchReport, TranslationOptions
 from agents import create_agents
+from chunk_validator import ChunkValidator
 from constants import (
     FORMATTED_SUBTITLES_END,
     FORMATTED_SUBTITLES_START,
@@ -19,13 +22,86 @@ from constants import (
     LANGUAGE_TURKISH,
     MAX_SUBTITLE_LINE_LENGTH,
     MAX_SUBTITLE_LINES,
+    STREAMING_UNSUPPORTED_MODEL_PREFIXES,
     TERMINATION_MESSAGE,
 )
+from definition_prefetch import (
+    count_definition_tool_calls,
+    prefetch_glossary,
+    prefetch_supported,
+)
+from resource_profile import profiled
+from review_gate import ReviewGate
+from speaker_transitions import SpeakerSelector, counted_llm_config
+from streaming_translation import StreamingTranslatorReply
+from transcript_store import get_transcript_sink
+
+
+@profiled("translate_srt_main")
+def translate_srt_main(
+    srt_content: str,
+    source_lang: str,
+    target_lang: str,
+    options: Optional[TranslationOptions] = None,
+    chunk_report: Optional[ChunkReport] = None,
+    on_cue: Optional[Callable[[Dict[str, str]], None]] = None,
+) -> str:
+    options = options or TranslationOptions()
+    llm_config = options.llm_config or st.session_state.llm_config
+    start_time = time.perf_counter()
+
+    # Resolve rare words up front instead of through mid-chat tool calls
+    glossary_prefetch = options.glossary_prefetch_enabled and prefetch_supported(
+        source_lang
+    )
+    prefetch_report = None
+    glossary = ""
+    if glossary_prefetch:
+        prefetch_report, glossary = prefetch_glossary(srt_content, source_lang)
+
+    # Stream the translator's reply so broken cues are caught while it is written
+    model = llm_config["config_list"][0]["model"]
+    streaming = options.streaming_enabled and not model.startswith(
+        STREAMING_UNSUPPORTED_MODEL_PREFIXES
+    )
 
+    streaming_reply = (
+        StreamingTranslatorReply(srt_content, on_cue=on_cue) if streaming else None
+    )
 
-def translate_srt_main(srt_content: str, source_lang: str, target_lang: str) -> str:
     # Create agents
-    agents = create_agents(st.session_state.llm_config)
+    agents = create_agents(
+        llm_config,
+        enable_definition_tool=not glossary_prefetch,
+        stream_translator=streaming,
+        translator_llm_config=(
+            streaming_reply.llm_config(llm_config) if streaming_reply else None
+        ),
+    )
+    if streaming_reply is not None:
+        agents["subtitle_translator"].register_reply(
+            [Agent, None], streaming_reply.reply, position=0
+        )
+
+    # Skip the reviewer for chunks that pass the local heuristics
+    review_gate = ReviewGate(
+        srt_content,
+        sample_rate=options.review_sample_rate,
+        limits=options.quality_limits,
+    )
+
+    # Stop the conversation as soon as a message holds a valid translation
+    validator = (
+        ChunkValidator(srt_content) if options.early_termination_enabled else None
+    )
+
+    # Follow the fixed agent order instead of asking the manager LLM each round
+    speaker_selector = SpeakerSelector(
+        srt_content,
+        mode=options.speaker_selection,
+        review_gate=review_gate if options.review_gate_enabled else None,
+        validator=validator,
+    )
 
     # Set up the group chat
     group_chat = GroupChat(
@@ -37,20 +113,29 @@ def translate_srt_main(srt_content: str, source_lang: str, target_lang: str) ->
         ],
         messages=[],
         max_round=50,
+        speaker_selection_method=speaker_selector.select_speaker,
     )
 
     # Create the manager
-    manager = GroupChatManager(
-        groupchat=group_chat, llm_config=st.session_state.llm_config
-    )
+    # Speaker selections are counted where they are sent, at the manager's client
+    manager_llm_config, manager_requests = counted_llm_config(llm_config)
+    manager = GroupChatManager(groupchat=group_chat, llm_config=manager_llm_config)
 
     # Start the conversation
     logging.info("Starting conversation")
     user_proxy = agents["user_proxy"]
 
+    glossary_block = (
+        f"""
+    Glossary of uncommon {source_lang} words:
+    {glossary}
+    """
+        if glossary
+        else ""
+    )
     task_description = f"""
-    {merge_agent_definitions(source_lang, target_lang)}
-
+    {merge_agent_definitions(source_lang, target_lang, glossary_prefetch)}
+    {glossary_block}
     Input:
     Original SRT content in {source_lang}:
     {srt_content}
@@ -61,10 +146,61 @@ def translate_srt_main(srt_content: str, source_lang: str, target_lang: str) ->
         message=task_description,
     )
 
+    speaker_selector.report.manager_llm_calls = manager_requests.requests
+    logging.info(
+        f"Speaker selection used {speaker_selector.report.manager_llm_calls} manager LLM calls"
+    )
+    if chunk_report is not None:
+        chunk_report.seconds = time.perf_counter() - start_time
+        usage = gather_usage_summary([*agents.values(), manager])[
+            "usage_including_cached_inference"
+        ]
+        for model_usage in usage.values():
+            if isinstance(model_usage, dict):
+                chunk_report.prompt_tokens += model_usage.get("prompt_tokens", 0)
+                chunk_report.completion_tokens += model_usage.get(
+                    "completion_tokens", 0
+                )
+        chunk_report.llm_calls = (
+            sum(
+                1
+                for message in group_chat.messages
+                if message.get("name") != agents["user_proxy"].name
+            )
+            + speaker_selector.report.manager_llm_calls
+            + (streaming_reply.report.aborted_streams if streaming_reply else 0)
+        )
+        chunk_report.review_gate = review_gate.decision
+        chunk_report.speaker_transitions = speaker_selector.report
+        if streaming_reply is not None:
+            chunk_report.streaming = streaming_reply.report
+        if validator is not None:
+            chunk_report.early_termination = validator.report
+            chunk_report.early_termination.chunk_seconds = (
+                time.perf_counter() - start_time
+            )
+        chunk_report.glossary_prefetch = prefetch_report or GlossaryPrefetchReport()
+        chunk_report.glossary_prefetch.definition_tool_calls = (
+            count_definition_tool_calls(chat_result.chat_history)
+        )
+
     # Extract the full translation from the chat result
     logging.info("Extracting translated content")
     translated_content = ""
-    logging.info(f"Chat result: {chat_result}")
+    logging.info(f"Chat finished with {len(chat_result.chat_history)} messages")
+    get_transcript_sink().submit(
+        chat_result.chat_history,
+        chunk_index=chunk_report.chunk_index if chunk_report else None,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        model=model,
+    )
+
+    if validator is not None and validator.translation:
+        logging.info(
+            f"Using the translation validated from {validator.report.terminated_by}"
+        )
+        return validator.translation
 
     # Extract translated content
     assistant_messages = [
@@ -3,15 +3,14 @@
 import logging
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
 import streamlit as st
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
 from constants import (
     BYTE_ORDER_MARK,
+    CHARS_PER_TOKEN,
     CSS_FILE,
     DATA_DIR,
     DEFAULT_SUBTITLE_CHUNK_SIZE,
@@ -19,8 +18,11 @@ from constants import (
     LOG_FORMAT,
     MAX_SUBTITLE_LINE_LENGTH,
     MAX_SUBTITLE_LINES,
+    MIN_SUBTITLE_GAP_MS,
     UTF8_ENCODING,
 )
+from document_cache import DOCUMENT_CACHE, KIND_BLOCKS
+from resource_profile import profiled
 
 
 def load_css():
@@ -96,12 +98,59 @@ def read_srt_file(file_path: str) -> str:
         raise
 
 
+def check_subtitle_pair(number: int, original: str, translated: str) -> List[str]:
+    """Compare one translated subtitle block with its original block."""
+    issues = []
+    orig_lines = original.strip().split("\n")
+    trans_lines = translated.strip().split("\n")
+
+    # Check if subtitle index matches (ignoring extra spaces)
+    if orig_lines[0].strip() != trans_lines[0].strip():
+        issues.append(
+            f"Subtitle {number}: Index mismatch (Original: {orig_lines[0]}, Translated: {trans_lines[0]})"
+        )
+
+    # Check if timestamps match (ignoring extra spaces)
+    if len(orig_lines) > 1 and len(trans_lines) > 1:
+        if orig_lines[1].strip() != trans_lines[1].strip():
+            issues.append(
+                f"Subtitle {number}: Timestamp mismatch (Original: {orig_lines[1]}, Translated: {trans_lines[1]})"
+            )
+
+    # Extract the text lines from the original and translated subtitles
+    orig_text_lines = orig_lines[2:]
+    trans_text_lines = trans_lines[2:]
+
+    # Check if the number of lines in the text part matches
+    if len(orig_text_lines) != len(trans_text_lines):
+        issues.append(f"Subtitle {number}: Line count mismatch")
+
+    # Check if any line in the translated text exceeds MAX_SUBTITLE_LINE_LENGTH characters
+    for j, line in enumerate(trans_text_lines, 1):
+        if len(line.strip()) > MAX_SUBTITLE_LINE_LENGTH:
+            issues.append(
+                f"Subtitle {number}, Line {j}: Exceeds {MAX_SUBTITLE_LINE_LENGTH} characters ({len(line.strip())})"
+            )
+
+    return issues
+
+
+def split_subtitle_blocks(content: str) -> List[str]:
+    """Split SRT content into its raw cue blocks, shared through the document cache."""
+    # The cached list is shared, callers get their own copy like parse_srt's
+    return list(
+        DOCUMENT_CACHE.get(
+            KIND_BLOCKS, content, lambda text: text.strip().split("\n\n")
+        )
+    )
+
+
 def calculate_subtitle_stats(
     original_content: str, translated_content: str
 ) -> List[str]:
     """Calculate and report issues in the translated subtitles compared to the original subtitles."""
-    original_subs = original_content.strip().split("\n\n")
-    translated_subs = translated_content.strip().split("\n\n")
+    original_subs = split_subtitle_blocks(original_content)
+    translated_subs = split_subtitle_blocks(translated_content)
     issues = []
 
     if len(original_subs) != len(translated_subs):
@@ -110,38 +159,14 @@ def calculate_subtitle_stats(
         )
 
     for i, (orig, trans) in enumerate(zip(original_subs, translated_subs), 1):
-        orig_lines = orig.strip().split("\n")
-        trans_lines = trans.strip().split("\n")
+        issues.extend(check_subtitle_pair(i, orig, trans))
 
-        # Check if subtitle index matches (ignoring extra spaces)
-        if orig_lines[0].strip() != trans_lines[0].strip():
-            issues.append(
-                f"Subtitle {i}: Index mismatch (Original: {orig_lines[0]}, Translated: {trans_lines[0]})"
-            )
-
-        # Check if timestamps match (ignoring extra spaces)
-        if len(orig_lines) > 1 and len(trans_lines) > 1:
-            if orig_lines[1].strip() != trans_lines[1].strip():
-                issues.append(
-                    f"Subtitle {i}: Timestamp mismatch (Original: {orig_lines[1]}, Translated: {trans_lines[1]})"
-                )
-
-        # Extract the text lines from the original and translated subtitles
-        orig_text_lines = orig_lines[2:]
-        trans_text_lines = trans_lines[2:]
-
-        # Check if the number of lines in the text part matches
-        if len(orig_text_lines) != len(trans_text_lines):
-            issues.append(f"Subtitle {i}: Line count mismatch")
+    return issues
 
-        # Check if any line in the translated text exceeds MAX_SUBTITLE_LINE_LENGTH characters
-        for j, line in enumerate(trans_text_lines, 1):
-            if len(line.strip()) > MAX_SUBTITLE_LINE_LENGTH:
-                issues.append(
-                    f"Subtitle {i}, Line {j}: Exceeds {MAX_SUBTITLE_LINE_LENGTH} characters ({len(line.strip())})"
-                )
 
-    return issues
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of LLM tokens in a piece of text."""
+    return -(-len(text) // CHARS_PER_TOKEN)
 
 
 def load_subtitle_file(file_path: str) -> Optional[str]:
@@ -171,36 +196,70 @@ def ensure_byte_order_mark(content: str) -> str:
     return content
 
 
+@profiled("split_subtitles")
 def split_subtitles(
     srt_content: str, chunk_size: int = DEFAULT_SUBTITLE_CHUNK_SIZE
 ) -> List[str]:
     """Split the loaded SRT file into chunks of specified size."""
     logging.info(f"Splitting subtitles with chunk size: {chunk_size}")
-    chunks = []
-    current_chunk = ""
-    index = 0
     # Remove any leading/trailing whitespace and BOM character
     subtitles = srt_content.strip().strip(BYTE_ORDER_MARK).split("\n\n")
-    last_index = len(subtitles)
     # Split the subtitles into chunks of the specified size
-    for subtitle in subtitles:
-        current_chunk += subtitle + "\n\n"
-        index += 1
-        if index % chunk_size == 0 or index == last_index:
-            chunks.append(current_chunk)
-            current_chunk = ""
+    chunks = [
+        "".join(subtitle + "\n\n" for subtitle in subtitles[start : start + chunk_size])
+        for start in range(0, len(subtitles), chunk_size)
+    ]
     logging.info(f"Number of chunks: {len(chunks)}")
     return chunks
 
 
+@profiled("merge_subtitles")
 def merge_subtitles(translated_chunks: List[str]) -> str:
     """Merge the translated subtitle chunks."""
     logging.info("Merging translated subtitle chunks")
-    merged_content = ""
-    for chunk in translated_chunks:
-        if chunk:
-            merged_content += chunk.strip() + "\n\n"
+    merged_content = "\n\n".join(
+        chunk.strip() for chunk in translated_chunks if chunk and chunk.strip()
+    )
     # Prepend BOM character
-    merged_content = BYTE_ORDER_MARK + merged_content.strip()
+    merged_content = BYTE_ORDER_MARK + merged_content
     logging.info(f"Merged content length: {len(merged_content)} characters")
     return merged_content
+
+
+def _retime(srt_content: str, operation: str, **params: Any) -> str:
+    """Apply a timing operation while keeping the BOM state of the content."""
+    # numpy is only needed once a timing operation is applied
+    from subtitle_timing import apply_timing_operation
+
+    retimed = apply_timing_operation(
+        remove_byte_order_mark(srt_content), operation, **params
+    )
+    if srt_content.startswith(BYTE_ORDER_MARK):
+        return ensure_byte_order_mark(retimed)
+    return retimed
+
+
+def shift_subtitle_timings(srt_content: str, offset_ms: int) -> str:
+    """Shift every subtitle by a constant number of milliseconds."""
+    return _retime(srt_content, "shift", offset_ms=offset_ms)
+
+
+def convert_subtitle_framerate(srt_content: str, from_fps: float, to_fps: float) -> str:
+    """Retime subtitles for a framerate change, e.g. 23.976 to 25 fps."""
+    return _retime(srt_content, "framerate", from_fps=from_fps, to_fps=to_fps)
+
+
+def resync_subtitle_timings(
+    srt_content: str, first_point: Tuple[int, int], second_point: Tuple[int, int]
+) -> str:
+    """Resync subtitles from two (current ms, correct ms) reference points."""
+    return _retime(
+        srt_content, "resync", first_point=first_point, second_point=second_point
+    )
+
+
+def repair_subtitle_timings(
+    srt_content: str, min_gap_ms: int = MIN_SUBTITLE_GAP_MS
+) -> str:
+    """Remove overlaps and enforce a minimum gap between consecutive subtitles."""
+    return _retime(srt_content, "repair", min_gap_ms=min_gap_ms)
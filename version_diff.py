@@ -0,0 +1,203 @@
+# version_diff.py
+
+import logging
+import statistics
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+from agent_models import VersionDiffReport
+from constants import (
+    BYTE_ORDER_MARK,
+    VERSION_DIFF_EDIT_SIMILARITY,
+    VERSION_DIFF_MAX_SHIFT_MS,
+)
+from subtitle_timing import parse_timestamp
+from subtitle_utils import parse_srt, render_srt
+
+Cue = Dict[str, str]
+
+
+def _text_key(text: str) -> str:
+    # Line breaks and spacing are formatting, not content
+    return " ".join(text.split())
+
+
+class VersionDiff:
+    """A revised source aligned against the previous source and its translation.
+
+    `reused` maps positions in the new source to carried-over translations,
+    already re-timed; `pending` holds the new and edited cues that still
+    need the LLM. `merge` puts both back together in the new order.
+    """
+
+    def __init__(
+        self,
+        new_subtitles: List[Cue],
+        reused: Dict[int, Cue],
+        pending: List[Cue],
+        report: VersionDiffReport,
+    ):
+        self.new_subtitles = new_subtitles
+        self.reused = reused
+        self.pending = pending
+        self.report = report
+
+    @property
+    def pending_srt(self) -> str:
+        """The cues to translate, with their new indices and timestamps."""
+        return render_srt(self.pending) + "\n\n" if self.pending else ""
+
+    def merge(self, translated_pending: str = "") -> str:
+        """Combine reused cues with the translation of `pending_srt`."""
+        translated = {}
+        if translated_pending.strip(BYTE_ORDER_MARK).strip():
+            translated = {
+                subtitle["index"]: subtitle
+                for subtitle in parse_srt(translated_pending.lstrip(BYTE_ORDER_MARK))
+            }
+        merged = []
+        for position, subtitle in enumerate(self.new_subtitles):
+            if position in self.reused:
+                merged.append(self.reused[position])
+            elif subtitle["index"] in translated:
+                merged.append(
+                    {**subtitle, "text": translated[subtitle["index"]]["text"]}
+                )
+            else:
+                raise ValueError(
+                    f"Missing translation for subtitle {subtitle['index']}"
+                )
+        return BYTE_ORDER_MARK + render_srt(merged)
+
+
+def diff_source_versions(
+    previous_source: str,
+    previous_translation: str,
+    new_source: str,
+    edit_similarity: float = VERSION_DIFF_EDIT_SIMILARITY,
+    max_shift_ms: int = VERSION_DIFF_MAX_SHIFT_MS,
+) -> VersionDiff:
+    """Align a revised source with the previous version to find what needs translating.
+
+    Cues are matched in order by their normalized text. Unchanged runs are
+    reused as they are. Inside changed regions, a cue whose text appears
+    among the old cues is still reused if its timing moved by about as much
+    as the rest of the file. A cue is only reused if the previous
+    translation has the same timing as the previous source. Reused cues
+    take the new index and timestamps.
+    """
+    old_subtitles = parse_srt(previous_source.lstrip(BYTE_ORDER_MARK))
+    new_subtitles = parse_srt(new_source.lstrip(BYTE_ORDER_MARK))
+    translations = {
+        (subtitle["index"], subtitle["start_time"], subtitle["end_time"]): subtitle
+        for subtitle in parse_srt(previous_translation.lstrip(BYTE_ORDER_MARK))
+    }
+
+    def translation_of(old: Cue) -> Optional[Cue]:
+        return translations.get((old["index"], old["start_time"], old["end_time"]))
+
+    old_keys = [_text_key(subtitle["text"]) for subtitle in old_subtitles]
+    new_keys = [_text_key(subtitle["text"]) for subtitle in new_subtitles]
+    opcodes = SequenceMatcher(None, old_keys, new_keys, autojunk=False).get_opcodes()
+
+    report = VersionDiffReport(total_cues=len(new_subtitles))
+    matches: Dict[int, int] = {}
+    for tag, old_start, old_end, new_start, new_end in opcodes:
+        if tag == "equal":
+            for offset in range(new_end - new_start):
+                matches[new_start + offset] = old_start + offset
+
+    # The typical start time change of unchanged cues, e.g. after a re-edit
+    shifts = [
+        parse_timestamp(new_subtitles[new]["start_time"])
+        - parse_timestamp(old_subtitles[old]["start_time"])
+        for new, old in matches.items()
+    ]
+    typical_shift = statistics.median(shifts) if shifts else 0
+
+    reused: Dict[int, Cue] = {}
+    pending: List[Cue] = []
+    used_old = set(matches.values())
+    for tag, old_start, old_end, new_start, new_end in opcodes:
+        for position in range(new_start, new_end):
+            subtitle = new_subtitles[position]
+            old_position = matches.get(position)
+            if old_position is None and tag == "replace":
+                old_position = _moved_cue(
+                    subtitle,
+                    new_keys[position],
+                    old_subtitles,
+                    old_keys,
+                    range(old_start, old_end),
+                    used_old,
+                    typical_shift,
+                    max_shift_ms,
+                )
+            translation = (
+                translation_of(old_subtitles[old_position])
+                if old_position is not None
+                else None
+            )
+            if translation is not None:
+                used_old.add(old_position)
+                reused[position] = {**subtitle, "text": translation["text"]}
+                report.reused += 1
+                old = old_subtitles[old_position]
+                if (old["start_time"], old["end_time"]) != (
+                    subtitle["start_time"],
+                    subtitle["end_time"],
+                ):
+                    report.retimed += 1
+                continue
+
+            pending.append(subtitle)
+            similarity = max(
+                (
+                    SequenceMatcher(None, old_keys[old], new_keys[position]).ratio()
+                    for old in range(old_start, old_end)
+                ),
+                default=0.0,
+            )
+            if old_position is not None or similarity >= edit_similarity:
+                report.edited += 1
+            else:
+                report.new += 1
+
+    # Replaced cues count as edited or new, only the surplus was removed
+    report.removed = sum(
+        max((old_end - old_start) - (new_end - new_start), 0)
+        for tag, old_start, old_end, new_start, new_end in opcodes
+        if tag in ("delete", "replace")
+    )
+    report.retranslated = len(pending)
+    logging.info(
+        f"Version diff: {report.reused} of {report.total_cues} cues reused "
+        f"({report.retimed} re-timed), {report.edited} edited, {report.new} new, "
+        f"{report.removed} removed"
+    )
+    return VersionDiff(new_subtitles, reused, pending, report)
+
+
+def _moved_cue(
+    subtitle: Cue,
+    key: str,
+    old_subtitles: List[Cue],
+    old_keys: List[str],
+    candidates: range,
+    used_old: set,
+    typical_shift: float,
+    max_shift_ms: int,
+) -> Optional[int]:
+    """Find an unused old cue with the same text whose timing fits the file's re-timing."""
+    start = parse_timestamp(subtitle["start_time"])
+    best = None
+    best_drift = None
+    for old in candidates:
+        if old in used_old or old_keys[old] != key:
+            continue
+        drift = abs(
+            start - parse_timestamp(old_subtitles[old]["start_time"]) - typical_shift
+        )
+        if drift <= max_shift_ms and (best_drift is None or drift < best_drift):
+            best, best_drift = old, drift
+    return best
@@ -0,0 +1,232 @@
+# wiktionary_index.py
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from constants import (
+    LOG_FORMAT,
+    UTF8_ENCODING,
+    WIKTIONARY_INDEX_BATCH_SIZE,
+    WIKTIONARY_INDEX_PATH_ENV,
+)
+
+# Glosses such as "plural of cat" or "present participle of run" point at a lemma
+FORM_OF_PATTERN = re.compile(
+    r"^[\w\s,()-]*?\b(?:plural|gerund|participle|past tense|simple past|"
+    r"third-person singular[\w\s-]*?|comparative|superlative|inflection|"
+    r"(?:alternative |obsolete )?(?:spelling|form)) of ([\w'-]+)",
+    re.IGNORECASE,
+)
+
+# Used when a word is missing from the index entirely
+STEM_SUFFIX_RULES = [
+    ("ies", "y"),
+    ("ied", "y"),
+    ("ves", "f"),
+    ("es", ""),
+    ("s", ""),
+    ("ing", ""),
+    ("ing", "e"),
+    ("ed", ""),
+    ("ed", "e"),
+    ("'s", ""),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS definitions (
+    key TEXT NOT NULL,
+    language TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    lemma TEXT,
+    PRIMARY KEY (key, language)
+) WITHOUT ROWID
+"""
+
+
+def _normalize_key(word: str) -> str:
+    return word.strip().casefold()
+
+
+def extract_lemma(definition: str) -> Optional[str]:
+    """Return the lemma a "plural of"/"gerund of" style definition refers to."""
+    match = FORM_OF_PATTERN.match(definition)
+    return match.group(1) if match else None
+
+
+def stem_candidates(word: str) -> List[str]:
+    """Cheap suffix-stripping fallbacks for inflected words missing from the index."""
+    candidates = []
+    for suffix, replacement in STEM_SUFFIX_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            candidate = word[: -len(suffix)] + replacement
+            if candidate not in candidates:
+                candidates.append(candidate)
+            # "running" -> "run", "stopped" -> "stop"
+            if (
+                suffix in ("ing", "ed")
+                and not replacement
+                and len(candidate) >= 3
+                and candidate[-1] == candidate[-2]
+                and candidate[-1] not in "aeiou"
+                and candidate[:-1] not in candidates
+            ):
+                candidates.append(candidate[:-1])
+    return candidates
+
+
+def _iter_wiktextract_rows(
+    lines: Iterable[str], languages: Optional[List[str]] = None
+) -> Iterator[Tuple[str, str, str, Optional[str]]]:
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            logging.warning("Skipping malformed wiktextract line")
+            continue
+        word = entry.get("word")
+        language = entry.get("lang_code")
+        if not word or not language or (languages and language not in languages):
+            continue
+        for sense in entry.get("senses", []):
+            glosses = sense.get("glosses")
+            if not glosses:
+                continue
+            definition = " ".join(glosses[-1].split())
+            lemma = None
+            for link in sense.get("form_of", []) + sense.get("alt_of", []):
+                if link.get("word"):
+                    lemma = link["word"]
+                    break
+            else:
+                lemma = extract_lemma(definition)
+            yield _normalize_key(word), language, definition, lemma
+            break
+
+
+def build_index(
+    dump_path: str, index_path: str, languages: Optional[List[str]] = None
+) -> int:
+    """Import a wiktextract JSONL dump into a compact SQLite index.
+
+    Only the first sense of the first entry per (word, language) is kept,
+    mirroring what the REST lookup returns. Returns the number of rows stored.
+    """
+    logging.info(f"Building Wiktionary index {index_path} from {dump_path}")
+    temp_path = f"{index_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    directory = os.path.dirname(index_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(SCHEMA)
+        batch = []
+        with open(dump_path, "r", encoding=UTF8_ENCODING) as dump:
+            for row in _iter_wiktextract_rows(dump, languages):
+                batch.append(row)
+                if len(batch) >= WIKTIONARY_INDEX_BATCH_SIZE:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO definitions VALUES (?, ?, ?, ?)", batch
+                    )
+                    batch = []
+        if batch:
+            connection.executemany(
+                "INSERT OR IGNORE INTO definitions VALUES (?, ?, ?, ?)", batch
+            )
+        connection.commit()
+        (row_count,) = connection.execute("SELECT COUNT(*) FROM definitions").fetchone()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    os.replace(temp_path, index_path)
+    logging.info(f"Wiktionary index built with {row_count} definitions")
+    return row_count
+
+
+class WiktionaryIndex:
+    """Read-only lookups against an index produced by `build_index`."""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._connection = sqlite3.connect(
+            f"file:{index_path}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA mmap_size = 268435456")
+        self._lock = threading.Lock()
+
+    def _fetch(self, word: str, language: str) -> Optional[Tuple[str, Optional[str]]]:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT definition, lemma FROM definitions WHERE key = ? AND language = ?",
+                (_normalize_key(word), language),
+            ).fetchone()
+
+    def lookup(self, word: str, language: str = "en") -> Optional[str]:
+        """Return the definition of a word, following inflections to their lemma."""
+        row = self._fetch(word, language)
+        if row is None:
+            for candidate in stem_candidates(_normalize_key(word)):
+                row = self._fetch(candidate, language)
+                if row is not None:
+                    break
+            else:
+                return None
+
+        definition, lemma = row
+        if lemma and _normalize_key(lemma) != _normalize_key(word):
+            lemma_row = self._fetch(lemma, language)
+            if lemma_row is not None:
+                return f"{definition}: {lemma_row[0]}"
+        return definition
+
+
+@lru_cache(maxsize=None)
+def _open_index(index_path: str) -> WiktionaryIndex:
+    logging.info(f"Using offline Wiktionary index: {index_path}")
+    return WiktionaryIndex(index_path)
+
+
+def get_wiktionary_index() -> Optional[WiktionaryIndex]:
+    """Return the configured offline index, or None to use the online API."""
+    index_path = os.getenv(WIKTIONARY_INDEX_PATH_ENV)
+    if not index_path:
+        return None
+    if not os.path.exists(index_path):
+        logging.warning(f"Configured Wiktionary index not found: {index_path}")
+        return None
+    return _open_index(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build an offline Wiktionary index from a wiktextract JSONL dump."
+    )
+    parser.add_argument("dump_path", help="Path to the wiktextract JSONL file")
+    parser.add_argument("index_path", help="Path of the SQLite index to create")
+    parser.add_argument(
+        "--languages",
+        nargs="*",
+        help="Language codes to keep (e.g. en fr de); all languages by default",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    build_index(args.dump_path, args.index_path, args.languages)
+
+
+if __name__ == "__main__":
+    main()